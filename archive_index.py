@@ -0,0 +1,219 @@
+"""
+Offset index over an output file, for looking articles up without reading it all.
+
+    python archive_index.py ./article-visualization/public/data/cnn_articles.txt get URL
+    python archive_index.py cnn_articles.txt count --category politics --since 2025-01-01
+    python archive_index.py cnn_articles.txt list --category health --until 2025-01-31
+
+Each output file gets a sidecar SQLite database (<file>.index.db) mapping
+every URL to the byte offset and length of its block, with its category and
+publication time for range queries. Blocks are read back through an mmap of
+the file, so a lookup touches one index page and one block.
+
+The index remembers how far into the file it has read and only indexes
+what was appended since, stopping short of an append still in progress. A
+file that was replaced, cut short or rewritten in place (told apart by a
+digest of its first and last indexed blocks) is reindexed from the start.
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import storage
+from common import published_timestamp
+from to_csv import parse_block
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    category TEXT,
+    published_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_entries_category_published_at ON entries (category, published_at);
+CREATE INDEX IF NOT EXISTS idx_entries_published_at ON entries (published_at);
+CREATE INDEX IF NOT EXISTS idx_entries_offset ON entries (offset);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def index_path(filename):
+    return filename + '.index.db'
+
+class ArchiveIndex:
+    """
+    URL, category and date index over one output file.
+
+    Opening it brings the index up to date; call refresh() to pick up
+    articles appended later. A URL that appears in the file more than once
+    is indexed (and counted) once, at its last block.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._conn = sqlite3.connect(index_path(filename))
+        self._conn.executescript(SCHEMA)
+        self._map = None
+        self.refresh()
+
+    def _state(self, key):
+        row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def refresh(self):
+        """Index the blocks appended since the last refresh. Returns how many were added."""
+        if not os.path.exists(self.filename):
+            self._remap(0)
+            return 0
+        inode = os.stat(self.filename).st_ino
+        end = storage.committed_size(self.filename)
+        start = self._state('indexed_size') or 0
+        with open(self.filename, 'rb') as f:
+            if self._state('inode') != inode or end < start or self._state('check') != self._check(f):
+                # Rewritten or cut short: the old offsets mean nothing any more
+                with self._conn:
+                    self._conn.execute("DELETE FROM entries")
+                start = 0
+
+            rows = []
+            f.seek(start)
+            for offset, block in storage.iter_blocks(f, end):
+                if not block.startswith("Category:"):
+                    continue
+                article = parse_block(block)
+                if article.get('URL'):
+                    rows.append((article['URL'], offset, len(block.encode('utf-8')),
+                                 article.get('Category'), published_timestamp(article.get('Date'))))
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?)",
+                                       [('inode', inode), ('indexed_size', end), ('check', self._check(f))])
+        self._remap(end)
+        return len(rows)
+
+    def _check(self, f):
+        """
+        Digest the first and last indexed blocks as they are in the file now.
+
+        A file rewritten in place keeps its inode and may not shrink, but
+        its blocks move, so this stops matching the digest stored at the
+        last refresh. Appends leave the indexed blocks alone.
+        """
+        digest = hashlib.blake2b(digest_size=8)
+        rows = [self._conn.execute(f"SELECT offset, length FROM entries ORDER BY offset {order} LIMIT 1").fetchone()
+                for order in ('ASC', 'DESC')]
+        for offset, length in filter(None, rows):
+            f.seek(offset)
+            digest.update(f.read(length))
+        return int.from_bytes(digest.digest(), 'little', signed=True)
+
+    def _remap(self, size):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if size:
+            with open(self.filename, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+    def block(self, url):
+        """Return the text of url's block, or None if it isn't in the file."""
+        row = self._conn.execute("SELECT offset, length FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        offset, length = row
+        return self._map[offset:offset + length].decode('utf-8')
+
+    def get(self, url):
+        """Return url's article as to_csv.parse_block() does, or None."""
+        block = self.block(url)
+        return parse_block(block) if block is not None else None
+
+    def __contains__(self, url):
+        return self._conn.execute("SELECT 1 FROM entries WHERE url = ?", (url,)).fetchone() is not None
+
+    def _where(self, category, since, until):
+        clauses, params = [], []
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if since is not None:
+            clauses.append("published_at >= ?")
+            params.append(int(since))
+        if until is not None:
+            clauses.append("published_at < ?")
+            params.append(int(until))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, category=None, since=None, until=None):
+        """Count the articles in a category and/or published in [since, until) (epoch seconds)."""
+        where, params = self._where(category, since, until)
+        return self._conn.execute(f"SELECT COUNT(*) FROM entries{where}", params).fetchone()[0]
+
+    def urls(self, category=None, since=None, until=None):
+        """Yield the URLs of the matching articles, in file order."""
+        where, params = self._where(category, since, until)
+        for (url,) in self._conn.execute(f"SELECT url FROM entries{where} ORDER BY offset", params):
+            yield url
+
+    def find(self, category=None, since=None, until=None):
+        """Yield the matching articles, in file order."""
+        where, params = self._where(category, since, until)
+        rows = self._conn.execute(f"SELECT offset, length FROM entries{where} ORDER BY offset", params).fetchall()
+        for offset, length in rows:
+            yield parse_block(self._map[offset:offset + length].decode('utf-8'))
+
+    def close(self):
+        self._remap(0)
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def update(filename):
+    """Bring a file's index up to date after appending to it. Returns the number of articles indexed."""
+    with ArchiveIndex(filename) as index:
+        return index.count()
+
+def _epoch(day):
+    return int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Query an output file through its offset index.')
+    parser.add_argument('filename', help='Output file, e.g. ./article-visualization/public/data/cnn_articles.txt')
+    parser.add_argument('command', choices=['get', 'count', 'list', 'build'])
+    parser.add_argument('url', nargs='?', help='Article URL (for get)')
+    parser.add_argument('--category', help='Only articles in this category')
+    parser.add_argument('--since', type=_epoch, help='Only articles published on or after this day (YYYY-MM-DD)')
+    parser.add_argument('--until', type=_epoch, help='Only articles published before this day (YYYY-MM-DD)')
+
+    args = parser.parse_args()
+    if args.command == 'get' and not args.url:
+        parser.error("get needs a URL")
+
+    with ArchiveIndex(args.filename) as index:
+        if args.command == 'get':
+            article = index.get(args.url)
+            if article is None:
+                parser.exit(1, f"{args.url} is not in {args.filename}\n")
+            print(json.dumps(article, indent=2))
+        elif args.command == 'count':
+            print(index.count(args.category, args.since, args.until))
+        elif args.command == 'list':
+            for url in index.urls(args.category, args.since, args.until):
+                print(url)
+        else:
+            print(f"Indexed {index.count()} articles")
+
+if __name__ == "__main__":
+    main()
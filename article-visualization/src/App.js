@@ -1,6 +1,6 @@
 // App.js
 import React, { useEffect, useState } from 'react';
-import { fetchArticles } from './utils/parseData';
+import { fetchAggregates } from './utils/parseData';
 
 // Chart Components
 import ChartImagesPerArticle from './components/ChartImagesPerArticle';
@@ -14,17 +14,15 @@ import LoadingSpinner from './components/LoadingSpinner';
 import './App.css';
 
 function App() {
-  const [allArticles, setAllArticles] = useState([]);
+  const [aggregates, setAggregates] = useState({});
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
 
   useEffect(() => {
     async function loadData() {
       try {
-        const cnnArticles = await fetchArticles('/data/cnn_articles.txt', 'CNN');
-        const foxArticles = await fetchArticles('/data/fox_news_articles.txt', 'FOX');
-        // Combine them
-        setAllArticles([...cnnArticles, ...foxArticles]);
+        // Per-source chart data precomputed by build_aggregates.py
+        setAggregates(await fetchAggregates());
       } catch (err) {
         setError(err.message || 'Error loading data');
       } finally {
@@ -57,13 +55,13 @@ function App() {
         <p className="text-gray-400 text-sm mt-2">Data collected: December 15th 2024 - February 17th 2025</p>
         <div className="charts-container">
           <div className="chart-wrapper">
-            <ChartImagesPerArticle data={allArticles} />
+            <ChartImagesPerArticle data={aggregates} />
           </div>
           <div className="chart-wrapper">
-            <ChartWordsPerArticle data={allArticles} />
+            <ChartWordsPerArticle data={aggregates} />
           </div>
           <div className="chart-wrapper">
-            <ChartImageSizes data={allArticles} />
+            <ChartImageSizes data={aggregates} />
           </div>
         </div>
       </div>
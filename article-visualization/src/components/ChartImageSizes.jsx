@@ -13,54 +13,28 @@ import {
   Cell
 } from 'recharts';
 import { COLORS } from '../constants';
+import { aggregatesFor } from '../utils/parseData';
 
 // Import the CSS file
 import './ChartImageSizes.css';
 
 const categories = ['All', 'sports', 'health', 'science', 'politics'];
 
-/**
- * Groups points that share the same (x, y, source) and sets `z` = frequency.
- */
-function groupImagePoints(points) {
-  const map = new Map();
-  for (const pt of points) {
-    const key = `${pt.x}-${pt.y}-${pt.source}`;
-    if (!map.has(key)) {
-      map.set(key, { ...pt, z: 0 });
-    }
-    map.get(key).z += 1;
-  }
-  return [...map.values()];
-}
-
 function ChartImageSizes({ data }) {
   const [selectedCategory, setSelectedCategory] = useState('All');
 
-  // Filter articles based on selected category
-  const filteredArticles = data.filter(article =>
-    selectedCategory === 'All' ||
-    article.category.toLowerCase() === selectedCategory.toLowerCase()
-  );
+  // Aggregates of each source for the selected category
+  const filteredAggregates = aggregatesFor(data, selectedCategory);
+  const totalArticles = filteredAggregates.reduce((acc, agg) => acc + agg.articles, 0);
 
-  // Flatten and filter image data
-  const allPoints = [];
-  filteredArticles.forEach(article => {
-    article.images.forEach(img => {
-      if (img.width && img.height) {
-        allPoints.push({
-          x: img.width,
-          y: img.height,
-          title: article.title,
-          source: article.source
-        });
-      }
+  // One point per (width, height, source), with its frequency in `z`
+  const groupedPoints = [];
+  filteredAggregates.forEach(agg => {
+    agg.image_sizes.forEach(([width, height, count]) => {
+      groupedPoints.push({ x: width, y: height, z: count, source: agg.source });
     });
   });
 
-  // Group duplicates: same (width, height, source) => bigger bubble
-  const groupedPoints = groupImagePoints(allPoints);
-
   // Separate data into sources
   const sources = [...new Set(groupedPoints.map(d => d.source))];
 
@@ -99,7 +73,7 @@ function ChartImageSizes({ data }) {
       </div>
 
       {/* Display total number of articles */}
-      <p className="total-articles">Total Articles: {filteredArticles.length}</p>
+      <p className="total-articles">Total Articles: {totalArticles}</p>
 
       <div className="charts-flex-container">
         {/* Scatter Chart */}
@@ -144,8 +118,7 @@ function ChartImageSizes({ data }) {
                   const d = payload[0].payload;
                   return (
                     <div className="custom-tooltip">
-                      <p className="tooltip-title">{d.title}</p>
-                      <p>{d.x} × {d.y} px</p>
+                      <p className="tooltip-title">{d.x} × {d.y} px</p>
                       <p>Source: {d.source}</p>
                       <p>Count: {d.z}</p>
                     </div>
@@ -12,28 +12,13 @@ import {
   Bar
 } from 'recharts';
 import { COLORS } from '../constants';
+import { aggregatesFor } from '../utils/parseData';
 
 // Import the CSS file
 import './ChartImagesPerArticle.css';
 
 const categories = ['All', 'sports', 'health', 'science', 'politics'];
 
-/**
- * Group duplicates by (x, y, source) to aggregate frequency in `z`.
- */
-function groupPoints(points) {
-  const map = new Map();
-  for (const pt of points) {
-    // Key includes x, y, source so we track each unique coordinate + source
-    const key = `${pt.x}-${pt.y}-${pt.source}`;
-    if (!map.has(key)) {
-      map.set(key, { ...pt, z: 0 });
-    }
-    map.get(key).z += 1;
-  }
-  return [...map.values()];
-}
-
 function ChartImagesPerArticle({ data }) {
   const [selectedCategory, setSelectedCategory] = useState('All');
   const [minImageCount, setMinImageCount] = useState('');
@@ -41,8 +26,9 @@ function ChartImagesPerArticle({ data }) {
 
   // Determine the default max image count from data
   const defaultMax = useMemo(() => {
-    if (data.length === 0) return 10;
-    return Math.max(...data.map(article => article.images.length));
+    const counts = aggregatesFor(data, 'All').flatMap(agg => agg.images_per_article.map(([images]) => images));
+    if (counts.length === 0) return 10;
+    return Math.max(...counts);
   }, [data]);
 
   // Handle changes for min and max inputs
@@ -56,42 +42,33 @@ function ChartImagesPerArticle({ data }) {
     setMaxImageCount(value === '' ? '' : Number(value));
   };
 
-  // Filter + map to (x, y) for scatter
-  const filteredData = data
-    .filter(article => {
-      const categoryMatch =
-        selectedCategory === 'All'
-          ? true
-          : article.category.toLowerCase() === selectedCategory.toLowerCase();
-
-      const minMatch = minImageCount === '' || article.images.length >= minImageCount;
-      const maxMatch = maxImageCount === '' || article.images.length <= maxImageCount;
-
-      return categoryMatch && minMatch && maxMatch;
-    })
-    .map((article, idx) => ({
-      x: idx,
-      y: article.images.length,
-      title: article.title,
-      source: article.source,
-    }));
+  // Filter the distribution to the selected category and image count range
+  const filteredData = [];
+  aggregatesFor(data, selectedCategory).forEach(agg => {
+    agg.images_per_article.forEach(([images, count]) => {
+      const minMatch = minImageCount === '' || images >= minImageCount;
+      const maxMatch = maxImageCount === '' || images <= maxImageCount;
+      if (minMatch && maxMatch) {
+        filteredData.push({ x: images, y: count, z: count, source: agg.source });
+      }
+    });
+  });
 
-  // Group duplicates by (x, y, source)
-  const groupedData = groupPoints(filteredData);
+  const totalArticles = filteredData.reduce((acc, d) => acc + d.y, 0);
 
   // Separate by source for scatter chart
-  const sources = [...new Set(groupedData.map(d => d.source))];
+  const sources = [...new Set(filteredData.map(d => d.source))];
 
   // Build the distribution of articles by image count—but only for CNN and FOX.
   const distribution = {};
-  filteredData.forEach(article => {
+  filteredData.forEach(point => {
     // Only include articles from CNN or FOX
-    if (article.source !== 'CNN' && article.source !== 'FOX') return;
-    const count = article.y; // image count
+    if (point.source !== 'CNN' && point.source !== 'FOX') return;
+    const count = point.x; // image count
     if (!distribution[count]) {
       distribution[count] = { imageCount: Number(count), CNN: 0, FOX: 0 };
     }
-    distribution[count][article.source] += 1;
+    distribution[count][point.source] += point.y;
   });
   const barData = Object.values(distribution);
 
@@ -157,7 +134,7 @@ function ChartImagesPerArticle({ data }) {
       </div>
 
       {/* Display total number of articles */}
-      <p className="total-articles">Total Articles: {filteredData.length}</p>
+      <p className="total-articles">Total Articles: {totalArticles}</p>
 
       <div className="charts-flex-container">
         {/* Scatter Chart */}
@@ -171,22 +148,20 @@ function ChartImagesPerArticle({ data }) {
             <XAxis
               type="number"
               dataKey="x"
-              name="Article Index"
-              label={{ value: 'Article Index', position: 'bottom', fill: '#ccc' }}
+              name="Number of Images"
+              label={{ value: 'Number of Images', position: 'bottom', fill: '#ccc' }}
               tick={{ fill: '#ccc' }}
-              tickCount={10}
               domain={['dataMin', 'dataMax']}
-              tickFormatter={(value) => Math.round(value / 10) * 10}
+              allowDecimals={false}
             />
             <YAxis
               type="number"
               dataKey="y"
-              name="Number of Images"
-              label={{ value: 'Number of Images', angle: -90, position: 'insideLeft', fill: '#ccc' }}
+              name="Articles"
+              label={{ value: 'Articles', angle: -90, position: 'insideLeft', fill: '#ccc' }}
               tick={{ fill: '#ccc' }}
-              domain={['dataMin', 'dataMax']}
+              domain={[0, 'dataMax']}
               tickCount={10}
-              tickFormatter={(value) => Math.round(value / 5) * 5}
             />
             <ZAxis
               type="number"
@@ -202,10 +177,9 @@ function ChartImagesPerArticle({ data }) {
                   const d = payload[0].payload;
                   return (
                     <div className="custom-tooltip">
-                      <p className="tooltip-title">{d.title}</p>
-                      <p>Images: {d.y}</p>
+                      <p className="tooltip-title">Images: {d.x}</p>
                       <p>Source: {d.source}</p>
-                      <p>Count: {d.z}</p>
+                      <p>Articles: {d.y}</p>
                     </div>
                   );
                 }
@@ -217,7 +191,7 @@ function ChartImagesPerArticle({ data }) {
               <Scatter
                 key={source}
                 name={source}
-                data={groupedData.filter(d => d.source === source)}
+                data={filteredData.filter(d => d.source === source)}
                 fill={COLORS[source]}
                 stroke={COLORS[source]}
                 fillOpacity={0.6}
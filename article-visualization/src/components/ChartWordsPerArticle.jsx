@@ -13,27 +13,15 @@ import {
 } from 'recharts';
 import { COLORS } from '../constants';
 import LoadingSpinner from './LoadingSpinner'; // Import the spinner
+import { aggregatesFor } from '../utils/parseData';
 
 // Import the CSS file
 import './ChartWordsPerArticle.css';
 
 const categories = ['All', 'sports', 'health', 'science', 'politics'];
 
-/**
- * Group duplicates by (x, y, source) to aggregate frequency in `z`.
- */
-function groupPoints(points) {
-  const map = new Map();
-  for (const pt of points) {
-    // Key includes x, y, source
-    const key = `${pt.x}-${pt.y}-${pt.source}`;
-    if (!map.has(key)) {
-      map.set(key, { ...pt, z: 0 });
-    }
-    map.get(key).z += 1;
-  }
-  return [...map.values()];
-}
+// Must match WORD_BIN_WIDTH in build_aggregates.py
+const BIN_WIDTH = 250;
 
 function ChartWordsPerArticle({ data }) {
   const [selectedCategory, setSelectedCategory] = useState('All');
@@ -52,8 +40,9 @@ function ChartWordsPerArticle({ data }) {
 
   // Determine the default max word count from data
   const defaultMax = useMemo(() => {
-    if (data.length === 0) return 5000;
-    return Math.max(...data.map(article => article.wordCount));
+    const maxima = aggregatesFor(data, 'All').map(agg => agg.max_word_count);
+    if (maxima.length === 0) return 5000;
+    return Math.max(...maxima);
   }, [data]);
 
   // Handle changes for min and max inputs
@@ -67,66 +56,39 @@ function ChartWordsPerArticle({ data }) {
     setMaxWordCount(value === '' ? '' : Number(value));
   };
 
-  // Filter + map to (x, y) for scatter
+  // Keep the histogram bins that overlap the selected word count range
   const filteredData = useMemo(() => {
-    return data
-      .filter(article => {
-        const categoryMatch =
-          selectedCategory === 'All'
-            ? true
-            : article.category.toLowerCase() === selectedCategory.toLowerCase();
-
-        const minMatch = minWordCount === '' || article.wordCount >= minWordCount;
-        const maxMatch = maxWordCount === '' || article.wordCount <= maxWordCount;
-
-        return categoryMatch && minMatch && maxMatch;
-      })
-      .map((article, idx) => ({
-        x: idx,
-        y: article.wordCount,
-        title: article.title,
-        source: article.source,
-      }));
+    const points = [];
+    aggregatesFor(data, selectedCategory).forEach(agg => {
+      agg.word_count_histogram.forEach(([binStart, count]) => {
+        const binEnd = binStart + BIN_WIDTH - 1;
+        const minMatch = minWordCount === '' || binEnd >= minWordCount;
+        const maxMatch = maxWordCount === '' || binStart <= maxWordCount;
+        if (minMatch && maxMatch) {
+          points.push({ x: binStart, y: count, z: count, source: agg.source });
+        }
+      });
+    });
+    return points;
   }, [data, selectedCategory, minWordCount, maxWordCount]);
 
-  // Group duplicates
-  const groupedData = useMemo(() => groupPoints(filteredData), [filteredData]);
+  const totalArticles = filteredData.reduce((acc, d) => acc + d.y, 0);
 
   // Separate by source for the scatter chart
-  const sources = useMemo(() => [...new Set(groupedData.map(d => d.source))], [groupedData]);
+  const sources = useMemo(() => [...new Set(filteredData.map(d => d.source))], [filteredData]);
 
-  // Calculate bar chart data: bin the word counts into fixed 250-word increments
+  // Calculate bar chart data: one entry per 250-word bin with a count for each source
   const barData = useMemo(() => {
-    if (filteredData.length === 0) return [];
-    const wordCounts = filteredData.map(article => article.y);
-    const min = Math.floor(Math.min(...wordCounts) / 250) * 250;
-    const max = Math.ceil(Math.max(...wordCounts) / 250) * 250;
-    const binWidth = 250;
-    const numBins = Math.ceil((max - min) / binWidth);
-    const bins = [];
-    
-    for (let i = 0; i < numBins; i++) {
-      const binStart = min + i * binWidth;
-      const binEnd = binStart + binWidth - 1;
-      bins.push({
-        range: `${binStart}-${binEnd}`,
-        FOX: 0,
-        CNN: 0,
-      });
-    }
-
-    // Only include FOX and CNN articles in the bar chart
-    filteredData.forEach(article => {
-      if (article.source !== 'FOX' && article.source !== 'CNN') return;
-      const value = article.y;
-      const binIndex = Math.floor((value - min) / binWidth);
-      if (binIndex >= 0 && binIndex < bins.length) {
-        bins[binIndex][article.source] += 1;
+    const bins = new Map();
+    filteredData.forEach(point => {
+      // Only include FOX and CNN articles in the bar chart
+      if (point.source !== 'FOX' && point.source !== 'CNN') return;
+      if (!bins.has(point.x)) {
+        bins.set(point.x, { binStart: point.x, range: `${point.x}-${point.x + BIN_WIDTH - 1}`, FOX: 0, CNN: 0 });
       }
+      bins.get(point.x)[point.source] += point.y;
     });
-
-    // Filter out bins with zero articles for both sources
-    return bins.filter(bin => bin.FOX > 0 || bin.CNN > 0);
+    return [...bins.values()].sort((a, b) => a.binStart - b.binStart);
   }, [filteredData]);
 
   // Set chart dimensions
@@ -199,7 +161,7 @@ function ChartWordsPerArticle({ data }) {
       </div>
 
       {/* Display total number of articles */}
-      <p className="total-articles">Total Articles: {filteredData.length}</p>
+      <p className="total-articles">Total Articles: {totalArticles}</p>
 
       <div className="charts-flex-container">
         {/* Scatter Chart */}
@@ -213,22 +175,21 @@ function ChartWordsPerArticle({ data }) {
             <XAxis
               type="number"
               dataKey="x"
-              name="Article Index"
-              label={{ value: 'Article Index', position: 'bottom', fill: '#ccc' }}
+              name="Word Count"
+              label={{ value: 'Word Count', position: 'bottom', fill: '#ccc' }}
               tick={{ fill: '#ccc' }}
               tickCount={10}
               domain={['dataMin', 'dataMax']}
-              tickFormatter={(value) => Math.round(value / 10) * 10}
+              tickFormatter={(value) => Math.round(value / 500) * 500}
             />
             <YAxis
               type="number"
               dataKey="y"
-              name="Word Count"
-              label={{ value: 'Word Count', angle: -90, position: 'insideLeft', fill: '#ccc' }}
+              name="Articles"
+              label={{ value: 'Articles', angle: -90, position: 'insideLeft', fill: '#ccc' }}
               tick={{ fill: '#ccc' }}
-              domain={['dataMin', 'dataMax']}
+              domain={[0, 'dataMax']}
               tickCount={10}
-              tickFormatter={(value) => Math.round(value / 500) * 500}
             />
             <ZAxis
               type="number"
@@ -244,10 +205,9 @@ function ChartWordsPerArticle({ data }) {
                   const d = payload[0].payload;
                   return (
                     <div className="custom-tooltip">
-                      <p className="tooltip-title">{d.title}</p>
-                      <p>Words: {d.y}</p>
+                      <p className="tooltip-title">Words: {d.x}-{d.x + BIN_WIDTH - 1}</p>
                       <p>Source: {d.source}</p>
-                      <p>Count: {d.z}</p>
+                      <p>Articles: {d.y}</p>
                     </div>
                   );
                 }
@@ -259,7 +219,7 @@ function ChartWordsPerArticle({ data }) {
               <Scatter
                 key={source}
                 name={source}
-                data={groupedData.filter(d => d.source === source)}
+                data={filteredData.filter(d => d.source === source)}
                 fill={COLORS[source]}
                 stroke={COLORS[source]}
                 fillOpacity={0.6}
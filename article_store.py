@@ -0,0 +1,157 @@
+import csv
+import os
+import re
+import sqlite3
+
+import dedup
+import storage
+import to_csv
+from common import published_timestamp
+
+DB_PATH = "./articles.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    category TEXT NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT NOT NULL,
+    published_at INTEGER,
+    word_count INTEGER NOT NULL,
+    image_count INTEGER NOT NULL,
+    image_sizes TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_articles_source_category ON articles (source, category);
+CREATE INDEX IF NOT EXISTS idx_articles_published_at ON articles (published_at);
+"""
+
+CSV_FIELDNAMES = to_csv.FIELDNAMES
+
+def open_store(path=DB_PATH):
+    """Open (and create if needed) the article database."""
+    conn = sqlite3.connect(path)
+    # WAL lets pipeline threads read while the writer commits
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA + dedup.SCHEMA)
+    return conn
+
+def _to_row(source, info):
+    """Convert an article dict in the .txt layout into a database row."""
+    word_count = info['Word Count']
+    if isinstance(word_count, str):
+        word_count = int(word_count.split()[0])
+
+    images = info['Images']
+    image_sizes = info.get('Image Sizes')
+    if isinstance(images, str):
+        match = re.match(r'(\d+) \(Sizes: (.*)\)', images)
+        image_count = int(match.group(1))
+        image_sizes = match.group(2)
+    else:
+        image_count = images
+
+    return (info['URL'], source, info['Category'], info['Title'], info['Date'],
+            published_timestamp(info['Date']), word_count, image_count, image_sizes or '')
+
+def has_url(conn, url):
+    """Check whether an article URL is already stored."""
+    return conn.execute("SELECT 1 FROM articles WHERE url = ?", (url,)).fetchone() is not None
+
+def count_articles(conn, source=None):
+    """Count stored articles, optionally for a single source."""
+    if source is None:
+        return conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+    return conn.execute("SELECT COUNT(*) FROM articles WHERE source = ?", (source,)).fetchone()[0]
+
+def add_articles(conn, source, articles):
+    """Insert a batch of articles in a single transaction. Returns the number added."""
+    rows = [_to_row(source, info) for info in articles]
+    with conn:
+        before = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return conn.total_changes - before
+
+def remove_urls(conn, urls):
+    """Delete articles and their fingerprints by URL in a single transaction."""
+    with conn:
+        conn.executemany("DELETE FROM articles WHERE url = ?", [(url,) for url in urls])
+        dedup.remove_urls(conn, urls)
+
+def import_txt(conn, source, filename):
+    """Load articles from an existing .txt output file. Returns the number added."""
+    if not os.path.exists(filename):
+        return 0
+    articles = (a for a in to_csv.iter_articles(filename) if a.get('URL') and a.get('Word Count') is not None)
+    return add_articles(conn, source, articles)
+
+def iter_articles(conn, source):
+    """Yield a source's articles as dicts in the .txt layout, in insertion order."""
+    cursor = conn.execute(
+        "SELECT category, title, url, date, word_count, image_count, image_sizes "
+        "FROM articles WHERE source = ? ORDER BY rowid", (source,))
+    for category, title, url, date, word_count, image_count, image_sizes in cursor:
+        yield {
+            'Category': category,
+            'Title': title,
+            'URL': url,
+            'Date': date,
+            'Word Count': word_count,
+            'Images': image_count,
+            'Image Sizes': image_sizes,
+        }
+
+def export_txt(conn, source, filename):
+    """
+    Write a source's articles in the .txt layout read by article-visualization.
+
+    The file is replaced atomically and gets a fresh manifest, so readers
+    never see it half-written.
+    """
+    count = count_articles(conn, source)
+    with storage.atomic_rewrite(filename) as f:
+        f.write(storage.format_header(count))
+        for info in iter_articles(conn, source):
+            f.write(f"Category: {info['Category']}\n")
+            f.write(f"Title: {info['Title']}\n")
+            f.write(f"URL: {info['URL']}\n")
+            f.write(f"Date: {info['Date']}\n")
+            f.write(f"Word Count: {info['Word Count']} words\n")
+            f.write(f"Images: {info['Images']} (Sizes: {info['Image Sizes']})\n")
+            f.write("\n")
+    storage.write_manifest(filename, {'total_articles': count, 'size': os.path.getsize(filename)})
+
+def export_csv(conn, source, filename):
+    """Write a source's articles in the same CSV layout as to_csv.py."""
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(iter_articles(conn, source))
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import or export articles from the SQLite article store.')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('source', help='Source name, e.g. cnn or fox')
+    parser.add_argument('--txt', help='Path to the .txt file to import from or export to')
+    parser.add_argument('--csv', help='Path to the .csv file to export to')
+    parser.add_argument('--db', default=DB_PATH, help='Path to the article database')
+
+    args = parser.parse_args()
+    conn = open_store(args.db)
+
+    if args.command == 'import':
+        if not args.txt:
+            parser.error('import requires --txt')
+        print(f"Imported {import_txt(conn, args.source, args.txt)} articles")
+    else:
+        if args.txt:
+            export_txt(conn, args.source, args.txt)
+            print(f"Exported {count_articles(conn, args.source)} articles to {args.txt}")
+        if args.csv:
+            export_csv(conn, args.source, args.csv)
+            print(f"Exported {count_articles(conn, args.source)} articles to {args.csv}")
+
+if __name__ == "__main__":
+    main()
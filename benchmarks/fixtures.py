@@ -0,0 +1,210 @@
+"""
+Fixture sets for the benchmark stub server.
+
+A fixture set is a directory with a manifest.json and the response bodies it
+points to. Paths are the original URL without the scheme (for example
+/www.cnn.com/politics), and "__BASE__" in a body is replaced with the stub
+server's address, so links keep pointing at the stub.
+
+    python benchmarks/fixtures.py synthesize benchmarks/fixtures/synthetic
+    python benchmarks/fixtures.py record benchmarks/fixtures/recorded
+"""
+import itertools
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASE_TOKEN = "__BASE__"
+MANIFEST = "manifest.json"
+SYNTHETIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "synthetic")
+
+CNN_CATEGORIES = {'politics': 'politics', 'science': 'science', 'health': 'health', 'sports': 'sport'}
+CNN_CONTAINER = 'container__field-links container_lead-plus-headlines__field-links'
+FOX_CATEGORIES = ['politics', 'science', 'health', 'sports']
+
+WORDS = ("the of and to in a is that for on with as by at from said officials new year state people "
+         "report health game team study researchers president court election season data could").split()
+
+def _vocabulary(size=5000, seed=0):
+    """Common words plus made-up ones, with Zipf-like weights, so article bodies differ like real ones."""
+    rng = random.Random(seed)
+    syllables = ['ba', 'ko', 'ri', 'den', 'sa', 'mor', 'li', 'tan', 've', 'ga', 'nu', 'pel', 'os', 'ter', 'chi']
+    words = list(WORDS)
+    while len(words) < size:
+        words.append(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    return words, cum_weights
+
+VOCABULARY, VOCABULARY_WEIGHTS = _vocabulary()
+
+def path_of(url):
+    """Return the stub path for a live URL."""
+    parsed = urlparse(url)
+    return f"/{parsed.netloc}{parsed.path}" + (f"?{parsed.query}" if parsed.query else "")
+
+def _localize(body, hosts):
+    """Point absolute links to the given hosts at the stub server."""
+    for host in hosts:
+        body = body.replace(f"https://{host}", f"{BASE_TOKEN}/{host}")
+    return body
+
+class FixtureWriter:
+    """Collect routes and bodies and write them out as a fixture set."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = {'cnn_sections': {}, 'fox_feeds': {}, 'cnn_articles': [], 'fox_articles': [], 'routes': {}}
+        os.makedirs(os.path.join(directory, 'bodies'), exist_ok=True)
+
+    def add(self, path, body, content_type='text/html; charset=utf-8'):
+        name = f"bodies/{len(self.manifest['routes']):05d}"
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            f.write(body)
+        self.manifest['routes'][path] = {'file': name, 'content_type': content_type}
+
+    def save(self):
+        with open(os.path.join(self.directory, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+
+def load(directory):
+    """Read a fixture set's manifest."""
+    with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _paragraphs(rng, words):
+    paragraphs = []
+    while words > 0:
+        length = min(words, rng.randint(20, 80))
+        paragraphs.append(' '.join(rng.choices(VOCABULARY, cum_weights=VOCABULARY_WEIGHTS, k=length)).capitalize() + '.')
+        words -= length
+    return paragraphs
+
+def _cnn_article(rng, title, published):
+    paragraphs = ''.join(f'<p class="paragraph inline-placeholder">{text}</p>\n'
+                         for text in _paragraphs(rng, rng.randint(150, 2500)))
+    images = ''.join(f'<img class="image__dam-img" src="/img/{i}.jpg" width="1600" height="{rng.choice([900, 1067, 1200])}">\n'
+                     for i in range(rng.randint(0, 6)))
+    # Filler markup the parser has to skip, roughly the size of a real page
+    navigation = '<nav class="header__nav">' + '<a href="/">Section</a>' * 200 + '</nav>'
+    scripts = '<script>window.__DATA__ = {};</script>' * 50
+    return (f'<html><head><title>{title}</title>'
+            f'<meta property="article:published_time" content="{published.isoformat()}">{scripts}</head>'
+            f'<body>{navigation}<h1 class="headline__text">{title}</h1>'
+            f'<div class="article__content">{paragraphs}{images}'
+            f'<div class="related-content"><img class="image__related" width="300" height="169"></div>'
+            f'</div></body></html>')
+
+def _fox_article(rng, title):
+    paragraphs = ''.join(f'<p>{text}</p>\n' for text in _paragraphs(rng, rng.randint(150, 2000)))
+    images = ''.join(f'<img src="/img/{i}.jpg" width="1200" height="675">' for i in range(rng.randint(0, 5)))
+    navigation = '<nav class="site-nav">' + '<a href="/">Section</a>' * 200 + '</nav>'
+    return (f'<html><head><title>{title}</title></head><body>{navigation}'
+            f'<h1 class="headline">{title}</h1><div class="article-body">{paragraphs}{images}'
+            f'<img src="/ad.jpg" width="896" height="500"></div></body></html>')
+
+def synthesize(directory=SYNTHETIC_DIR, per_category=25, seed=0):
+    """
+    Generate a deterministic fixture set shaped like the live CNN and Fox pages.
+
+    Every category gets a section page (CNN) or RSS feed (Fox) linking
+    per_category articles, most of them inside the scrapers' date range.
+    """
+    rng = random.Random(seed)
+    fixtures = FixtureWriter(directory)
+    start = datetime(2024, 12, 20, tzinfo=timezone.utc)
+
+    for category, slug in CNN_CATEGORIES.items():
+        links = []
+        for i in range(per_category):
+            published = start + timedelta(days=rng.randint(-10, 55), minutes=i)
+            path = f"/www.cnn.com/{published:%Y/%m/%d}/{slug}/story-{category}-{i}/index.html"
+            fixtures.add(path, _cnn_article(rng, f"CNN {category} story {i}", published))
+            fixtures.manifest['cnn_articles'].append(path)
+            links.append(f'<a href="{BASE_TOKEN}{path}">story {i}</a>')
+        section = f"/www.cnn.com/{slug}"
+        fixtures.add(section, f'<html><body><div class="{CNN_CONTAINER}">{"".join(links)}</div></body></html>')
+        fixtures.manifest['cnn_sections'][section] = [CNN_CONTAINER]
+
+    for category in FOX_CATEGORIES:
+        items = []
+        for i in range(per_category):
+            published = start + timedelta(days=rng.randint(-10, 55), minutes=i)
+            path = f"/www.foxnews.com/{category}/story-{i}"
+            fixtures.add(path, _fox_article(rng, f"Fox {category} story {i}"))
+            fixtures.manifest['fox_articles'].append(path)
+            items.append(f"<item><title>Fox {category} story {i}</title><link>{BASE_TOKEN}{path}</link>"
+                         f"<pubDate>{format_datetime(published)}</pubDate></item>")
+        feed = f"/moxie.foxnews.com/google-publisher/{category}.xml"
+        fixtures.add(feed, f'<?xml version="1.0"?><rss version="2.0"><channel><title>{category}</title>'
+                           f'{"".join(items)}</channel></rss>', 'application/rss+xml')
+        fixtures.manifest['fox_feeds'][category] = feed
+
+    fixtures.save()
+    return directory
+
+def record(directory, per_category=10):
+    """
+    Record the live CNN section pages and Fox feeds, plus some of their articles.
+
+    Article links are read from the pages fetched here rather than through
+    the scrapers' HTTP cache, which would report pages it has already seen
+    as unchanged and list no articles for them.
+    """
+    import cnn_scraper
+    import fox_scraper
+    import http_client
+
+    hosts = ['www.cnn.com', 'edition.cnn.com', 'www.foxnews.com', 'moxie.foxnews.com']
+    fixtures = FixtureWriter(directory)
+
+    for section_url, containers in cnn_scraper.SECTIONS.items():
+        body = http_client.get(section_url).text
+        article_urls = cnn_scraper.parse_section(body, section_url, containers)
+        # Relative links would resolve against the stub's root, so make them absolute first
+        body = body.replace('href="/', f'href="https://{urlparse(section_url).netloc}/')
+        fixtures.add(path_of(section_url), _localize(body, hosts))
+        fixtures.manifest['cnn_sections'][path_of(section_url)] = containers
+        for url in article_urls[:per_category]:
+            fixtures.add(path_of(url), http_client.get(url).text)
+            fixtures.manifest['cnn_articles'].append(path_of(url))
+
+    for category in FOX_CATEGORIES:
+        rss_url = fox_scraper.CUSTOM_RSS_LINKS[category]
+        response = http_client.get(rss_url)
+        fixtures.add(path_of(rss_url), _localize(response.text, hosts), 'application/rss+xml')
+        fixtures.manifest['fox_feeds'][category] = path_of(rss_url)
+        for article in fox_scraper.parse_feed(response.content)[:per_category]:
+            fixtures.add(path_of(article['url']), http_client.get(article['url']).text)
+            fixtures.manifest['fox_articles'].append(path_of(article['url']))
+
+    fixtures.save()
+    return directory
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Create a fixture set for the benchmark stub server.')
+    parser.add_argument('command', choices=['synthesize', 'record'])
+    parser.add_argument('directory', nargs='?', default=SYNTHETIC_DIR, help='Directory to write the fixture set to')
+    parser.add_argument('--per-category', type=int, default=None, help='Articles per category')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for synthesize')
+    args = parser.parse_args()
+
+    if args.command == 'synthesize':
+        synthesize(args.directory, args.per_category or 25, args.seed)
+    else:
+        record(args.directory, args.per_category or 10)
+    manifest = load(args.directory)
+    print(f"Wrote fixtures to {args.directory}: {len(manifest['cnn_articles'])} CNN and "
+          f"{len(manifest['fox_articles'])} Fox articles")
+    if not (manifest['cnn_articles'] and manifest['fox_articles']):
+        print("Warning: a source has no articles, so its article stages will have nothing to fetch")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Offline benchmarks for the scrapers and the output file tools.
+
+Each stage runs in a fresh process against the local stub server, so peak
+RSS is measured per stage. Reports articles/sec, parse ms/article, bytes
+transferred and peak RSS.
+
+    python benchmarks/run.py                                # all stages
+    python benchmarks/run.py --save-baseline baseline.json
+    python benchmarks/run.py --compare baseline.json        # exits 1 on a regression
+"""
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fixtures
+from stub_server import StubServer
+
+STAGES = ['cnn_articles', 'fox_articles', 'end_to_end', 'clean', 'to_csv', 'archive_index']
+
+# A stage regresses when its throughput falls more than this far below the baseline
+DEFAULT_TOLERANCE = 0.15
+
+# Articles in the synthetic output file used by the clean, to_csv and archive_index stages
+CLEAN_ARTICLES = 20000
+
+def _peak_rss_mb():
+    """Peak RSS of this process or any of its children (ru_maxrss is in KB on Linux)."""
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(max(self_peak, children_peak) / scale, 1)
+
+def _article_stage(urls, fetch, parse):
+    """Fetch and parse every url in turn, timing the two steps separately."""
+    from rejection_cache import ArticleRejected
+
+    fetch_seconds = parse_seconds = 0.0
+    parsed = articles = 0
+    for url in urls:
+        started = time.perf_counter()
+        try:
+            content = fetch(url)
+        except ArticleRejected:
+            fetch_seconds += time.perf_counter() - started
+            continue
+        fetched = time.perf_counter()
+        fetch_seconds += fetched - started
+        try:
+            parse(url, content)
+            articles += 1
+        except ArticleRejected:
+            pass
+        parse_seconds += time.perf_counter() - fetched
+        parsed += 1
+
+    return {
+        'items': len(urls),
+        'articles': articles,
+        'seconds': fetch_seconds + parse_seconds,
+        'fetch_seconds': fetch_seconds,
+        'parse_ms_per_article': parse_seconds * 1000 / parsed if parsed else 0.0,
+    }
+
+def stage_cnn_articles(manifest, base_url, options):
+    """CNN articles through fetch_cnn_article and parse_cnn_article, timed separately."""
+    import cnn_scraper
+    urls = [base_url + path for path in manifest['cnn_articles']]
+    return _article_stage(urls, cnn_scraper.fetch_cnn_article, cnn_scraper.parse_cnn_article)
+
+def stage_fox_articles(manifest, base_url, options):
+    """Fox articles through fetch_article and parse_article, timed separately."""
+    import fox_scraper
+    urls = [base_url + path for path in manifest['fox_articles']]
+    return _article_stage(urls, fox_scraper.fetch_article, fox_scraper.parse_article)
+
+def stage_end_to_end(manifest, base_url, options):
+    """Both sources through the scheduler, from discovery to the output files."""
+    import cnn_scraper
+    import fox_scraper
+    import storage
+    from scheduler import run_sources
+
+    cnn = cnn_scraper.CnnSource(
+        sections={base_url + path: containers for path, containers in manifest['cnn_sections'].items()},
+        filename='cnn_articles.txt')
+    fox = fox_scraper.FoxSource(
+        filename='fox_news_articles.txt',
+        rss_links={category: base_url + path for category, path in manifest['fox_feeds'].items()})
+
+    # Every fixture is served from one host, so give it the limits of a real one
+    host = urlparse(base_url).netloc
+    for source in (cnn, fox):
+        source.rate_limits = {host: (options['per_host'], options['politeness_delay'])}
+
+    started = time.perf_counter()
+    run_sources([cnn, fox], parse_workers=options['parse_workers'])
+    seconds = time.perf_counter() - started
+
+    return {
+        'items': len(manifest['cnn_articles']) + len(manifest['fox_articles']),
+        'articles': storage.total_articles(cnn.filename) + storage.total_articles(fox.filename),
+        'seconds': seconds,
+    }
+
+def _write_output_file(filename, count):
+    """Write a scraper output file with count articles, a few of them outliers."""
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(f"Total Articles: {count}\n\n")
+        for i in range(count):
+            word_count = 5000 if i % 50 == 0 else 200 + i % 2500
+            f.write(f"Category: politics\n"
+                    f"Title: Benchmark article {i}\n"
+                    f"URL: https://www.example.com/{i}\n"
+                    f"Date: Wed, 08 Jan 2025 20:23:05 -0500\n"
+                    f"Word Count: {word_count} words\n"
+                    f"Images: 2 (Sizes: 1200x675, 1600x900)\n\n")
+
+def stage_clean(manifest, base_url, options):
+    """clean_existing_file on a large output file: a full pass, then an incremental one."""
+    import cnn_scraper
+    import storage
+
+    count = options['clean_articles']
+    _write_output_file('cnn_articles.txt', count)
+
+    started = time.perf_counter()
+    cnn_scraper.clean_existing_file('cnn_articles.txt', incremental=False)
+    seconds = time.perf_counter() - started
+
+    # Then the common case: a run's worth of new articles on top of a clean file
+    with storage.ArticleWriter('cnn_articles.txt') as writer:
+        for i in range(100):
+            writer.append(f"Category: politics\nTitle: New {i}\nURL: https://www.example.com/new/{i}\n"
+                          f"Date: Wed, 08 Jan 2025 20:23:05 -0500\nWord Count: 300 words\n"
+                          f"Images: 1 (Sizes: 1200x675)")
+    started = time.perf_counter()
+    cnn_scraper.clean_existing_file('cnn_articles.txt')
+    incremental_seconds = time.perf_counter() - started
+
+    return {
+        'items': count,
+        'articles': count,
+        'seconds': seconds,
+        'incremental_ms': incremental_seconds * 1000,
+    }
+
+def stage_to_csv(manifest, base_url, options):
+    """to_csv.parse_text_file and write_csv on a large output file."""
+    import to_csv
+
+    count = options['clean_articles']
+    _write_output_file('articles.txt', count)
+
+    started = time.perf_counter()
+    parsed = len(to_csv.parse_text_file('articles.txt'))
+    parse_seconds = time.perf_counter() - started
+    to_csv.write_csv(to_csv.iter_articles('articles.txt'), 'articles.csv')
+    seconds = time.perf_counter() - started
+
+    return {
+        'items': count,
+        'articles': parsed,
+        'seconds': seconds,
+        'parse_ms_per_article': parse_seconds * 1000 / parsed if parsed else 0.0,
+    }
+
+def stage_archive_index(manifest, base_url, options):
+    """Build the offset index of a large output file, then refresh it and look URLs up through it."""
+    import archive_index
+    import storage
+
+    count = options['clean_articles']
+    _write_output_file('articles.txt', count)
+
+    started = time.perf_counter()
+    archive_index.update('articles.txt')
+    seconds = time.perf_counter() - started
+
+    with archive_index.ArchiveIndex('articles.txt') as index:
+        # A run's worth of new articles on top of the indexed file
+        with storage.ArticleWriter('articles.txt') as writer:
+            for i in range(100):
+                writer.append(f"Category: politics\nTitle: New {i}\nURL: https://www.example.com/new/{i}\n"
+                              f"Date: Wed, 08 Jan 2025 20:23:05 -0500\nWord Count: 300 words\n"
+                              f"Images: 1 (Sizes: 1200x675)")
+        started = time.perf_counter()
+        index.refresh()
+        incremental_seconds = time.perf_counter() - started
+
+        urls = [f"https://www.example.com/{i}" for i in range(0, count, max(count // 1000, 1))]
+        started = time.perf_counter()
+        for url in urls:
+            index.get(url)
+        lookup_seconds = time.perf_counter() - started
+
+    return {
+        'items': count,
+        'articles': count,
+        'seconds': seconds,
+        'incremental_ms': incremental_seconds * 1000,
+        'lookup_us': lookup_seconds * 1e6 / len(urls),
+    }
+
+def run_stage(name, fixture_dir, base_url, options, result_file):
+    """Run one stage in this process (inside a scratch directory) and write its result."""
+    manifest = fixtures.load(fixture_dir)
+    workdir = tempfile.mkdtemp(prefix=f'bench-{name}-')
+    os.chdir(workdir)
+    try:
+        result = globals()[f'stage_{name}'](manifest, base_url, options)
+    finally:
+        os.chdir('/')
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result['articles_per_sec'] = result['articles'] / result['seconds'] if result['seconds'] else 0.0
+    result['peak_rss_mb'] = _peak_rss_mb()
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+def run_benchmarks(fixture_dir, stages, options, latency=0.0, jitter=0.0, failure_rate=0.0, verbose=False):
+    """Run each stage in a child process against a fresh stub server. Returns results by stage."""
+    results = {}
+    with StubServer(fixture_dir, latency, jitter, failure_rate) as stub:
+        for name in stages:
+            stub.reset_counters()
+            fd, result_file = tempfile.mkstemp(suffix='.json')
+            os.close(fd)
+            command = [sys.executable, os.path.abspath(__file__), '--stage', name,
+                       '--fixtures', os.path.abspath(fixture_dir), '--base-url', stub.base_url,
+                       '--result-file', result_file, '--options', json.dumps(options)]
+            # The scrapers print a line per article; keep them quiet unless asked
+            output = None if verbose else subprocess.DEVNULL
+            subprocess.run(command, check=True, stdout=output)
+            with open(result_file, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.remove(result_file)
+            result['bytes'] = stub.bytes_sent
+            result['requests'] = stub.requests
+            results[name] = result
+    return results
+
+def _format(value):
+    return '-' if value is None else f"{value:.2f}"
+
+def print_report(results, baseline=None):
+    print(f"{'stage':<14}{'articles':>9}{'seconds':>9}{'articles/s':>12}{'parse ms':>10}{'bytes':>12}{'peak MB':>9}"
+          + (f"{'vs base':>9}" if baseline else ''))
+    for name, result in results.items():
+        line = (f"{name:<14}{result['articles']:>9}{result['seconds']:>9.2f}{result['articles_per_sec']:>12.1f}"
+                f"{_format(result.get('parse_ms_per_article')):>10}{result['bytes']:>12}{result['peak_rss_mb']:>9.1f}")
+        if baseline and name in baseline and baseline[name]['articles_per_sec']:
+            change = result['articles_per_sec'] / baseline[name]['articles_per_sec'] - 1
+            line += f"{change:>+9.1%}"
+        print(line)
+
+def regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the stages whose throughput fell more than tolerance below the baseline."""
+    return [name for name, result in results.items()
+            if name in baseline
+            and result['articles_per_sec'] < baseline[name]['articles_per_sec'] * (1 - tolerance)]
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers offline against a local stub server.')
+    parser.add_argument('stages', nargs='*', help=f"Stages to run: {', '.join(STAGES)} (default: all)")
+    parser.add_argument('--fixtures', default=fixtures.SYNTHETIC_DIR,
+                        help='Fixture set directory (the synthetic set is generated if missing)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the stub adds to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds per response')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests the stub fails')
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(), help='Parse processes for end_to_end')
+    parser.add_argument('--per-host', type=int, default=8, help='Concurrent requests to the stub in end_to_end')
+    parser.add_argument('--politeness-delay', type=float, default=0.0, help='Delay between request starts in end_to_end')
+    parser.add_argument('--clean-articles', type=int, default=CLEAN_ARTICLES, help='Articles in the clean/to_csv file')
+    parser.add_argument('--save-baseline', metavar='FILE', help='Write the results to FILE')
+    parser.add_argument('--compare', metavar='FILE', help='Compare with a saved baseline and exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Allowed throughput drop vs the baseline')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    parser.add_argument('--verbose', action='store_true', help="Show the scrapers' output")
+    # Used by the parent process to run a single stage in a child
+    parser.add_argument('--stage', help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    parser.add_argument('--options', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage(args.stage, args.fixtures, args.base_url, json.loads(args.options), args.result_file)
+        return
+
+    unknown = sorted(set(args.stages) - set(STAGES))
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    if not os.path.exists(os.path.join(args.fixtures, fixtures.MANIFEST)):
+        if os.path.abspath(args.fixtures) != fixtures.SYNTHETIC_DIR:
+            parser.error(f"no fixture set in {args.fixtures}")
+        print("Generating synthetic fixtures...")
+        fixtures.synthesize(args.fixtures)
+
+    options = {
+        'parse_workers': args.parse_workers,
+        'per_host': args.per_host,
+        'politeness_delay': args.politeness_delay,
+        'clean_articles': args.clean_articles,
+    }
+    results = run_benchmarks(args.fixtures, args.stages or STAGES, options,
+                             args.latency, args.jitter, args.failure_rate, args.verbose)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if baseline:
+        regressed = regressions(results, baseline, args.tolerance)
+        if regressed:
+            print(f"Throughput regressed by more than {args.tolerance:.0%} in: {', '.join(regressed)}")
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
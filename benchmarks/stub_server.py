@@ -0,0 +1,156 @@
+"""
+Local HTTP server that replays a fixture set with configurable latency and failures.
+
+    python benchmarks/stub_server.py benchmarks/fixtures/synthetic --latency 0.05 --failure-rate 0.02
+"""
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fixtures
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this every response
+    # waits on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub.delay()
+
+        failure = stub.failure()
+        if failure == 'reset':
+            # Drop the connection without a response
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.close_connection = True
+            return
+        if failure == 'error':
+            self._send(503, b'Service Unavailable', 'text/plain')
+            return
+
+        route = stub.routes.get(self.path)
+        if route is None:
+            self._send(404, b'Not Found', 'text/plain')
+            return
+        self._send(200, stub.body(route), route['content_type'])
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stub.count(len(body))
+
+    def log_message(self, *args):
+        pass
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hang up early on purpose (the scrapers stop reading after
+        # </head> or at the size cap), so only report unexpected errors
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class StubServer:
+    """
+    Serve a fixture set on localhost from a background thread.
+
+    latency and jitter (seconds) delay every response; failure_rate is the
+    fraction of requests that fail, split between 503 responses and dropped
+    connections.
+    """
+
+    def __init__(self, fixture_dir, latency=0.0, jitter=0.0, failure_rate=0.0, seed=0):
+        self.fixture_dir = fixture_dir
+        self.manifest = fixtures.load(fixture_dir)
+        self.routes = self.manifest['routes']
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self.requests = 0
+        self.bytes_sent = 0
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.stub = self
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def url(self, path):
+        return self.base_url + path
+
+    def body(self, route):
+        """Return a route's body with links pointed at this server, cached after the first read."""
+        body = self._bodies.get(route['file'])
+        if body is None:
+            with open(os.path.join(self.fixture_dir, route['file']), 'r', encoding='utf-8') as f:
+                body = f.read().replace(fixtures.BASE_TOKEN, self.base_url).encode('utf-8')
+            self._bodies[route['file']] = body
+        return body
+
+    def delay(self):
+        with self._lock:
+            seconds = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if seconds:
+            time.sleep(seconds)
+
+    def failure(self):
+        """Return None, 'error' or 'reset' for the next request."""
+        with self._lock:
+            if self._random.random() >= self.failure_rate:
+                return None
+            return self._random.choice(['error', 'reset'])
+
+    def count(self, size):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve a benchmark fixture set.')
+    parser.add_argument('fixtures', nargs='?', default=fixtures.SYNTHETIC_DIR, help='Fixture set directory')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds, at random')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    args = parser.parse_args()
+
+    with StubServer(args.fixtures, args.latency, args.jitter, args.failure_rate) as stub:
+        print(f"Serving {args.fixtures} at {stub.base_url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import json
+import os
+from collections import Counter, defaultdict
+
+import storage
+from to_csv import iter_articles
+
+DATA_DIR = "./article-visualization/public/data"
+AGGREGATES_DIR = os.path.join(DATA_DIR, "aggregates")
+
+# Source name as shown on the dashboard -> scraper output file
+SOURCES = {
+    'CNN': os.path.join(DATA_DIR, "cnn_articles.txt"),
+    'FOX': os.path.join(DATA_DIR, "fox_news_articles.txt"),
+}
+
+# Bump when the layout of the aggregate files changes
+SCHEMA_VERSION = 1
+
+# Width of the word count histogram bins, matching the dashboard's bar chart
+WORD_BIN_WIDTH = 250
+
+def _parse_sizes(sizes):
+    """Yield (width, height) for each known size in an "Image Sizes" value."""
+    for size in (sizes or '').split(','):
+        width, _, height = size.strip().partition('x')
+        if width.isdigit() and height.isdigit():
+            yield int(width), int(height)
+
+class _Aggregate:
+    """Running totals for one source and category."""
+
+    def __init__(self):
+        self.articles = 0
+        self.images = 0
+        self.word_bins = Counter()
+        self.image_counts = Counter()
+        self.image_sizes = Counter()
+        self.max_word_count = 0
+
+    def add(self, article):
+        word_count = article.get('Word Count') or 0
+        image_count = article.get('Images') or 0
+        self.articles += 1
+        self.images += image_count
+        self.word_bins[word_count // WORD_BIN_WIDTH * WORD_BIN_WIDTH] += 1
+        self.image_counts[image_count] += 1
+        self.image_sizes.update(_parse_sizes(article.get('Image Sizes')))
+        self.max_word_count = max(self.max_word_count, word_count)
+
+    def to_json(self):
+        return {
+            'articles': self.articles,
+            'images': self.images,
+            'max_word_count': self.max_word_count,
+            'word_count_histogram': [[start, count] for start, count in sorted(self.word_bins.items())],
+            'images_per_article': [[images, count] for images, count in sorted(self.image_counts.items())],
+            'image_sizes': [[width, height, count] for (width, height), count in sorted(self.image_sizes.items())],
+        }
+
+def aggregate_source(filename):
+    """
+    Compute the dashboard's aggregates for one scraper output file.
+
+    Articles are streamed, so memory use depends only on the number of
+    distinct bins and image sizes, not on the size of the file. Returns the
+    aggregates by lowercase category, plus 'all' for the whole source.
+    """
+    aggregates = defaultdict(_Aggregate)
+    for article in iter_articles(filename):
+        aggregates['all'].add(article)
+        aggregates[(article.get('Category') or '').lower()].add(article)
+    return {category: aggregate.to_json() for category, aggregate in sorted(aggregates.items())}
+
+def _fingerprint(filename):
+    """Identify the input an aggregate file was built from."""
+    stat = os.stat(filename)
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'word_bin_width': WORD_BIN_WIDTH,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _write_json(path, data):
+    with storage.atomic_rewrite(path) as f:
+        json.dump(data, f, separators=(',', ':'))
+
+def build_aggregates(sources=SOURCES, output_dir=AGGREGATES_DIR, force=False):
+    """
+    Write one aggregate file per source plus an index.json listing them.
+
+    A source's file is only rebuilt when its output file changed since the
+    last build (or force is set). Returns the names of the rebuilt sources.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    index = {'version': SCHEMA_VERSION, 'sources': {}}
+    rebuilt = []
+
+    for name, filename in sources.items():
+        if not os.path.exists(filename):
+            print(f"Skipping {name}: {filename} not found")
+            continue
+
+        path = os.path.join(output_dir, f"{name.lower()}.json")
+        fingerprint = _fingerprint(filename)
+        existing = _read_json(path)
+        if force or not existing or existing.get('input') != fingerprint:
+            existing = {
+                'version': SCHEMA_VERSION,
+                'source': name,
+                'input': fingerprint,
+                'categories': aggregate_source(filename),
+            }
+            _write_json(path, existing)
+            rebuilt.append(name)
+
+        index['sources'][name] = {
+            'file': os.path.basename(path),
+            # Changes whenever the file is rebuilt, so the dashboard can use
+            # it to bypass stale browser caches
+            'revision': f"{fingerprint['size']:x}-{fingerprint['mtime_ns']:x}",
+            'articles': existing['categories'].get('all', {}).get('articles', 0),
+        }
+
+    _write_json(os.path.join(output_dir, 'index.json'), index)
+    return rebuilt
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Precompute the dashboard charts from the scraper output files.')
+    parser.add_argument('--output-dir', default=AGGREGATES_DIR, help='Directory to write the aggregate JSON files to')
+    parser.add_argument('--force', action='store_true', help='Rebuild every source even if its file is unchanged')
+    args = parser.parse_args()
+
+    rebuilt = build_aggregates(output_dir=args.output_dir, force=args.force)
+    if rebuilt:
+        print(f"Rebuilt aggregates for {', '.join(rebuilt)}")
+    else:
+        print("Aggregates are up to date")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import itertools
+import logging
+import os
+
+import logs
+import records
+import storage
+from common import filter_rules
+from records import BATCH_SIZE, ArticleRecord, RecordBatch
+
+logger = logging.getLogger(__name__)
+
+def _check_record(record):
+    """Return check_block()'s (keep, url) for an ArticleRecord."""
+    if record.keep():
+        return True, None
+    if not record.is_complete():
+        return False, None
+    logger.info(f"Removing article: {record.url} ({record.word_count} words, {record.image_count} images, "
+                f"date: {record.date})", extra={'url': record.url})
+    return False, record.url
+
+def check_block(block):
+    """
+    Check one article block against the filter rules.
+
+    Returns (keep, url). Blocks missing their word count, image count or date
+    are dropped without a URL, since there is nothing to record them by.
+    """
+    return _check_record(ArticleRecord.from_block(block, image_sizes=False))
+
+def check_blocks(blocks):
+    """
+    Return check_block()'s (keep, url) for each of a batch of blocks.
+
+    With NumPy the filters run over the whole batch as a RecordBatch.
+    Without it the blocks are checked one at a time, which beats filling
+    array.array columns. Both parse blocks through records.parse_fields,
+    so they agree on every block.
+    """
+    if records.np is None:
+        return [check_block(block) for block in blocks]
+    batch = RecordBatch.from_blocks(blocks)
+    return [(True, None) if keep else _check_record(batch[i]) for i, keep in enumerate(batch.keep_mask())]
+
+def _batches(blocks, size=BATCH_SIZE):
+    blocks = iter(blocks)
+    while batch := list(itertools.islice(blocks, size)):
+        yield batch
+
+def _is_header(block):
+    return block.startswith("Total Articles:")
+
+def _header_end(f):
+    """Return the offset just past the "Total Articles:" header and its blank lines."""
+    f.seek(0)
+    offset = 0
+    line = f.readline()
+    if not line.startswith(b"Total Articles:"):
+        return 0
+    offset += len(line)
+    for line in iter(f.readline, b''):
+        if line.strip():
+            break
+        offset += len(line)
+    return offset
+
+def _separator(f, end):
+    """Return the newlines needed after the bytes before end to finish a block."""
+    f.seek(max(end - 2, 0))
+    tail = f.read(end - f.tell())
+    if tail.endswith(b'\n\n'):
+        return b''
+    return b'\n' if tail.endswith(b'\n') else b'\n\n'
+
+def _rewrite(filename, start, kept, dropped):
+    """
+    Rewrite filename without the blocks starting at the dropped offsets.
+
+    Everything before start was cleaned earlier and is copied through as raw
+    bytes; only the blocks from start on are split up again.
+    """
+    with open(filename, 'rb') as src, storage.atomic_rewrite(filename, 'wb') as dst:
+        dst.write(storage.format_header(kept).encode('utf-8'))
+        prefix_start = _header_end(src)
+        if start > prefix_start:
+            src.seek(prefix_start)
+            remaining = start - prefix_start
+            while remaining:
+                chunk = src.read(min(remaining, storage.COPY_CHUNK_SIZE))
+                dst.write(chunk)
+                remaining -= len(chunk)
+            dst.write(_separator(src, start))
+
+        src.seek(start)
+        for offset, block in storage.iter_blocks(src):
+            if offset in dropped or (offset == 0 and _is_header(block)):
+                continue
+            dst.write(block.encode('utf-8') + b'\n\n')
+
+def clean_file(filename, incremental=True):
+    """
+    Remove articles that no longer meet the filter rules from an output file.
+
+    The file is streamed block by block, so memory use does not grow with its
+    size. The manifest remembers how far the file has been cleaned and under
+    which rules; in incremental mode only blocks appended since then are
+    checked, unless the rules changed. That point is kept relative to the end
+    of the header, whose length changes with the count. The file is rewritten
+    (atomically) only when something has to be removed or it lacks a header;
+    otherwise only the header's count is updated (see storage.update_header).
+
+    Returns (kept, removed_urls), where kept is the number of articles left.
+    """
+    manifest = storage.read_manifest(filename)
+    rules = filter_rules()
+
+    # First pass: check new blocks a batch at a time, remembering only the offsets to drop
+    dropped = set()
+    removed_urls = []
+    with open(filename, 'rb') as f:
+        start, kept = 0, 0
+        if incremental and manifest.get('rules') == rules and 'clean_body_offset' in manifest:
+            resume = _header_end(f) + manifest['clean_body_offset']
+            if resume <= manifest['size']:
+                start, kept = resume, manifest['clean_count']
+        f.seek(start)
+        blocks = ((offset, block) for offset, block in storage.iter_blocks(f)
+                  if not (offset == 0 and _is_header(block)))
+        for chunk in _batches(blocks):
+            for (offset, _), (keep, url) in zip(chunk, check_blocks([block for _, block in chunk])):
+                if keep:
+                    kept += 1
+                    continue
+                dropped.add(offset)
+                if url:
+                    removed_urls.append(url)
+
+    # A file without an up-to-date header gets one, even if nothing was dropped
+    if dropped or not storage.update_header(filename, kept):
+        _rewrite(filename, start, kept, dropped)
+
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        body_offset = size - _header_end(f)
+    storage.write_manifest(filename, {
+        'total_articles': kept,
+        'size': size,
+        'clean_body_offset': body_offset,
+        'clean_count': kept,
+        'rules': rules,
+    })
+    return kept, removed_urls
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Remove articles that fail the filter rules from output files.')
+    parser.add_argument('files', nargs='+', help='Output files to clean')
+    parser.add_argument('--full', action='store_true', help='Recheck every article, not just those added since the last clean')
+    args = parser.parse_args()
+
+    logs.setup_logging()
+    for filename in args.files:
+        kept, removed_urls = clean_file(filename, incremental=not args.full)
+        print(f"{filename}: kept {kept} articles, removed {len(removed_urls)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,29 @@
+import logging
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timezone
+from datetime import datetime
+from functools import partial
 import re
-from urllib.parse import urljoin
-import email.utils
-
-def parse_date(date_str):
-    """Parse date string to datetime object."""
-    try:
-        # Parse RFC 2822 date format
-        return datetime.fromtimestamp(email.utils.mktime_tz(email.utils.parsedate_tz(date_str)), timezone.utc)
-    except:
-        try:
-            # Try parsing ISO format (which CNN uses)
-            return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        except:
-            return None
-
-def is_within_date_range(date_str):
-    """Check if the article date is within the specified range."""
-    date = parse_date(date_str)
-    if not date:
-        return False
-    
-    start_date = datetime(2024, 12, 15, tzinfo=timezone.utc)
-    end_date = datetime(2025, 2, 17, tzinfo=timezone.utc)
-    
-    return start_date <= date <= end_date
-
-def is_valid_article(word_count, image_count):
-    """Check if article meets the criteria (not an outlier)."""
-    # Convert word count to integer if it's a string
-    if isinstance(word_count, str):
-        word_count = int(word_count.split()[0])
-    return word_count <= 3000 and image_count <= 10
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import archive_index
+import article_store
+import cleaner
+import dedup
+import frontier
+import http_cache
+import html_parser
+import http_client
+import logs
+import metrics
+import prefilter
+import rejection_cache
+import storage
+from common import END_DATE, START_DATE, is_valid_article, is_within_date_range
+from rejection_cache import ArticleRejected
+from scheduler import run_sources
+from sources import Source
+
+logger = logging.getLogger(__name__)
 
 def get_category_from_url(url):
     """Determine category from the URL path."""
@@ -47,234 +37,437 @@ def get_category_from_url(url):
         return 'sports'
     return 'unknown'
 
-def get_previously_scraped_urls(filename="./article-visualization/public/data/cnn_articles.txt"):
-    """Extract all URLs that have already been scraped from the output file."""
-    scraped_urls = set()
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            content = f.read()
-            urls = re.findall(r'URL: (.*?)\n', content)
-            scraped_urls.update(urls)
-    except FileNotFoundError:
-        pass
-    return scraped_urls
+def parse_section(markup, base_url, containers):
+    """Return the canonical article URLs linked from the given containers of a section page."""
+    soup = html_parser.make_soup(markup)
+    article_urls = set()
+
+    for container_class in containers:
+        container = soup.find('div', class_=container_class)
+        if container:
+            links = container.find_all('a', href=True)
+            for link in links:
+                href = link['href']
+                if href.startswith('/'):
+                    href = urljoin(base_url, href)
+                if ('cnn.com' in href and '/interactive/' not in href and not href.endswith('.pdf')):
+                    article_urls.add(dedup.canonical_url(href))
+    return list(article_urls)
 
-def update_total_articles(count, filename="./article-visualization/public/data/cnn_articles.txt"):
-    """Update the total article count at the top of the file."""
+def get_article_urls_from_containers(url, containers):
+    """Extract article URLs from the specified containers on the page."""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            content = f.readlines()
+        content = http_cache.conditional_get(url)
+        if content is None:
+            logger.info(f"Section unchanged since last run: {url}", extra={'url': url})
+            return []
+        return parse_section(content, url, containers)
+    except Exception:
+        logger.exception(f"Error reading section page: {url}", extra={'url': url})
+        metrics.inc('discovery_errors_total', source='cnn')
+        return []
 
-        if content and content[0].startswith("Total Articles:"):
-            content.pop(0)
+# Undated links under a section's path that are not listing pages
+NON_LISTING_PATTERN = re.compile(r'/(live-news|videos?|gallery|interactive)/|\.(html|pdf)$')
 
-        content.insert(0, f"Total Articles: {count}\n\n")
+LINK_FILTER = html_parser.tag_filter(lambda name, classes: name == 'a')
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.writelines(content)
+def _listing_url(url):
+    """Normalize a subsection or pagination link, keeping only its page parameter."""
+    parts = urlsplit(url)
+    page = [(key, value) for key, value in parse_qsl(parts.query) if key == 'page']
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path.rstrip('/') or '/', urlencode(page), ''))
 
-    except FileNotFoundError:
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"Total Articles: {count}\n\n")
+def get_section_links(url, section_path):
+    """
+    Return (article_urls, page_urls) linked from a section listing page.
 
-def get_article_urls_from_containers(url, containers):
-    """Extract article URLs from the specified containers on the page."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                      '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    Every dated cnn.com link is an article; undated links under section_path
+    are subsection and pagination pages. An unchanged page is read from the
+    HTTP cache, since the pages it links to may still have changed.
+    """
+    try:
+        content = http_cache.conditional_get(url)
+    except requests.RequestException as e:
+        logger.warning(f"Failed to fetch section page {url}: {e}", extra={'url': url})
+        metrics.inc('discovery_errors_total', source='cnn')
+        return [], []
+    if content is None:
+        content = http_cache.cached_body(url) or b''
+
+    host = urlsplit(url).hostname
+    article_urls, page_urls = set(), set()
+    for link in html_parser.make_soup(content, parse_only=LINK_FILTER).find_all('a', href=True):
+        href = urljoin(url, link['href'])
+        parts = urlsplit(href)
+        if not (parts.hostname or '').endswith('cnn.com') or '/interactive/' in href or href.endswith('.pdf'):
+            continue
+        if prefilter.URL_DATE_PATTERN.search(parts.path):
+            article_urls.add(dedup.canonical_url(href))
+        elif (parts.hostname == host and (parts.path + '/').startswith(section_path.rstrip('/') + '/')
+              and not NON_LISTING_PATTERN.search(parts.path)):
+            page_urls.add(_listing_url(href))
+    return list(article_urls), list(page_urls)
+
+# Images inside containers with these classes aren't part of the article body
+EXCLUDED_IMAGE_CLASSES = frozenset([
+    'byline__images',
+    'series-banner__logo-heading',
+    'container_list-headlines-with-images__cards-wrapper',
+])
+EXCLUDED_IMAGE_CLASS_PATTERN = re.compile(r'related|playlist')
+
+def _is_paragraph(classes):
+    return any('paragraph' in c.lower() for c in classes)
+
+def _is_article_image(classes):
+    return any('image' in c.lower() or 'photo' in c.lower() for c in classes)
+
+def _is_excluded_container(classes):
+    return (not EXCLUDED_IMAGE_CLASSES.isdisjoint(classes)
+            or any(EXCLUDED_IMAGE_CLASS_PATTERN.search(c.lower()) for c in classes))
+
+def _keep_article_tag(name, classes):
+    """Decide which parts of a CNN article page need to be parsed."""
+    if name in ('meta', 'h1'):
+        return True
+    if name == 'img':
+        return _is_article_image(classes)
+    if name in ('p', 'div') and _is_paragraph(classes):
+        return True
+    # Keep excluded containers so images inside them can be recognized
+    return bool(classes) and _is_excluded_container(classes)
+
+ARTICLE_FILTER = html_parser.tag_filter(_keep_article_tag)
+
+def _in_excluded_container(img):
+    """Check all of an image's ancestors in a single pass."""
+    for parent in img.parents:
+        classes = parent.get('class') if parent.name else None
+        if classes and _is_excluded_container(classes):
+            return True
+    return False
+
+def _published_date(soup):
+    """Return the article:published_time meta as an RFC 2822 string, or ''."""
+    date_meta = soup.find('meta', property='article:published_time')
+    if date_meta:
+        date_str = date_meta.get('content')
+        if date_str:
+            date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+            return date_obj.strftime('%a, %d %b %Y %H:%M:%S %z')
+    return ''
+
+HEAD_FILTER = html_parser.tag_filter(lambda name, classes: name == 'meta')
+
+def check_cnn_head(url, head):
+    """Reject an article from its <head> alone, before the body is downloaded."""
     try:
-        response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        article_urls = set()
-
-        for container_class in containers:
-            container = soup.find('div', class_=container_class)
-            if container:
-                links = container.find_all('a', href=True)
-                for link in links:
-                    href = link['href']
-                    if href.startswith('/'):
-                        href = urljoin(url, href)
-                    if ('cnn.com' in href and '/interactive/' not in href and not href.endswith('.pdf')):
-                        article_urls.add(href)
-        return list(article_urls)
+        date = _published_date(html_parser.make_soup(head, parse_only=HEAD_FILTER))
     except Exception:
-        return []
-
-def scrape_cnn_article(url):
-    """Scrape an individual CNN article for information."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
-                      '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        logger.exception(f"Error parsing article head: {url}", extra={'url': url, 'reason': 'parse_error'})
+        raise ArticleRejected('parse_error')
+    if not date:
+        logger.info(f"Skipping incomplete article: {url}", extra={'url': url, 'reason': 'incomplete'})
+        raise ArticleRejected('incomplete')
+    if not is_within_date_range(date):
+        logger.info(f"Skipping article outside date range: {url}", extra={'url': url, 'reason': 'out_of_date_range'})
+        raise ArticleRejected('out_of_date_range')
+
+def extract_cnn_article(url, markup):
+    """Extract article information from a downloaded CNN page.
+
+    Raises ArticleRejected with the reason when the article is skipped.
+    """
+    category = get_category_from_url(url)
+    if category == 'unknown':
+        logger.info(f"Skipping article with unknown category: {url}", extra={'url': url, 'reason': 'unknown_category'})
+        raise ArticleRejected('unknown_category')
+
+    soup = html_parser.make_soup(markup, parse_only=ARTICLE_FILTER)
+
+    result = {
+        'Category': category,
+        'Title': '',
+        'URL': url,
+        'Date': '',
+        'Word Count': 0,
+        'Images': [],
+        'Fingerprint': None,
+        # Image sizes as a list, and the URLs of images whose size isn't in the markup
+        'Sizes': [],
+        'Unsized Images': [],
     }
-    try:
-        response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        category = get_category_from_url(url)
-        if category == 'unknown':
-            print(f"Skipping article with unknown category: {url}")
-            return None
-
-        result = {
-            'Category': category,
-            'Title': '',
-            'URL': url,
-            'Date': '',
-            'Word Count': 0,
-            'Images': []
-        }
-
-        title = soup.find('h1')
-        if title:
-            result['Title'] = title.text.strip()
-
-        date_meta = soup.find('meta', property='article:published_time')
-        if date_meta:
-            date_str = date_meta.get('content')
-            if date_str:
-                date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                result['Date'] = date_obj.strftime('%a, %d %b %Y %H:%M:%S %z')
-                
-                # Check if article is within date range
-                if not is_within_date_range(result['Date']):
-                    print(f"Skipping article outside date range: {url}")
-                    return None
-
-        paragraphs = soup.find_all(['p', 'div'], class_=lambda x: x and 'paragraph' in x.lower())
-        total_words = sum(len(p.text.split()) for p in paragraphs if p.text)
-        
-        images = []
-        all_images = soup.find_all('img', class_=lambda x: x and ('image' in x.lower() or 'photo' in x.lower()))
-        for img in all_images:
-            if not img.find_parent(class_=lambda x: x and ('related' in x.lower() or 'playlist' in x.lower())) \
-               and not img.find_parent(class_="byline__images") \
-               and not img.find_parent(class_="series-banner__logo-heading") \
-               and not img.find_parent(class_="container_list-headlines-with-images__cards-wrapper") \
-               and not img.find_parent(class_="container__item-media  container_list-headlines-with-images__item-media"):
-                width = img.get('width', '')
-                height = img.get('height', '')
-                if width and height:
-                    images.append(f"{width}x{height}")
-        
-        # Check if article meets criteria before proceeding
-        if not is_valid_article(total_words, len(images)):
-            print(f"Skipping outlier article: {url} (Words: {total_words}, Images: {len(images)})")
-            return None
-
-        result['Word Count'] = f"{total_words} words"
-        result['Images'] = f"{len(images)} (Sizes: {', '.join(images)})"
-
-        if not result['Title'] or not result['Date'] or total_words == 0:
-            print(f"Skipping incomplete article: {url}")
-            return None
 
-        return result
-
-    except Exception as e:
-        print(f"Error scraping article: {url}")
-        return None
-
-def save_article_info(info, filename="./article-visualization/public/data/cnn_articles.txt"):
-    """Save the article information to a file."""
-    with open(filename, 'a', encoding='utf-8') as f:
-        f.write(f"Category: {info['Category']}\n")
-        f.write(f"Title: {info['Title']}\n")
-        f.write(f"URL: {info['URL']}\n")
-        f.write(f"Date: {info['Date']}\n")
-        f.write(f"Word Count: {info['Word Count']}\n")
-        f.write(f"Images: {info['Images']}\n")
-        f.write("\n")
-
-def clean_existing_file(filename="./article-visualization/public/data/cnn_articles.txt"):
-    """Clean the existing file by removing outlier articles and those outside date range."""
+    title = soup.find('h1')
+    if title:
+        result['Title'] = title.text.strip()
+
+    result['Date'] = _published_date(soup)
+    if result['Date'] and not is_within_date_range(result['Date']):
+        logger.info(f"Skipping article outside date range: {url}", extra={'url': url, 'reason': 'out_of_date_range'})
+        raise ArticleRejected('out_of_date_range')
+
+    paragraphs = soup.find_all(['p', 'div'], class_=lambda x: x and 'paragraph' in x.lower())
+    text = ' '.join(p.text for p in paragraphs if p.text)
+    total_words = len(text.split())
+
+    images = []
+    all_images = soup.find_all('img', class_=lambda x: x and ('image' in x.lower() or 'photo' in x.lower()))
+    for img in all_images:
+        if not _in_excluded_container(img):
+            width = img.get('width', '')
+            height = img.get('height', '')
+            if width and height:
+                images.append(f"{width}x{height}")
+            elif img.get('src'):
+                result['Unsized Images'].append(urljoin(url, img['src']))
+
+    # Check if article meets criteria before proceeding
+    if not is_valid_article(total_words, len(images)):
+        logger.info(f"Skipping outlier article: {url} (Words: {total_words}, Images: {len(images)})",
+                    extra={'url': url, 'reason': 'outlier', 'words': total_words, 'images': len(images)})
+        raise ArticleRejected('outlier')
+
+    result['Word Count'] = f"{total_words} words"
+    result['Images'] = f"{len(images)} (Sizes: {', '.join(images)})"
+    result['Sizes'] = images
+    result['Fingerprint'] = dedup.simhash(text)
+
+    if not result['Title'] or not result['Date'] or total_words == 0:
+        logger.info(f"Skipping incomplete article: {url}", extra={'url': url, 'reason': 'incomplete'})
+        raise ArticleRejected('incomplete')
+
+    return result
+
+def fetch_cnn_article(url):
+    """Download a CNN article, rejecting it early from its <head> when possible.
+
+    Raises ArticleRejected with the reason when the article is skipped.
+    """
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Split content into article blocks
-        articles = content.split('\n\n')
-        
-        # First block is the total count, handle separately
-        header = articles[0] if articles and articles[0].startswith("Total Articles:") else ""
-        articles = articles[1:] if header else articles
-        
-        # Process each article block
-        valid_articles = []
-        for article in articles:
-            if not article.strip():
-                continue
-                
-            # Extract word count, image count, and date
-            word_count_match = re.search(r'Word Count: (\d+)', article)
-            image_count_match = re.search(r'Images: (\d+)', article)
-            date_match = re.search(r'Date: (.+?)(?:\n|$)', article)
-            
-            if word_count_match and image_count_match and date_match:
-                word_count = int(word_count_match.group(1))
-                image_count = int(image_count_match.group(1))
-                date_str = date_match.group(1).strip()
-                
-                if is_valid_article(word_count, image_count) and is_within_date_range(date_str):
-                    valid_articles.append(article)
-                else:
-                    url_match = re.search(r'URL: (.*?)\n', article)
-                    if url_match:
-                        print(f"Removing article: {url_match.group(1)} (Date: {date_str})")
-
-        # Write cleaned content back to file
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"Total Articles: {len(valid_articles)}\n\n")
-            f.write('\n\n'.join(valid_articles))
-            f.write('\n')  # End file with newline
-            
-        print(f"Cleaned file. Removed {len(articles) - len(valid_articles)} articles.")
-        
-    except FileNotFoundError:
-        print(f"File {filename} not found.")
-    except Exception as e:
-        print(f"Error cleaning file: {str(e)}")
-
-def main():
-    sections = {
-        "https://www.cnn.com/politics": [
-            'container__field-links container_lead-plus-headlines__field-links',
-            'container__field-links container_vertical-strip__field-links'
-        ],
-        "https://www.cnn.com/science": [
-            'container__field-links container_lead-plus-headlines-with-images__field-links'
-        ],
-        "https://www.cnn.com/health": [
-            'container__field-links container_lead-plus-headlines__field-links'
-        ],
-        "https://www.cnn.com/sport": [
-            'container__field-links container_lead-plus-headlines__field-links'
-        ]
-    }
+        return http_client.stream_get(url, check_head=lambda head: check_cnn_head(url, head))
+    except http_client.ResponseTooLarge:
+        logger.info(f"Skipping oversized article: {url}", extra={'url': url, 'reason': 'too_large'})
+        raise ArticleRejected('too_large')
+    except requests.RequestException as e:
+        logger.warning(f"Error fetching article: {url}: {e}", extra={'url': url, 'reason': 'fetch_error'})
+        raise ArticleRejected('fetch_error')
+    except ArticleRejected:
+        raise
+    except Exception:
+        logger.exception(f"Error fetching article: {url}", extra={'url': url, 'reason': 'fetch_error'})
+        raise ArticleRejected('fetch_error')
 
-    # First, clean the existing file
-    print("Cleaning existing file...")
-    clean_existing_file()
+def parse_cnn_article(url, content):
+    """Extract a downloaded CNN article. Runs in the pipeline's parse processes.
 
-    scraped_urls = get_previously_scraped_urls()
-    print(f"Found {len(scraped_urls)} previously scraped articles")
+    Raises ArticleRejected with the reason when the article is skipped.
+    """
+    try:
+        return extract_cnn_article(url, content)
+    except ArticleRejected:
+        raise
+    except Exception:
+        logger.exception(f"Error scraping article: {url}", extra={'url': url, 'reason': 'parse_error'})
+        raise ArticleRejected('parse_error')
+
+def format_article_info(info):
+    """Format article information as a block for the output file."""
+    return (f"Category: {info['Category']}\n"
+            f"Title: {info['Title']}\n"
+            f"URL: {info['URL']}\n"
+            f"Date: {info['Date']}\n"
+            f"Word Count: {info['Word Count']}\n"
+            f"Images: {info['Images']}")
+
+def clean_existing_file(filename="./article-visualization/public/data/cnn_articles.txt", incremental=True):
+    """Clean the existing file by removing outlier articles and those outside date range.
+
+    Only articles added since the last clean are checked unless incremental
+    is False or the filter rules changed. Returns the URLs of the removed articles.
+    """
+    try:
+        kept, removed_urls = cleaner.clean_file(filename, incremental)
+        logger.info(f"Cleaned file. Removed {len(removed_urls)} articles, {kept} remain.")
+        return removed_urls
 
-    for section_url, containers in sections.items():
-        print(f"\nProcessing section: {section_url}")
+    except FileNotFoundError:
+        logger.warning(f"File {filename} not found.")
+    except Exception:
+        logger.exception(f"Error cleaning file: {filename}")
+    return []
+
+SECTIONS = {
+    "https://www.cnn.com/politics": [
+        'container__field-links container_lead-plus-headlines__field-links',
+        'container__field-links container_vertical-strip__field-links'
+    ],
+    "https://www.cnn.com/science": [
+        'container__field-links container_lead-plus-headlines-with-images__field-links'
+    ],
+    "https://www.cnn.com/health": [
+        'container__field-links container_lead-plus-headlines__field-links'
+    ],
+    "https://www.cnn.com/sport": [
+        'container__field-links container_lead-plus-headlines__field-links'
+    ]
+}
+
+OUTPUT_FILE = "./article-visualization/public/data/cnn_articles.txt"
+
+class CnnSource(Source):
+    """Scrapes articles linked from the CNN section pages."""
+
+    name = 'cnn'
+    parse = staticmethod(parse_cnn_article)
+
+    def __init__(self, sections=None, filename=OUTPUT_FILE):
+        super().__init__()
+        self.sections = sections or SECTIONS
+        self.filename = filename
+        self.queued = set()
+        self.seen = None
+        self.requests_saved = 0
+
+    def start(self):
+        # First, clean the existing file
+        logger.info("Cleaning existing file...")
+        self.store = article_store.open_store(self.store_path)
+        rejection_cache.ensure_schema(self.store)
+        rejection_cache.purge_expired(self.store)
+        removed_urls = clean_existing_file(self.filename)
+        article_store.remove_urls(self.store, removed_urls)
+
+        # One-time migration of articles scraped before the store existed
+        if article_store.count_articles(self.store, self.name) == 0:
+            article_store.import_txt(self.store, self.name, self.filename)
+        logger.info(f"Found {article_store.count_articles(self.store, self.name)} previously scraped articles")
+        self.seen = frontier.load_seen(self.store)
+        self.writer = storage.ArticleWriter(self.filename)
+
+    def feeds(self):
+        return [(section_url, partial(self.discover_section, section_url, containers))
+                for section_url, containers in self.sections.items()]
+
+    def discover_section(self, section_url, containers):
+        """
+        Yield new article URLs from one section page.
+
+        With a crawl_depth, subsection and pagination pages are followed too
+        (see frontier.py). Stored, previously rejected and out-of-scope URLs
+        are dropped before any network I/O. Runs on the pipeline's discovery
+        thread, so it uses its own store connection, closed when it's done.
+        """
+        store = article_store.open_store(self.store_path)
+        try:
+            yield from self._discover_section(store, section_url, containers)
+        finally:
+            store.close()
+
+    def _discover_section(self, store, section_url, containers):
+        logger.info(f"Processing section: {section_url}")
+        if self.crawl_depth:
+            yield from self._crawl_section(store, section_url)
+            return
         article_urls = get_article_urls_from_containers(section_url, containers)
-        print(f"Found {len(article_urls)} articles in {section_url}")
+        logger.info(f"Found {len(article_urls)} articles in {section_url}")
+
+        with metrics.timer('stage_seconds', stage='filter', source=self.name):
+            new_urls = [url for url in article_urls if self._is_new(store, url)]
+            logger.info(f"Skipping {len(article_urls) - len(new_urls)} known articles")
+
+            # Category and date are encoded in CNN URLs, so check them before fetching
+            new_urls, saved_count = prefilter.filter_urls(new_urls, START_DATE, END_DATE, get_category_from_url)
+        self.requests_saved += saved_count
+        metrics.inc('prefilter_dropped_total', saved_count, source=self.name)
+        logger.info(f"Pre-fetch filter dropped {saved_count} out-of-scope articles")
+
+        for url in new_urls:
+            yield self._queue(url)
+
+    def _crawl_section(self, store, section_url):
+        """Yield new article URLs from a section and its subsection and pagination pages, newest first."""
+        section_path = urlsplit(section_url).path
+        found = known = 0
+        candidates = frontier.crawl([_listing_url(section_url)],
+                                    lambda page_url, _: get_section_links(page_url, section_path),
+                                    self.crawl_depth)
+        for url in candidates:
+            found += 1
+            if not self._is_new(store, url):
+                known += 1
+            elif not self.in_scope(url):
+                self.requests_saved += 1
+                metrics.inc('prefilter_dropped_total', source=self.name)
+            else:
+                yield self._queue(url)
+        logger.info(f"Crawled {found} articles from {section_url}, {known} already known")
+
+    def _is_new(self, store, url):
+        if url in self.queued:
+            return False
+        if self.seen is not None and url not in self.seen:
+            # The seen-set covers every stored and rejected URL, so one it
+            # has never seen needs no store lookups
+            return True
+        return not article_store.has_url(store, url) and not rejection_cache.is_rejected(store, url)
+
+    def _queue(self, url):
+        logger.info(f"Scraping: {url}", extra={'url': url})
+        self.mark_queued(url)
+        return url
+
+    def mark_queued(self, url):
+        self.queued.add(url)
+        if self.seen is not None:
+            self.seen.add(url)
+
+    def category_of(self, url):
+        return get_category_from_url(url)
+
+    def fetch(self, url):
+        return fetch_cnn_article(url)
+
+    def format(self, url, result):
+        return format_article_info(result)
+
+    def record(self, url, result):
+        return result
 
-        for url in article_urls:
-            if url not in scraped_urls:
-                print(f"Scraping: {url}")
-                article_info = scrape_cnn_article(url)
-                if article_info:
-                    save_article_info(article_info)
-                    scraped_urls.add(url)
+    def fingerprint(self, url, result):
+        return result['Fingerprint']
+
+    def image_urls(self, url, result):
+        return result['Unsized Images']
+
+    def with_image_sizes(self, url, result, sizes):
+        found = [sizes[src] for src in result['Unsized Images'] if src in sizes]
+        if not found:
+            return result
+        images = result['Sizes'] + [f"{width}x{height}" for width, height in found]
+        if not is_valid_article(result['Word Count'], len(images)):
+            logger.info(f"Skipping outlier article: {url} (Words: {result['Word Count']}, Images: {len(images)})",
+                        extra={'url': url, 'reason': 'outlier', 'images': len(images)})
+            return ArticleRejected('outlier')
+        return {**result, 'Images': f"{len(images)} (Sizes: {', '.join(images)})", 'Sizes': images,
+                'Unsized Images': []}
+
+    def in_scope(self, url):
+        return (get_category_from_url(url) != 'unknown'
+                and not prefilter.url_outside_date_range(url, START_DATE, END_DATE))
+
+    def finish(self):
+        self.flush()
+        logger.info(f"{storage.total_articles(self.filename)} articles in {self.filename}")
+        frontier.save_seen(self.seen)
+        archive_index.update(self.filename)
+        logger.info(f"Pre-fetch filter saved {self.requests_saved} requests")
+        logger.info(f"Scraping completed. Results saved to {self.filename}")
 
-    update_total_articles(len(scraped_urls))
-    print("\nScraping completed. Results saved to cnn_articles.txt")
+def main():
+    logs.setup_logging()
+    run_sources([CnnSource()])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+import email.utils
+
+# Articles published outside this range are skipped
+START_DATE = datetime(2024, 12, 15, tzinfo=timezone.utc)
+END_DATE = datetime(2025, 2, 17, tzinfo=timezone.utc)
+
+# Constants for filtering
+MAX_WORD_COUNT = 3000
+MAX_IMAGE_COUNT = 10
+
+def parse_date(date_str):
+    """Parse date string to datetime object."""
+    try:
+        # Parse RFC 2822 date format
+        return datetime.fromtimestamp(email.utils.mktime_tz(email.utils.parsedate_tz(date_str)), timezone.utc)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    try:
+        # Try parsing ISO format (which CNN uses)
+        return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        pass
+    try:
+        # Try parsing other common date formats
+        return datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S %z')
+    except (TypeError, ValueError):
+        return None
+
+def published_timestamp(date_str):
+    """Return a date string as epoch seconds, reading dates without a timezone as UTC, or None."""
+    date = parse_date(date_str)
+    if not date:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+def is_within_date_range(date_str):
+    """Check if the article date is within the specified range."""
+    timestamp = published_timestamp(date_str)
+    return timestamp is not None and START_DATE.timestamp() <= timestamp <= END_DATE.timestamp()
+
+def is_valid_article(word_count, image_count):
+    """Check if article meets the criteria (not an outlier)."""
+    # Convert word count to integer if it's a string
+    if isinstance(word_count, str):
+        word_count = int(word_count.split()[0])
+    return word_count <= MAX_WORD_COUNT and image_count <= MAX_IMAGE_COUNT
+
+def filter_rules():
+    """Return the current filter settings, to detect when previously checked articles need rechecking."""
+    return {
+        'start_date': START_DATE.isoformat(),
+        'end_date': END_DATE.isoformat(),
+        'max_word_count': MAX_WORD_COUNT,
+        'max_image_count': MAX_IMAGE_COUNT,
+    }
@@ -0,0 +1,186 @@
+"""
+Keep scraping in the background, polling each feed as often as it changes.
+
+    python daemon.py cnn fox --metrics-port 9100
+
+Every RSS feed and section page gets its own poll interval, learned from how
+often new articles show up on it: the interval tightens toward the feed's
+observed publishing rate while it is active and backs off while it is idle.
+Only entries not already stored, rejected or queued reach the pipeline, and
+unchanged feeds cost a single conditional request. The learned schedule is
+saved between runs.
+"""
+import json
+import logging
+import random
+import signal
+import threading
+import time
+
+import http_cache
+import metrics
+import storage
+from journal import JOURNAL_FILE, Journal, resume_streams
+from pipeline import MAX_IN_FLIGHT, PARSE_WORKERS
+from response_archive import ARCHIVE_DIR, ResponseArchive
+from scheduler import FETCH_WORKERS, add_source_args, log_summary, make_limiter, run_streams, sources_from_args
+
+STATE_FILE = "./.poll_state.json"
+
+# Bounds and starting point of a feed's poll interval, in seconds
+MIN_INTERVAL = 60
+MAX_INTERVAL = 2 * 3600
+INITIAL_INTERVAL = 10 * 60
+
+# Idle polls stretch the interval by this factor
+BACKOFF = 1.5
+# Weight of the latest poll in the smoothed publishing rate
+RATE_SMOOTHING = 0.3
+# Random spread applied to each interval so feeds on one host don't poll in lockstep
+JITTER = 0.1
+
+logger = logging.getLogger(__name__)
+
+class FeedSchedule:
+    """Poll timing for one feed, adapted to how often it gains new entries."""
+
+    def __init__(self, interval=INITIAL_INTERVAL, rate=0.0, last_poll=None, next_poll=0.0):
+        self.interval = interval
+        self.rate = rate  # smoothed new entries per second
+        self.last_poll = last_poll
+        self.next_poll = next_poll
+
+    def update(self, new_entries, now):
+        """Learn from a poll that found new_entries and schedule the next one."""
+        elapsed = now - self.last_poll if self.last_poll else self.interval
+        self.rate = RATE_SMOOTHING * new_entries / max(elapsed, 1) + (1 - RATE_SMOOTHING) * self.rate
+        if new_entries:
+            # Aim for about one new entry per poll at the feed's current pace
+            self.interval = min(self.interval, 1 / self.rate)
+        else:
+            self.interval *= BACKOFF
+        self.interval = min(max(self.interval, MIN_INTERVAL), MAX_INTERVAL)
+        self.last_poll = now
+        self.next_poll = now + self.interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def to_dict(self):
+        return {'interval': self.interval, 'rate': self.rate,
+                'last_poll': self.last_poll, 'next_poll': self.next_poll}
+
+def load_schedules(path=STATE_FILE):
+    """Return the saved schedules by feed key, or {} if there are none."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {key: FeedSchedule(**value) for key, value in json.load(f).items()}
+    except (FileNotFoundError, ValueError, TypeError):
+        return {}
+
+def save_schedules(schedules, path=STATE_FILE):
+    with storage.atomic_rewrite(path) as f:
+        json.dump({key: schedule.to_dict() for key, schedule in schedules.items()}, f, indent=2)
+
+def _counting(stream, counts, key):
+    """Pass a feed's work items through, counting them."""
+    for item in stream:
+        counts[key] += 1
+        yield item
+
+def run_daemon(sources, state_path=STATE_FILE, stop=None, fetch_workers=FETCH_WORKERS,
+               parse_workers=PARSE_WORKERS, max_in_flight=MAX_IN_FLIGHT, archive=None, journal=None):
+    """
+    Poll the sources' feeds on adaptive schedules until stop (an Event) is set.
+
+    Each time feeds come due, their new entries run through one shared
+    pipeline, the sources flush their results and the schedules are updated
+    and saved. The sources are finished when the daemon stops.
+
+    With a journal, each poll's work items are journaled until the sources
+    have flushed them, and items it resumed are run before the first poll.
+    """
+    stop = stop or threading.Event()
+    http_cache.evict()
+    limiter = make_limiter(sources)
+    for source in sources:
+        source.start()
+
+    feeds = [(index, f"{source.name}:{key}", discover)
+             for index, source in enumerate(sources)
+             for key, discover in source.feeds()]
+    saved = load_schedules(state_path)
+    schedules = {key: saved.get(key, FeedSchedule()) for _, key, _ in feeds}
+
+    try:
+        if journal is not None and journal.resumed:
+            run_streams(sources, resume_streams(sources, journal), limiter,
+                        fetch_workers, parse_workers, max_in_flight, archive, journal)
+            for source in sources:
+                source.flush()
+            journal.checkpoint()
+
+        while not stop.is_set():
+            now = time.time()
+            due = [feed for feed in feeds if schedules[feed[1]].next_poll <= now]
+            if due:
+                counts = {key: 0 for _, key, _ in due}
+                streams = [(index, _counting(discover(), counts, key)) for index, key, discover in due]
+                if journal is not None:
+                    streams = [(index, journal.record_discovery(sources[index], stream)) for index, stream in streams]
+                run_streams(sources, streams, limiter, fetch_workers, parse_workers, max_in_flight, archive, journal)
+                for source in sources:
+                    source.flush()
+                if journal is not None:
+                    journal.checkpoint()
+
+                for index, key, _ in due:
+                    schedules[key].update(counts[key], now)
+                    metrics.inc('polls_total', source=sources[index].name,
+                                result='new' if counts[key] else 'idle')
+                    logger.debug(f"{key}: {counts[key]} new, next poll in {schedules[key].interval:.0f}s",
+                                 extra={'feed': key, 'new': counts[key], 'interval': schedules[key].interval})
+                logger.info(f"Polled {len(due)} feeds, {sum(counts.values())} new articles")
+                save_schedules(schedules, state_path)
+
+            next_poll = min(schedule.next_poll for schedule in schedules.values())
+            stop.wait(max(next_poll - time.time(), 0))
+    finally:
+        for source in sources:
+            source.finish()
+        log_summary()
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Poll news sources continuously on adaptive schedules.')
+    add_source_args(parser)
+    parser.add_argument('--state-file', default=STATE_FILE, help='Where to keep the learned poll schedules')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help='Where to archive downloaded pages for replay.py')
+    parser.add_argument('--no-archive', action='store_true', help="Don't archive downloaded pages")
+    parser.add_argument('--journal-file', default=JOURNAL_FILE, help='Where to journal work items for --resume')
+    parser.add_argument('--resume', action='store_true',
+                        help='First rerun the articles an interrupted run discovered but never stored')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on this port')
+
+    args = parser.parse_args()
+    sources = sources_from_args(parser, args)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    # Finish the current poll and flush everything before exiting
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    archive = None if args.no_archive else ResponseArchive(args.archive_dir)
+    journal = Journal(args.journal_file, resume=args.resume)
+    try:
+        run_daemon(sources, args.state_file, stop,
+                   fetch_workers=args.fetch_workers, parse_workers=args.parse_workers, archive=archive,
+                   journal=journal)
+        journal.close(finished=True)
+    finally:
+        journal.close()
+        if archive is not None:
+            archive.close()
+
+if __name__ == "__main__":
+    main()
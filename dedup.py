@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+from prefilter import URL_DATE_PATTERN
+from rejection_cache import ArticleRejected
+
+# Fingerprints within this many differing bits are the same story
+MAX_DISTANCE = 7
+# The 64-bit fingerprint is indexed in this many bands; any two fingerprints
+# within MAX_DISTANCE bits must match exactly on at least one of them
+BANDS = 8
+BAND_BITS = 64 // BANDS
+# Words per shingle hashed into the fingerprint
+SHINGLE_SIZE = 2
+# Shorter bodies (e.g. video pages) are too alike to compare
+MIN_FINGERPRINT_WORDS = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    url TEXT PRIMARY KEY,
+    simhash INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprint_bands (
+    band INTEGER NOT NULL,
+    url TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_bands_band ON fingerprint_bands (band);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_bands_url ON fingerprint_bands (url);
+"""
+
+# AMP copies of a page and where the regular page lives
+AMP_HOSTS = {'amp.cnn.com': ('www.cnn.com', '/cnn')}
+AMP_SUFFIXES = ('.amp', '/amp')
+# Permalinks to single posts on a live-updates page
+LIVE_POST_PATTERN = re.compile(r'(/live-news/[^/]+)/h_[0-9a-f]+$')
+
+# _BIT_TABLES[i] maps every byte value to its bit i, for bytes.translate
+_BIT_TABLES = [bytes(value >> bit & 1 for value in range(256)) for bit in range(8)]
+
+logger = logging.getLogger(__name__)
+
+def canonical_url(url):
+    """
+    Return the form of an article URL used to recognize copies of it.
+
+    Query strings, fragments, AMP and live-update post variants and trailing
+    slashes are dropped. Dated article paths (CNN's layout) keep or gain
+    their /index.html, which is how those articles are already stored.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or '/'
+
+    if host in AMP_HOSTS:
+        host, prefix = AMP_HOSTS[host]
+        if path.startswith(prefix + '/'):
+            path = path[len(prefix):]
+    for suffix in AMP_SUFFIXES:
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    path = LIVE_POST_PATTERN.sub(r'\1', path)
+
+    if path.endswith('/') and path != '/':
+        path = path.rstrip('/')
+        if URL_DATE_PATTERN.search(path + '/'):
+            path += '/index.html'
+    return urlunsplit((scheme, host, path, '', ''))
+
+def simhash(text):
+    """Return a 64-bit fingerprint of text that changes little when the text does, or None if too short."""
+    words = text.lower().split()
+    if len(words) < MIN_FINGERPRINT_WORDS:
+        return None
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    digests = b''.join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles)
+
+    # Each bit is set when most shingle hashes have it set. Bits are counted
+    # a whole column at a time (byte i of every digest) so the loops stay in C.
+    threshold = len(shingles) / 2
+    fingerprint = 0
+    for position in range(8):
+        column = digests[position::8]
+        for bit, table in enumerate(_BIT_TABLES):
+            if column.translate(table).count(1) > threshold:
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+def _bands(fingerprint):
+    """Return the fingerprint's bands, each tagged with its position so equal values in different bands differ."""
+    mask = (1 << BAND_BITS) - 1
+    return [i << BAND_BITS | fingerprint >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+def _to_signed(fingerprint):
+    # SQLite integers are signed 64-bit
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+def _within_distance(a, b):
+    return (a ^ b).bit_count() <= MAX_DISTANCE
+
+def find_near_duplicate(conn, fingerprint, pending=()):
+    """
+    Return the URL of an article whose fingerprint is within MAX_DISTANCE, or None.
+
+    Stored fingerprints are searched through their bands, then pending
+    (url, fingerprint) pairs not yet committed.
+    """
+    bands = _bands(fingerprint)
+    rows = conn.execute(
+        f"SELECT DISTINCT f.url, f.simhash FROM fingerprint_bands b JOIN fingerprints f ON f.url = b.url "
+        f"WHERE b.band IN ({', '.join('?' * len(bands))})", bands)
+    for url, stored in rows:
+        if _within_distance(stored & (1 << 64) - 1, fingerprint):
+            return url
+    for url, other in pending:
+        if _within_distance(other, fingerprint):
+            return url
+    return None
+
+def add_fingerprints(conn, fingerprints):
+    """Record (url, fingerprint) pairs. They commit with the connection's next transaction."""
+    fingerprints = list(fingerprints)
+    remove_urls(conn, [url for url, _ in fingerprints])
+    conn.executemany("INSERT INTO fingerprints VALUES (?, ?)",
+                     [(url, _to_signed(fingerprint)) for url, fingerprint in fingerprints])
+    conn.executemany("INSERT INTO fingerprint_bands VALUES (?, ?)",
+                     [(band, url) for url, fingerprint in fingerprints for band in _bands(fingerprint)])
+
+def remove_urls(conn, urls):
+    """Forget the fingerprints of removed articles."""
+    rows = [(url,) for url in urls]
+    conn.executemany("DELETE FROM fingerprints WHERE url = ?", rows)
+    conn.executemany("DELETE FROM fingerprint_bands WHERE url = ?", rows)
+
+def check_article(conn, url, fingerprint, pending):
+    """
+    Return ArticleRejected('duplicate') if a stored or pending article has nearly the same body.
+
+    Otherwise (url, fingerprint) is appended to pending, for the caller to
+    store with add_fingerprints alongside the article, and None is returned.
+    Articles without a fingerprint always pass.
+    """
+    if fingerprint is None:
+        return None
+    original = find_near_duplicate(conn, fingerprint, pending)
+    if original is not None and original != url:
+        logger.info(f"Skipping near-duplicate of {original}: {url}",
+                    extra={'url': url, 'reason': 'duplicate', 'original': original})
+        return ArticleRejected('duplicate')
+    pending.append((url, fingerprint))
+    return None
@@ -0,0 +1,65 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# Defaults shared by both scrapers
+MAX_WORKERS = 8
+PER_HOST_LIMIT = 4
+POLITENESS_DELAY = 0.25  # seconds between request starts to the same host
+
+class HostLimiter:
+    """Limit concurrent requests per host and space out request starts.
+
+    limits maps a host name to a (per_host, delay) pair overriding the defaults.
+    """
+
+    def __init__(self, per_host=PER_HOST_LIMIT, delay=POLITENESS_DELAY, limits=None):
+        self.per_host = per_host
+        self.delay = delay
+        self.limits = {host.lower(): limit for host, limit in (limits or {}).items()}
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                per_host, _ = self.limits.get(host, (self.per_host, self.delay))
+                self._semaphores[host] = threading.BoundedSemaphore(per_host)
+            return self._semaphores[host]
+
+    def _wait_turn(self, host):
+        """Reserve the next start slot for the host and sleep until it arrives."""
+        _, delay = self.limits.get(host, (self.per_host, self.delay))
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + delay
+        if start > now:
+            time.sleep(start - now)
+
+    def run(self, url, func, *args):
+        """Call func(*args) while holding a slot for the url's host."""
+        host = urlparse(url).netloc.lower()
+        with self._semaphore(host):
+            self._wait_turn(host)
+            return func(*args)
+
+def fetch_all(urls, worker, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, delay=POLITENESS_DELAY):
+    """
+    Run worker(url) concurrently for every url and yield (url, result) pairs.
+
+    Results are yielded in the same order as the input urls regardless of the
+    order in which the requests complete, so callers can write them out
+    deterministically as they arrive.
+    """
+    urls = list(urls)
+    if not urls:
+        return
+
+    limiter = HostLimiter(per_host=per_host, delay=delay)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(limiter.run, url, worker, url) for url in urls]
+        for url, future in zip(urls, futures):
+            yield url, future.result()
@@ -1,10 +1,28 @@
 import feedparser
+import logging
 import requests
-from bs4 import BeautifulSoup
 import os
-import re
-from datetime import datetime, timezone
-import email.utils
+from functools import partial
+from urllib.parse import urljoin
+
+import archive_index
+import article_store
+import cleaner
+import dedup
+import html_parser
+import http_cache
+import http_client
+import logs
+import metrics
+import prefilter
+import rejection_cache
+import storage
+from common import is_valid_article, is_within_date_range
+from rejection_cache import ArticleRejected
+from scheduler import run_sources
+from sources import Source
+
+logger = logging.getLogger(__name__)
 
 CUSTOM_RSS_LINKS = {
     "politics": "https://moxie.foxnews.com/google-publisher/politics.xml",
@@ -16,222 +34,309 @@ CUSTOM_RSS_LINKS = {
 DEFAULT_BASE_URL = "https://feeds.foxnews.com/foxnews/"
 CATEGORIES = ["politics", "science", "health", "sports"]
 
-# Constants for filtering
-MAX_WORD_COUNT = 3000
-MAX_IMAGE_COUNT = 10
+def fetch_fox_news_articles(rss_url):
+    try:
+        content = http_cache.conditional_get(rss_url)
+    except requests.RequestException as e:
+        logger.warning(f"Failed to fetch RSS feed {rss_url}: {e}", extra={'url': rss_url})
+        metrics.inc('discovery_errors_total', source='fox')
+        return []
+
+    if content is None:
+        logger.info(f"RSS feed unchanged since last run: {rss_url}", extra={'url': rss_url})
+        return []
 
-def parse_date(date_str):
-    """Parse date string to datetime object."""
     try:
-        # Parse RFC 2822 date format
-        return datetime.fromtimestamp(email.utils.mktime_tz(email.utils.parsedate_tz(date_str)), timezone.utc)
-    except:
-        try:
-            # Try parsing other common date formats
-            return datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S %z')
-        except:
-            return None
-
-def is_within_date_range(date_str):
-    """Check if the article date is within the specified range."""
-    date = parse_date(date_str)
-    if not date:
-        return False
-    
-    start_date = datetime(2024, 12, 15, tzinfo=timezone.utc)
-    end_date = datetime(2025, 2, 17, tzinfo=timezone.utc)
-    
-    return start_date <= date <= end_date
-
-def is_valid_article(word_count, image_count):
-    """Check if article meets the filtering criteria."""
-    return word_count <= MAX_WORD_COUNT and image_count <= MAX_IMAGE_COUNT
+        return parse_feed(content)
+    except ValueError as e:
+        logger.warning(f"Failed to parse RSS feed for {rss_url}: {e}", extra={'url': rss_url})
+        metrics.inc('discovery_errors_total', source='fox')
+        return []
 
-def fetch_fox_news_articles(rss_url):
-    feed = feedparser.parse(rss_url)
+def parse_feed(content):
+    """
+    Return the articles of an RSS feed as dicts of title, url and published_date.
+
+    Raises ValueError when the feed can't be parsed.
+    """
+    feed = feedparser.parse(content)
     if feed.bozo:
-        print(f"Failed to parse RSS feed for {rss_url}.")
-        return []
+        raise ValueError(feed.bozo_exception)
 
     articles = [
         {
             'title': entry.title,
-            'url': entry.link,
-            'published_date': entry.published if 'published' in entry else 'No Date Available'
+            'url': dedup.canonical_url(entry.link),
+            'published_date': entry.get('published') or entry.get('updated') or 'No Date Available'
         }
         for entry in feed.entries
     ]
     return articles
 
-def get_article_details(url):
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        word_count = 0
-        article_content = soup.find('div', {'class': 'article-body'})
-        if not article_content or not article_content.find_all('p', recursive=False):
-            article_content = soup.find('div', {'class': 'paywall'})
-
-        if article_content:
-            paragraphs = article_content.find_all('p', recursive=False)
-            for paragraph in paragraphs:
-                word_count += len(paragraph.get_text().split())
-
-        image_count = 0
-        image_sizes = []
-
-        if article_content:
-            images = article_content.find_all('img')
-            for img in images:
-                width = img.get('width')
-                height = img.get('height')
-
-                if width and height:
-                    try:
-                        width_int = int(width)
-                        height_int = int(height)
-                        if width_int == 896 and height_int == 500:
-                            continue
-                    except ValueError:
-                        pass
-
-                image_count += 1
-                image_sizes.append(f"{width}x{height}" if width and height else "Unknown Size")
-
-        return word_count, image_count, image_sizes
+def _keep_article_body(name, classes):
+    return name == 'div' and ('article-body' in classes or 'paywall' in classes)
+
+# Only the article body containers are needed for word and image counts
+ARTICLE_FILTER = html_parser.tag_filter(_keep_article_body)
+
+# Fox's placeholder image, which isn't counted
+PLACEHOLDER_IMAGE_SIZE = (896, 500)
+UNKNOWN_SIZE = "Unknown Size"
+
+def parse_article_details(markup, base_url=''):
+    """
+    Return (word_count, image_count, image_sizes, fingerprint, unsized) from a downloaded article page.
+
+    unsized holds the URL of each image recorded as "Unknown Size", in order.
+    """
+    soup = html_parser.make_soup(markup, parse_only=ARTICLE_FILTER)
+
+    article_content = soup.find('div', {'class': 'article-body'})
+    if not article_content or not article_content.find_all('p', recursive=False):
+        article_content = soup.find('div', {'class': 'paywall'})
+
+    text = ''
+    if article_content:
+        text = ' '.join(paragraph.get_text() for paragraph in article_content.find_all('p', recursive=False))
+    word_count = len(text.split())
+
+    image_count = 0
+    image_sizes = []
+    unsized = []
+
+    if article_content:
+        images = article_content.find_all('img')
+        for img in images:
+            width = img.get('width')
+            height = img.get('height')
+
+            if width and height:
+                try:
+                    width_int = int(width)
+                    height_int = int(height)
+                    if (width_int, height_int) == PLACEHOLDER_IMAGE_SIZE:
+                        continue
+                except ValueError:
+                    pass
+
+            image_count += 1
+            if width and height:
+                image_sizes.append(f"{width}x{height}")
+            else:
+                image_sizes.append(UNKNOWN_SIZE)
+                unsized.append(urljoin(base_url, img['src']) if img.get('src') else '')
 
+    return word_count, image_count, image_sizes, dedup.simhash(text), unsized
+
+def fetch_article(url):
+    """Download a Fox article page.
+
+    Raises ArticleRejected when the article can't be fetched.
+    """
+    try:
+        return http_client.stream_get(url)
+    except http_client.ResponseTooLarge:
+        logger.info(f"Skipping oversized article: {url}", extra={'url': url, 'reason': 'too_large'})
+        raise ArticleRejected('too_large')
     except requests.RequestException as e:
-        print(f"Failed to fetch {url}: {e}")
-        return 0, 0, []
-    except Exception as e:
-        print(f"An error occurred while processing {url}: {e}")
-        return 0, 0, []
+        logger.warning(f"Failed to fetch {url}: {e}", extra={'url': url, 'reason': 'fetch_error'})
+        raise ArticleRejected('fetch_error')
+    except Exception:
+        logger.exception(f"An error occurred while fetching {url}", extra={'url': url, 'reason': 'fetch_error'})
+        raise ArticleRejected('fetch_error')
+
+def parse_article(url, content):
+    """Parse a downloaded article page. Runs in the pipeline's parse processes.
 
-def update_total_articles_count(filename):
+    Raises ArticleRejected when the article can't be parsed.
+    """
+    try:
+        return parse_article_details(content, url)
+    except Exception:
+        logger.exception(f"An error occurred while processing {url}", extra={'url': url, 'reason': 'parse_error'})
+        raise ArticleRejected('parse_error')
+
+def parse_fox_article(item, content):
+    """Parse stage for the pipeline; item is a (category, article) pair.
+
+    Raises ArticleRejected when the article can't be parsed or is an outlier.
+    """
+    url = item[1]['url']
+    details = parse_article(url, content)
+    if not is_valid_article(details[0], details[1]):
+        logger.info(f"Skipping article due to filtering criteria: {item[1]['title']}",
+                    extra={'url': url, 'reason': 'outlier', 'words': details[0], 'images': details[1]})
+        raise ArticleRejected('outlier')
+    return details
+
+def _image_sizes_str(image_sizes):
+    return ", ".join(image_sizes) if image_sizes else "No Images"
+
+def format_article_block(category, article, details):
+    """Format one article as a block for the output file."""
+    word_count, image_count, image_sizes = details[:3]
+    return (
+        f"Category: {category}\n"
+        f"Title: {article['title']}\n"
+        f"URL: {article['url']}\n"
+        f"Date: {article['published_date']}\n"
+        f"Word Count: {word_count} words\n"
+        f"Images: {image_count} (Sizes: {_image_sizes_str(image_sizes)})"
+    )
+
+def article_record(category, article, details):
+    """Return one article as an article store record."""
+    word_count, image_count, image_sizes = details[:3]
+    return {
+        'Category': category,
+        'Title': article['title'],
+        'URL': article['url'],
+        'Date': article['published_date'],
+        'Word Count': word_count,
+        'Images': image_count,
+        'Image Sizes': _image_sizes_str(image_sizes),
+    }
+
+def clean_existing_file(filename="./article-visualization/public/data/fox_news_articles.txt", incremental=True):
+    """Clean existing file by removing articles that don't meet the criteria.
+
+    Only articles added since the last clean are checked unless incremental
+    is False or the filter rules changed. Returns the URLs of the removed articles.
+    """
     if not os.path.exists(filename):
-        return
-
-    with open(filename, "r", encoding='utf-8') as file:
-        lines = file.readlines()
-
-    article_count = sum(1 for line in lines if line.startswith("Category:"))
-
-    if lines and lines[0].startswith("Total Articles:"):
-        lines[0] = f"Total Articles: {article_count}\n"
-    else:
-        lines.insert(0, f"Total Articles: {article_count}\n")
-
-    with open(filename, "w", encoding='utf-8') as file:
-        file.writelines(lines)
-
-def save_article_data_to_file(articles, category, filename="./article-visualization/public/data/fox_news_articles.txt"):
-    existing_articles = set()
-    if os.path.exists(filename):
-        with open(filename, "r", encoding='utf-8') as file:
-            for line in file:
-                if line.startswith("URL: "):
-                    url = line.split("URL: ")[1].strip()
-                    existing_articles.add(url)
-
-    new_articles_added = 0
-    with open(filename, "a", encoding='utf-8') as file:
-        for article in articles:
-            if article['url'] not in existing_articles:
-                title = article['title']
+        logger.warning(f"File {filename} does not exist.")
+        return []
+
+    logger.info("Cleaning existing file...")
+    _, removed_urls = cleaner.clean_file(filename, incremental)
+    logger.info("File cleaning completed.")
+    return removed_urls
+
+OUTPUT_FILE = "./article-visualization/public/data/fox_news_articles.txt"
+
+class FoxSource(Source):
+    """Scrapes articles listed in the Fox News RSS feeds."""
+
+    name = 'fox'
+    parse = staticmethod(parse_fox_article)
+
+    def __init__(self, filename=OUTPUT_FILE, categories=None, rss_links=None):
+        super().__init__()
+        self.filename = filename
+        self.categories = categories or CATEGORIES
+        self.rss_links = rss_links or CUSTOM_RSS_LINKS
+        self.queued_urls = set()
+        self.requests_saved = 0
+
+    def start(self):
+        self.store = article_store.open_store(self.store_path)
+        rejection_cache.ensure_schema(self.store)
+        rejection_cache.purge_expired(self.store)
+
+        # One-time migration of articles scraped before the store existed
+        if article_store.count_articles(self.store, self.name) == 0:
+            article_store.import_txt(self.store, self.name, self.filename)
+        self.writer = storage.ArticleWriter(self.filename)
+
+    def feeds(self):
+        return [(self.rss_links.get(category, f"{DEFAULT_BASE_URL}{category}"),
+                 partial(self.discover_category, category))
+                for category in self.categories]
+
+    def discover_category(self, category):
+        """
+        Yield (category, article) pairs for new articles in a category's feed.
+
+        Stored, previously rejected and out-of-range articles are dropped
+        before any article requests are made. Runs on the pipeline's discovery
+        thread, so it uses its own store connection, closed when it's done.
+        """
+        rss_url = self.rss_links.get(category, f"{DEFAULT_BASE_URL}{category}")
+        logger.info(f"Scraping category: {category}")
+        articles = fetch_fox_news_articles(rss_url)
+        if not articles:
+            logger.info(f"No articles found for category: {category}")
+            return
+
+        # Filter by the feed's published date before any article requests are made
+        with metrics.timer('stage_seconds', stage='filter', source=self.name):
+            articles, saved_count = prefilter.filter_entries(articles, is_within_date_range)
+        self.requests_saved += saved_count
+        metrics.inc('prefilter_dropped_total', saved_count, source=self.name)
+        logger.info(f"Pre-fetch filter dropped {saved_count} articles outside date range")
+
+        store = article_store.open_store(self.store_path)
+        try:
+            for article in articles:
                 url = article['url']
-                published_date = article['published_date']
-                
-                # Check if article is within date range before processing further
-                if not is_within_date_range(published_date):
-                    print(f"Skipping article outside date range: {title}")
+                with metrics.timer('stage_seconds', stage='filter', source=self.name):
+                    known = (url in self.queued_urls or article_store.has_url(store, url)
+                             or rejection_cache.is_rejected(store, url))
+                if known:
                     continue
-                
-                word_count, image_count, image_sizes = get_article_details(url)
+                self.mark_queued((category, article))
+                yield category, article
+        finally:
+            store.close()
+
+    def url_of(self, item):
+        return item[1]['url']
+
+    def category_of(self, item):
+        return item[0]
+
+    def format(self, item, result):
+        return format_article_block(item[0], item[1], result)
+
+    def record(self, item, result):
+        return article_record(item[0], item[1], result)
 
-                # Check if article meets criteria before saving
-                if not is_valid_article(word_count, image_count):
-                    print(f"Skipping article due to filtering criteria: {title}")
+    def fingerprint(self, item, result):
+        return result[3]
+
+    def image_urls(self, item, result):
+        return [url for url in result[4] if url]
+
+    def with_image_sizes(self, item, result, sizes):
+        word_count, _, image_sizes, fingerprint, unsized = result
+        pending = iter(unsized)
+        resolved = []
+        for size in image_sizes:
+            if size == UNKNOWN_SIZE:
+                probed = sizes.get(next(pending))
+                if probed == PLACEHOLDER_IMAGE_SIZE:
                     continue
+                if probed:
+                    size = f"{probed[0]}x{probed[1]}"
+            resolved.append(size)
+        return word_count, len(resolved), resolved, fingerprint, []
 
-                image_sizes_str = ", ".join(image_sizes) if image_sizes else "No Images"
+    def in_scope(self, item):
+        return is_within_date_range(item[1]['published_date'])
 
-                file.write(
-                    f"Category: {category}\n"
-                    f"Title: {title}\n"
-                    f"URL: {url}\n"
-                    f"Date: {published_date}\n"
-                    f"Word Count: {word_count} words\n"
-                    f"Images: {image_count} (Sizes: {image_sizes_str})\n\n"
-                )
-                print(f"Added article from {category}: {title}")
-                new_articles_added += 1
+    def mark_queued(self, item):
+        self.queued_urls.add(item[1]['url'])
 
-    if new_articles_added > 0:
-        update_total_articles_count(filename)
+    def restore_item(self, value):
+        category, article = value
+        return category, article
 
-def clean_existing_file(filename="./article-visualization/public/data/fox_news_articles.txt"):
-    """Clean existing file by removing articles that don't meet the criteria."""
-    if not os.path.exists(filename):
-        print(f"File {filename} does not exist.")
-        return
-
-    print("Cleaning existing file...")
-    
-    with open(filename, "r", encoding='utf-8') as file:
-        content = file.read()
-
-    # Split content into article blocks
-    articles = content.split("\n\n")
-    
-    # First block might be the total count, preserve it if it exists
-    header = articles[0] if articles[0].startswith("Total Articles:") else None
-    if header:
-        articles = articles[1:]
-
-    cleaned_articles = []
-    for article in articles:
-        if not article.strip():
-            continue
-            
-        # Parse word count and image count
-        word_count_match = re.search(r"Word Count: (\d+)", article)
-        image_count_match = re.search(r"Images: (\d+)", article)
-        date_match = re.search(r"Date: (.+)", article)
-        
-        if word_count_match and image_count_match and date_match:
-            word_count = int(word_count_match.group(1))
-            image_count = int(image_count_match.group(1))
-            date_str = date_match.group(1).strip()
-            
-            # Check both content criteria and date range
-            if is_valid_article(word_count, image_count) and is_within_date_range(date_str):
-                cleaned_articles.append(article)
-            else:
-                print(f"Removing article with {word_count} words, {image_count} images, date: {date_str}")
-
-    # Write cleaned content back to file
-    with open(filename, "w", encoding='utf-8') as file:
-        if header:
-            file.write(header + "\n\n")
-        file.write("\n\n".join(cleaned_articles))
-        if cleaned_articles:
-            file.write("\n\n")  # Add final newlines
-
-    update_total_articles_count(filename)
-    print("File cleaning completed.")
-
-def scrape_all_categories():
-    for category in CATEGORIES:
-        rss_url = CUSTOM_RSS_LINKS.get(category, f"{DEFAULT_BASE_URL}{category}")
-        print(f"Scraping category: {category}")
-        articles = fetch_fox_news_articles(rss_url)
-        if articles:
-            save_article_data_to_file(articles, category)
-        else:
-            print(f"No articles found for category: {category}")
+    def fetch(self, item):
+        return fetch_article(item[1]['url'])
+
+    def finish(self):
+        self.flush()
+        logger.info(f"Added {self.saved_count} articles, {storage.total_articles(self.filename)} in total")
+        logger.info(f"Pre-fetch filter saved {self.requests_saved} requests")
+
+        # Clean the file after scraping to ensure all articles meet criteria
+        removed_urls = clean_existing_file(self.filename)
+        article_store.remove_urls(self.store, removed_urls)
+        archive_index.update(self.filename)
+
+def scrape_all_categories(filename=OUTPUT_FILE):
+    run_sources([FoxSource(filename)])
 
 if __name__ == "__main__":
+    logs.setup_logging()
     scrape_all_categories()
-    clean_existing_file()  # Clean the file after scraping to ensure all articles meet criteria
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Crawl frontier for following section, subsection and pagination links.
+
+Listing pages are expanded breadth-first up to a depth and page budget,
+while the article links found on them come out newest first, by the date
+in their URL, so a crawl cut short still got the freshest articles.
+
+Discovered URLs are also remembered across runs in a Bloom filter: a fixed
+size bit array that answers "maybe seen" or "definitely not seen". A few
+MB track millions of URLs, and a URL it has never seen needs no store
+lookups before it is queued.
+"""
+import hashlib
+import heapq
+import itertools
+import logging
+import math
+import struct
+
+import rejection_cache
+import storage
+from prefilter import date_from_url
+
+SEEN_FILE = "./.frontier_seen.bloom"
+
+# URLs the seen-set is sized for and its false-positive rate at that size.
+# Once it holds more it is rebuilt from the store at twice the capacity.
+SEEN_CAPACITY = 2_000_000
+SEEN_ERROR_RATE = 0.001
+
+# Listing pages fetched per crawl, however many the depth allows
+MAX_PAGES = 50
+
+_MAGIC = b'BLM1'
+# hashes, bits, capacity, count, then the store rowids the filter is synced to
+_HEADER = struct.Struct('<4sIQQQQQ')
+
+_PAGE = 1
+_ARTICLE = 0
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Set of strings that can give false positives but never false negatives."""
+
+    def __init__(self, capacity=SEEN_CAPACITY, error_rate=SEEN_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        # Store rowids up to which every stored and rejected URL has been added
+        self.marks = (0, 0)
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[p >> 3] >> (p & 7) & 1 for p in self._positions(key))
+
+    def add(self, key):
+        """Add key. Returns True if it was definitely not in the filter before."""
+        new = False
+        bits = self.bits
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                new = True
+        self.count += new
+        return new
+
+    def __len__(self):
+        """Number of distinct keys added, give or take false positives."""
+        return self.count
+
+def _high_water_marks(conn):
+    return tuple(conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+                 for table in ('articles', 'rejections'))
+
+def _add_stored(seen, conn, marks=(0, 0)):
+    """Add the URLs stored or rejected after the given rowids. Returns the number added."""
+    added = 0
+    for table, mark in zip(('articles', 'rejections'), marks):
+        for (url,) in conn.execute(f"SELECT url FROM {table} WHERE rowid > ?", (mark,)):
+            added += seen.add(url)
+    return added
+
+def load_seen(conn, path=SEEN_FILE, capacity=SEEN_CAPACITY):
+    """
+    Return the persisted seen-set, brought up to date with the article store.
+
+    URLs stored or rejected since the filter was loaded last are added, so it
+    always covers everything in the store. A missing, corrupt or full filter
+    is rebuilt from the store.
+    """
+    rejection_cache.ensure_schema(conn)
+    marks = _high_water_marks(conn)
+    seen = _read(path)
+    if seen is not None and seen.count > seen.capacity:
+        logger.info(f"Seen-set holds {seen.count} URLs, over its capacity of {seen.capacity}; rebuilding")
+        capacity = seen.capacity * 2
+        seen = None
+    # Rows deleted from the top of a table let SQLite hand out their rowids
+    # again, which the marks can't tell apart from rows already added
+    if seen is not None and any(now < then for now, then in zip(marks, seen.marks)):
+        seen = None
+
+    if seen is None:
+        seen = BloomFilter(capacity)
+    added = _add_stored(seen, conn, seen.marks)
+    seen.marks = marks
+    logger.info(f"Seen-set tracks {len(seen)} URLs ({added} new from the store)")
+    return seen
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            magic, hashes, size, capacity, count, *marks = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                return None
+            seen = BloomFilter.__new__(BloomFilter)
+            seen.capacity, seen.size, seen.hashes, seen.count = capacity, size, hashes, count
+            seen.bits = bytearray(f.read())
+            seen.marks = tuple(marks)
+    except (FileNotFoundError, struct.error):
+        return None
+    if len(seen.bits) != (size + 7) // 8:
+        return None
+    return seen
+
+def save_seen(seen, path=SEEN_FILE):
+    """
+    Write the seen-set to path.
+
+    It records the store rowids from when it was loaded, not the current
+    ones, so URLs other processes store meanwhile are added on the next load.
+    """
+    with storage.atomic_rewrite(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, seen.hashes, seen.size, seen.capacity, seen.count, *seen.marks))
+        f.write(seen.bits)
+
+class Frontier:
+    """
+    Pages and articles waiting to be visited.
+
+    Articles come out before pages, newest first by their URL date (undated
+    ones last); pages come out shallowest first. Each URL is accepted once.
+    """
+
+    def __init__(self, max_depth, max_pages=MAX_PAGES):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.pages = 0
+        self.queue = []
+        self.known = set()
+        self._order = itertools.count()
+
+    def add_page(self, url, depth):
+        if depth > self.max_depth or self.pages >= self.max_pages or url in self.known:
+            return
+        self.known.add(url)
+        self.pages += 1
+        heapq.heappush(self.queue, (_PAGE, depth, next(self._order), url))
+
+    def add_article(self, url):
+        if url in self.known:
+            return
+        self.known.add(url)
+        day = date_from_url(url)
+        heapq.heappush(self.queue, (_ARTICLE, -day.timestamp() if day else 0, next(self._order), url))
+
+    def pop(self):
+        """Return (is_page, url, depth) for the next URL to visit; depth is None for articles."""
+        kind, rank, _, url = heapq.heappop(self.queue)
+        if kind == _PAGE:
+            return True, url, rank
+        return False, url, None
+
+    def __bool__(self):
+        return bool(self.queue)
+
+def crawl(seeds, expand, max_depth, max_pages=MAX_PAGES):
+    """
+    Yield the article URLs reachable from seed pages within max_depth links.
+
+    expand(url, depth) fetches a listing page and returns (article_urls,
+    page_urls) found on it. Pages are only fetched once every article found
+    so far has been yielded, so a consumer that stops early saves the rest.
+    """
+    frontier = Frontier(max_depth, max_pages)
+    for url in seeds:
+        frontier.add_page(url, 0)
+    while frontier:
+        is_page, url, depth = frontier.pop()
+        if not is_page:
+            yield url
+            continue
+        article_urls, page_urls = expand(url, depth)
+        for article_url in article_urls:
+            frontier.add_article(article_url)
+        for page_url in page_urls:
+            frontier.add_page(page_url, depth + 1)
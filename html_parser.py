@@ -0,0 +1,60 @@
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from bs4.filter import ElementFilter
+except ImportError:  # Beautiful Soup < 4.13
+    ElementFilter = None
+
+def default_parser():
+    """Use lxml when it is installed, otherwise the pure-Python html.parser."""
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return 'html.parser'
+    return 'lxml'
+
+# Set HTML_PARSER=html.parser to force the pure-Python backend
+PARSER = os.environ.get('HTML_PARSER') or default_parser()
+
+def class_list(value):
+    """Normalize a raw or parsed class attribute to a list of class names."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return value.split()
+    return list(value)
+
+if ElementFilter is not None:
+    class _TagFilter(ElementFilter):
+        """Filter that decides on each top-level tag from its name and classes."""
+
+        def __init__(self, keep):
+            super().__init__()
+            self.keep = keep
+
+        @property
+        def includes_everything(self):
+            return False
+
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return self.keep(name, class_list((attrs or {}).get('class')))
+
+        def allow_string_creation(self, string):
+            return False
+
+def tag_filter(keep):
+    """
+    Build a parse_only filter from keep(name, classes).
+
+    Top-level tags for which keep returns True are parsed along with their
+    whole subtree; everything else outside them is skipped.
+    """
+    if ElementFilter is None:
+        return SoupStrainer(lambda name, attrs: keep(name, class_list(dict(attrs).get('class'))))
+    return _TagFilter(keep)
+
+def make_soup(markup, parse_only=None, parser=None):
+    """Parse markup with the configured backend."""
+    return BeautifulSoup(markup, parser or PARSER, parse_only=parse_only)
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import time
+
+import http_client
+
+CACHE_DIR = "./.http_cache"
+MAX_CACHE_AGE = 7 * 24 * 3600  # seconds
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+
+def _cache_paths(url, cache_dir):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    base = os.path.join(cache_dir, key)
+    return base + '.json', base + '.body'
+
+def _load_entry(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _store_entry(url, response, meta_path, body_path):
+    meta = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'stored_at': time.time(),
+        'size': len(response.content),
+    }
+    with open(body_path, 'wb') as f:
+        f.write(response.content)
+    _write_meta(meta, meta_path)
+
+def _write_meta(meta, meta_path):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+def conditional_get(url, cache_dir=CACHE_DIR):
+    """
+    Fetch a url, sending If-None-Match/If-Modified-Since from the cache.
+
+    Returns the response body as bytes when the resource has changed, or
+    None when the server answered 304 Not Modified. Raises
+    requests.RequestException on network or HTTP errors.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path, body_path = _cache_paths(url, cache_dir)
+    entry = _load_entry(meta_path)
+
+    headers = {}
+    if entry and os.path.exists(body_path):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = http_client.get(url, headers=headers)
+    if response.status_code == 304 and entry:
+        # Refresh the entry's age so it isn't evicted while still in use
+        entry['stored_at'] = time.time()
+        _write_meta(entry, meta_path)
+        return None
+
+    response.raise_for_status()
+    if response.headers.get('ETag') or response.headers.get('Last-Modified'):
+        _store_entry(url, response, meta_path, body_path)
+    return response.content
+
+def cached_body(url, cache_dir=CACHE_DIR):
+    """Return the body conditional_get last stored for url, or None."""
+    _, body_path = _cache_paths(url, cache_dir)
+    try:
+        with open(body_path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def evict(cache_dir=CACHE_DIR, max_age=MAX_CACHE_AGE, max_bytes=MAX_CACHE_BYTES):
+    """Drop entries older than max_age, then the oldest until under max_bytes."""
+    if not os.path.isdir(cache_dir):
+        return
+
+    now = time.time()
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.json'):
+            continue
+        meta_path = os.path.join(cache_dir, name)
+        body_path = meta_path[:-len('.json')] + '.body'
+        entry = _load_entry(meta_path)
+        if entry is None or now - entry.get('stored_at', 0) > max_age:
+            _remove(meta_path, body_path)
+            continue
+        entries.append((entry.get('stored_at', 0), entry.get('size', 0), meta_path, body_path))
+
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, meta_path, body_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(meta_path, body_path)
+        total -= size
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,109 @@
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 15)
+
+# Retry settings for transient failures
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 20
+
+def _accept_encoding():
+    """Only advertise brotli when a decoder is installed for requests to use."""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return 'gzip, deflate'
+    return 'gzip, deflate, br'
+
+def _record_response(response, *args, **kwargs):
+    """Response hook counting final statuses per host (retried attempts aren't seen here)."""
+    metrics.inc('http_responses_total', host=urlparse(response.url).netloc, status=response.status_code)
+
+def create_session():
+    """Create a session with connection pooling, retries and default headers."""
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        backoff_jitter=BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': _accept_encoding(),
+    })
+    session.hooks['response'].append(_record_response)
+    return session
+
+_session = None
+
+def get_session():
+    """Return the shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+def get(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """GET a url through the shared session with a default timeout."""
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+# Streaming downloads are abandoned past this size
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+
+class ResponseTooLarge(Exception):
+    """Raised when a streamed response exceeds its byte limit."""
+
+def stream_get(url, check_head=None, max_bytes=MAX_PAGE_BYTES, timeout=DEFAULT_TIMEOUT):
+    """
+    Download a page incrementally and return its body as bytes.
+
+    As soon as the closing </head> tag has arrived, check_head(head_bytes)
+    is called. If it raises, the connection is closed without reading the
+    rest of the page and the exception propagates. Raises ResponseTooLarge
+    once more than max_bytes have been read, and requests.RequestException
+    on network or HTTP errors.
+    """
+    with get_session().get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        if int(response.headers.get('Content-Length') or 0) > max_bytes:
+            raise ResponseTooLarge(f"{url} is larger than {max_bytes} bytes")
+
+        body = bytearray()
+        head_checked = check_head is None
+        for chunk in response.iter_content(CHUNK_SIZE):
+            search_from = max(0, len(body) - len(b'</head>'))
+            body.extend(chunk)
+            if len(body) > max_bytes:
+                raise ResponseTooLarge(f"{url} is larger than {max_bytes} bytes")
+            if not head_checked:
+                head_end = bytes(body[search_from:]).lower().find(b'</head>')
+                if head_end != -1:
+                    head_checked = True
+                    check_head(bytes(body[:search_from + head_end + len(b'</head>')]))
+        return bytes(body)
@@ -0,0 +1,161 @@
+import logging
+import struct
+import time
+
+import requests
+
+import fetcher
+import http_client
+import metrics
+
+# The first request asks for this many bytes; more are requested, doubling
+# each time, only for JPEGs whose size comes after a large EXIF block
+PROBE_BYTES = 4 * 1024
+MAX_PROBE_BYTES = 128 * 1024
+
+PROBE_WORKERS = 16
+PROBE_PER_HOST = 8
+
+# How long a failed probe is remembered before the image is tried again
+FAILED_PROBE_TTL = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_sizes (
+    url TEXT PRIMARY KEY,
+    width INTEGER,
+    height INTEGER,
+    probed_at INTEGER NOT NULL
+);
+"""
+
+# JPEG start-of-frame markers, which carry the image size
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers without a length field
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD8, *range(0xD0, 0xD8)}
+
+logger = logging.getLogger(__name__)
+
+def _jpeg_size(data):
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _JPEG_STANDALONE_MARKERS:
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30 and data[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(data) >= 25 and data[20] == 0x2F:
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, (bits >> 14 & 0x3FFF) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+def image_size(data):
+    """Return (width, height) from the start of a JPEG, PNG, GIF or WebP file, or None."""
+    data = bytes(data)
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and len(data) >= 24 and data[12:16] == b'IHDR':
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    if data.startswith(b'RIFF') and data[8:12] == b'WEBP':
+        return _webp_size(data)
+    if data.startswith(b'\xff\xd8'):
+        return _jpeg_size(data)
+    return None
+
+def probe(url):
+    """
+    Return an image's (width, height) from its first few KB, or None.
+
+    Servers that ignore the Range header are read only as far as needed.
+    """
+    data = bytearray()
+    end = PROBE_BYTES
+    try:
+        while len(data) < MAX_PROBE_BYTES:
+            headers = {'Range': f"bytes={len(data)}-{end - 1}"}
+            with http_client.get(url, headers=headers, stream=True) as response:
+                if response.status_code == 416:
+                    return None
+                response.raise_for_status()
+                whole_file = response.status_code != 206
+                for chunk in response.iter_content(http_client.CHUNK_SIZE):
+                    data.extend(chunk)
+                    size = image_size(data)
+                    if size:
+                        return size
+                    if len(data) >= MAX_PROBE_BYTES:
+                        return None
+            if whole_file or len(data) < end:
+                return None
+            end = min(end * 2, MAX_PROBE_BYTES)
+    except requests.RequestException as e:
+        logger.info(f"Failed to probe image {url}: {e}", extra={'url': url})
+    return None
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+def cached_sizes(conn, urls, now=None):
+    """Return {url: (width, height) or None} for the urls with a usable cache entry."""
+    now = int(now if now is not None else time.time())
+    found = {}
+    for url in urls:
+        row = conn.execute("SELECT width, height, probed_at FROM image_sizes WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            continue
+        width, height, probed_at = row
+        if width is not None:
+            found[url] = (width, height)
+        elif now - probed_at < FAILED_PROBE_TTL:
+            found[url] = None
+    return found
+
+def probe_all(conn, urls, max_workers=PROBE_WORKERS, per_host=PROBE_PER_HOST):
+    """
+    Look up the sizes of many images, probing the uncached ones concurrently.
+
+    Results are cached in conn (the article store). Returns {url: (width, height)}
+    for the images whose size is known.
+    """
+    ensure_schema(conn)
+    urls = set(urls)
+    sizes = cached_sizes(conn, urls)
+    metrics.inc('image_probes_total', len(sizes), result='cached')
+
+    missing = sorted(urls - sizes.keys())
+    rows = []
+    now = int(time.time())
+    for url, size in fetcher.fetch_all(missing, probe, max_workers=max_workers, per_host=per_host, delay=0):
+        sizes[url] = size
+        rows.append((url, *(size or (None, None)), now))
+        metrics.inc('image_probes_total', result='probed' if size else 'failed')
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO image_sizes VALUES (?, ?, ?, ?)", rows)
+    return {url: size for url, size in sizes.items() if size}
+
+def resolve(conn, source, pending):
+    """
+    Fill in the image sizes of parsed (item, result) pairs for a source.
+
+    Returns the pairs with each result replaced by source.with_image_sizes(),
+    which may be an ArticleRejected.
+    """
+    urls = {url for item, result in pending for url in source.image_urls(item, result)}
+    sizes = probe_all(conn, urls) if urls else {}
+    return [(item, source.with_image_sizes(item, result, sizes)) for item, result in pending]
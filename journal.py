@@ -0,0 +1,202 @@
+"""
+Write-ahead journal of a run's work items, so an interrupted run can resume.
+
+    python scheduler.py cnn fox --resume
+
+Each work item is journaled when discovery hands it to the pipeline, when
+its fetch starts and when its result reaches the source. Every record
+carries a CRC, so a record torn by a crash is recognized and ignored, and
+records are fsynced in groups rather than one by one. The journal is
+removed once the run finishes.
+
+With --resume, the items an interrupted run discovered but never stored are
+run first, then discovery continues as usual. Items that were being fetched
+in MAX_CRASHES interrupted runs are given up on as 'crashed' for a day, so
+one bad page can't take down every resumed run.
+"""
+import json
+import logging
+import os
+import threading
+import zlib
+
+import article_store
+import rejection_cache
+import storage
+
+JOURNAL_FILE = "./.run_journal"
+
+# Journaled records reach the disk within this many seconds, or sooner once
+# this many are waiting
+GROUP_COMMIT_SECONDS = 0.2
+GROUP_COMMIT_RECORDS = 256
+
+# Interrupted runs an item may be mid-fetch in before it is given up on
+MAX_CRASHES = 2
+
+DISCOVERED = 'D'
+STARTED = 'S'
+COMPLETED = 'C'
+
+logger = logging.getLogger(__name__)
+
+def _encode(record):
+    data = json.dumps(record, separators=(',', ':')).encode('utf-8')
+    return b'%08x %s\n' % (zlib.crc32(data), data)
+
+def read_records(path=JOURNAL_FILE):
+    """Yield a journal's records in order, stopping at the first torn or corrupt one."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            if not line.endswith(b'\n') or line[8:9] != b' ':
+                return
+            data = line[9:-1]
+            try:
+                if int(line[:8], 16) != zlib.crc32(data):
+                    return
+            except ValueError:
+                return
+            yield json.loads(data)
+
+def unfinished(path=JOURNAL_FILE):
+    """
+    Return the items in a journal as (source, url, item, crashes) tuples.
+
+    Completed items are included too, since a source may not have written
+    their results out before the run died; resume_streams() checks them
+    against the store. crashes counts the interrupted runs the item was
+    being fetched in.
+    """
+    items = {}
+    in_flight = set()
+    for op, source, url, *rest in read_records(path):
+        key = (source, url)
+        if op == DISCOVERED:
+            items[key] = rest
+        elif op == STARTED:
+            in_flight.add(key)
+        elif op == COMPLETED:
+            in_flight.discard(key)
+    return [(source, url, item, crashes + ((source, url) in in_flight))
+            for (source, url), (item, crashes) in items.items()]
+
+class Journal:
+    """
+    Append-only record of the work items of a run. Safe to use from several threads.
+
+    Opening a journal starts a new one. With resume, the unfinished items of
+    the old one are carried over and kept in self.resumed; otherwise they
+    are dropped.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, resume=False):
+        self.path = path
+        left = unfinished(path)
+        self.resumed = left if resume else []
+        if left and not resume:
+            logger.warning(f"Discarding {len(left)} articles journaled by an interrupted run; "
+                           f"use --resume to run them")
+        with storage.atomic_rewrite(path, 'wb') as f:
+            for source, url, item, crashes in self.resumed:
+                f.write(_encode([DISCOVERED, source, url, item, crashes]))
+
+        self._file = open(path, 'ab')
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sync_periodically, daemon=True)
+        self._thread.start()
+
+    def _append(self, record):
+        data = _encode(record)
+        with self._lock:
+            self._file.write(data)
+            self._unsynced += 1
+            full = self._unsynced >= GROUP_COMMIT_RECORDS
+        if full:
+            self.sync()
+
+    def sync(self):
+        """Make every record appended so far durable."""
+        with self._lock:
+            if not self._unsynced or self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def _sync_periodically(self):
+        while not self._stop.wait(GROUP_COMMIT_SECONDS):
+            self.sync()
+
+    def discovered(self, source, url, item):
+        self._append([DISCOVERED, source, url, item, 0])
+
+    def started(self, source, url):
+        self._append([STARTED, source, url])
+
+    def completed(self, source, url):
+        self._append([COMPLETED, source, url])
+
+    def record_discovery(self, source, stream):
+        """Pass a source's discovery stream through, journaling each item."""
+        for item in stream:
+            self.discovered(source.name, source.url_of(item), item)
+            yield item
+
+    def checkpoint(self):
+        """Start over with an empty journal, once every item so far has been written out."""
+        with self._lock:
+            self._file.close()
+            self._file = open(self.path, 'wb')
+            self._unsynced = 0
+        self.resumed = []
+
+    def close(self, finished=False):
+        """Stop journaling. A finished run's journal is removed, since there is nothing to resume."""
+        if self._file.closed:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.sync()
+        with self._lock:
+            self._file.close()
+        if finished:
+            os.remove(self.path)
+
+def resume_streams(sources, journal):
+    """
+    Return (source index, items) pairs for the journal's resumed items.
+
+    Items already stored or rejected are marked completed and skipped, as
+    are items that crashed too many runs, which are rejected as 'crashed'.
+    The sources must be started; every item is marked queued with them, so
+    discovery won't queue it again.
+    """
+    indexes = {source.name: index for index, source in enumerate(sources)}
+    items = {index: [] for index in indexes.values()}
+    crashed = {index: [] for index in indexes.values()}
+    for name, url, item, crashes in journal.resumed:
+        index = indexes.get(name)
+        if index is None:
+            continue
+        source = sources[index]
+        item = source.restore_item(item)
+        source.mark_queued(item)
+        if article_store.has_url(source.store, url) or rejection_cache.is_rejected(source.store, url):
+            journal.completed(name, url)
+        elif crashes >= MAX_CRASHES:
+            logger.warning(f"Giving up on {url}, which was being fetched in {crashes} interrupted runs",
+                           extra={'url': url, 'reason': 'crashed'})
+            crashed[index].append((url, 'crashed'))
+            journal.completed(name, url)
+        else:
+            items[index].append(item)
+    for index, rejections in crashed.items():
+        rejection_cache.record_rejections(sources[index].store, rejections)
+    logger.info(f"Resuming {sum(len(pending) for pending in items.values())} unfinished articles")
+    return list(items.items())
@@ -0,0 +1,48 @@
+import json
+import logging
+import os
+import sys
+import time
+
+# "text" prints plain messages like before; "json" writes one object per line
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON, including any extra= fields."""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+_config = None
+
+def setup_logging(log_format=None, level=logging.INFO):
+    """Send log records to stdout as text or JSON. Safe to call more than once."""
+    global _config
+    log_format = log_format or LOG_FORMAT
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter('%(message)s'))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    _config = (log_format, level)
+
+def current_config():
+    """Return the arguments setup_logging was last called with, for worker processes."""
+    return _config
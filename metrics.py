@@ -0,0 +1,139 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the timing histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Help text for the metrics the scrapers record, used in the Prometheus output
+DESCRIPTIONS = {
+    'stage_seconds': 'Time spent per item in each pipeline stage',
+    'articles_discovered_total': 'Work items queued for fetching',
+    'articles_saved_total': 'Articles written to the output file',
+    'articles_rejected_total': 'Articles skipped, by rejection reason',
+    'prefilter_dropped_total': 'Articles dropped before fetching',
+    'discovery_errors_total': 'Section pages and feeds that could not be fetched or read',
+    'http_responses_total': 'HTTP responses received, by status code',
+    'image_probes_total': 'Image size lookups, by whether they were cached, probed or failed',
+    'polls_total': 'Daemon feed polls, by whether they found new articles',
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def inc(name, amount=1, **labels):
+    """Add amount to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def observe(name, value, **labels):
+    """Record one observation (usually seconds) in a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(DEFAULT_BUCKETS), 'count': 0, 'sum': 0.0}
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+                break
+        histogram['count'] += 1
+        histogram['sum'] += value
+
+@contextmanager
+def timer(name, **labels):
+    """Observe how long the block takes, even if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def snapshot():
+    """Return the current values as plain data, for logging or tests."""
+    with _lock:
+        return {
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in sorted(_counters.items())],
+            'histograms': [{'name': name, 'labels': dict(labels), 'count': h['count'], 'sum': h['sum']}
+                           for (name, labels), h in sorted(_histograms.items())],
+        }
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+def _header(lines, name, kind):
+    if name in DESCRIPTIONS:
+        lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+    lines.append(f"# TYPE {name} {kind}")
+
+def render():
+    """Return all metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, {**h, 'buckets': list(h['buckets'])}) for key, h in _histograms.items())
+
+    lines = []
+    previous = None
+    for (name, labels), value in counters:
+        if name != previous:
+            _header(lines, name, 'counter')
+            previous = name
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    previous = None
+    for (name, labels), histogram in histograms:
+        if name != previous:
+            _header(lines, name, 'histogram')
+            previous = name
+        cumulative = 0
+        for bound, count in zip(DEFAULT_BUCKETS, histogram['buckets']):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+def write(path):
+    """Dump the metrics to a file in the Prometheus text format."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render())
+
+def serve(port, host='127.0.0.1'):
+    """Serve the metrics at http://host:port/metrics from a background thread. Returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
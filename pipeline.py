@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import logs
+import metrics
+from fetcher import MAX_WORKERS, HostLimiter
+from rejection_cache import ArticleRejected
+
+# Most items that can be between discovery and the writer at any time
+MAX_IN_FLIGHT = 64
+PARSE_WORKERS = os.cpu_count() or 1
+
+_DONE = object()
+
+def run_pipeline(items, fetch, parse, write, url_of=lambda item: item,
+                 fetch_workers=MAX_WORKERS, parse_workers=PARSE_WORKERS,
+                 max_in_flight=MAX_IN_FLIGHT, limiter=None,
+                 source_of=lambda item: None, category_of=lambda item: None):
+    """
+    Run discovery -> fetch -> parse -> write with bounded memory.
+
+    Args:
+        items: Iterable of work items, consumed lazily on a discovery thread
+        fetch: fetch(item) -> payload, run on I/O threads through the host limiter
+        parse: parse(item, payload) -> result, run in a process pool. Must be a
+            module-level function so it can be pickled.
+        write: write(item, result) called on the calling thread in discovery
+            order. result is an ArticleRejected when fetch or parse rejected it.
+        url_of: Returns the url of an item, used for per-host limits
+        fetch_workers: Number of I/O threads
+        parse_workers: Number of parse processes; 0 parses on a thread instead
+        max_in_flight: Items allowed between discovery and the writer. Discovery
+            blocks once this many are outstanding.
+        limiter: HostLimiter to share between pipelines
+        source_of, category_of: Return the source and category of an item,
+            used to label its metrics
+
+    Returns:
+        int: Number of items written
+    """
+    limiter = limiter or HostLimiter()
+    window = threading.BoundedSemaphore(max_in_flight)
+    fetch_queue = queue.Queue(max_in_flight)
+    parse_queue = queue.Queue(max_in_flight)
+    # Bounded by the window, so it never holds more than max_in_flight items
+    results = queue.Queue()
+
+    def discover():
+        count = 0
+        try:
+            for item in items:
+                metrics.inc('articles_discovered_total', source=source_of(item), category=category_of(item))
+                window.acquire()
+                fetch_queue.put((count, item))
+                count += 1
+        except BaseException as e:
+            results.put((_DONE, count, e))
+        else:
+            results.put((_DONE, count, None))
+        finally:
+            for _ in range(fetch_workers):
+                fetch_queue.put(_DONE)
+
+    def fetch_worker():
+        while True:
+            task = fetch_queue.get()
+            if task is _DONE:
+                break
+            seq, item = task
+            try:
+                payload, seconds = limiter.run(url_of(item), _timed, fetch, item)
+            except Exception as e:
+                payload, seconds = e, None
+            if seconds is not None:
+                metrics.observe('stage_seconds', seconds, stage='fetch', source=source_of(item))
+            if isinstance(payload, Exception):
+                results.put((seq, item, payload))
+                continue
+            parse_queue.put((seq, item, payload))
+
+    def parse_dispatcher(executor):
+        while True:
+            task = parse_queue.get()
+            if task is _DONE:
+                break
+            seq, item, payload = task
+            if executor is None:
+                record_parse(seq, item, _timed(parse, item, payload))
+                continue
+            # Timed in the worker, so the time spent queued for a process isn't counted
+            future = executor.submit(_timed, parse, item, payload)
+            future.add_done_callback(lambda f, seq=seq, item=item: record_parse(seq, item, _outcome(f)))
+
+    def record_parse(seq, item, outcome):
+        if isinstance(outcome, tuple):
+            result, seconds = outcome
+            metrics.observe('stage_seconds', seconds, stage='parse', source=source_of(item))
+        else:
+            result = outcome
+        results.put((seq, item, result))
+
+    # Worker processes are started while the I/O threads are running, so
+    # spawn them fresh rather than forking a multi-threaded process.
+    executor = ProcessPoolExecutor(parse_workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker, initargs=(logs.current_config(),)) \
+        if parse_workers else None
+    fetch_threads = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(fetch_workers)]
+    threads = [threading.Thread(target=discover, daemon=True),
+               threading.Thread(target=parse_dispatcher, args=(executor,), daemon=True)] + fetch_threads
+    for thread in threads:
+        thread.start()
+
+    written = 0
+    total = None
+    pending = {}
+    try:
+        while total is None or written < total:
+            seq, item, result = results.get()
+            if seq is _DONE:
+                total, error = item, result
+                if error is not None:
+                    raise error
+                continue
+            pending[seq] = (item, result)
+
+            # Write everything that is now contiguous with what was written
+            while written in pending:
+                item, result = pending.pop(written)
+                if isinstance(result, Exception) and not isinstance(result, ArticleRejected):
+                    raise result
+                source, category = source_of(item), category_of(item)
+                with metrics.timer('stage_seconds', stage='write', source=source):
+                    write(item, result)
+                if isinstance(result, ArticleRejected):
+                    metrics.inc('articles_rejected_total', source=source, category=category, reason=result.reason)
+                else:
+                    metrics.inc('articles_saved_total', source=source, category=category)
+                written += 1
+                window.release()
+    finally:
+        finished = total is not None and written == total
+        if finished:
+            for thread in fetch_threads:
+                thread.join()
+            parse_queue.put(_DONE)
+        # On errors the remaining daemon threads are abandoned
+        if executor is not None:
+            executor.shutdown(wait=finished, cancel_futures=not finished)
+    return written
+
+def _timed(func, *args):
+    """Call func(*args) and return (result, seconds). An Exception raised is returned as the result."""
+    started = time.perf_counter()
+    try:
+        result = func(*args)
+    except Exception as e:
+        result = e
+    return result, time.perf_counter() - started
+
+def _init_worker(log_config):
+    """Set up logging in a parse process the same way as in the parent."""
+    if log_config is not None:
+        logs.setup_logging(*log_config)
+
+def _outcome(future):
+    """Return a finished future's result, or its exception."""
+    error = future.exception()
+    return error if error is not None else future.result()
@@ -0,0 +1,55 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+# CNN article URLs look like https://www.cnn.com/2024/12/17/politics/slug/index.html
+URL_DATE_PATTERN = re.compile(r'/(\d{4})/(\d{2})/(\d{2})/')
+
+# The date in a URL is the newsroom's local day, which can differ from the
+# UTC publication time by up to a day either way.
+URL_DATE_SLACK = timedelta(days=1)
+
+def date_from_url(url):
+    """Return the publication day encoded in a URL path, or None."""
+    match = URL_DATE_PATTERN.search(url)
+    if not match:
+        return None
+    try:
+        return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)), tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def url_outside_date_range(url, start_date, end_date):
+    """Check whether a URL's path date proves the article is outside the range."""
+    day = date_from_url(url)
+    if day is None:
+        return False
+    return day + timedelta(days=1) + URL_DATE_SLACK <= start_date or day - URL_DATE_SLACK > end_date
+
+def filter_urls(urls, start_date, end_date, get_category=None):
+    """
+    Drop article URLs that are provably out of scope before fetching them.
+
+    A URL is dropped when get_category(url) returns 'unknown' or when the
+    date in its path is outside the date range.
+
+    Returns:
+        tuple: (kept urls, number of requests saved)
+    """
+    kept = []
+    for url in urls:
+        if get_category and get_category(url) == 'unknown':
+            continue
+        if url_outside_date_range(url, start_date, end_date):
+            continue
+        kept.append(url)
+    return kept, len(urls) - len(kept)
+
+def filter_entries(entries, is_within_date_range):
+    """
+    Drop RSS entries whose published date is outside the date range.
+
+    Returns:
+        tuple: (kept entries, number of requests saved)
+    """
+    kept = [entry for entry in entries if is_within_date_range(entry['published_date'])]
+    return kept, len(entries) - len(kept)
@@ -0,0 +1,218 @@
+"""
+Typed article records, one at a time or as columnar batches.
+
+Output file blocks hold everything as text ("Word Count: 1280 words",
+"Images: 3 (Sizes: 2400x1705, ...)"). parse_fields() splits a block into
+its "Key: value" lines once, and ArticleRecord and RecordBatch both type
+those fields the same way (see _typed_fields), so a single article and a
+batch of them always agree on what a block says. A RecordBatch holds many
+articles as columns of ints and epoch timestamps, so the date-window and
+outlier rules run over a whole batch at once. Batches use NumPy when it is
+installed and compact array.array columns otherwise; without NumPy the
+cleaner checks records one at a time instead (see cleaner.check_blocks),
+which is faster in plain Python.
+"""
+import re
+from array import array
+from datetime import date as _date
+
+import common
+
+try:
+    import numpy as np
+except ImportError:  # Fall back to array.array columns and Python loops
+    np = None
+
+# Blocks parsed per batch when filtering a file
+BATCH_SIZE = 4096
+
+LEADING_NUMBER_PATTERN = re.compile(r'\d+')
+SIZE_PATTERN = re.compile(r'(\d+)x(\d+)')
+
+_MONTHS = {name: number for number, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+_EPOCH_ORDINAL = _date(1970, 1, 1).toordinal()
+
+# Stand-in for a missing word or image count in integer columns
+MISSING = -1
+_NAN = float('nan')
+
+def timestamp(date_str):
+    """
+    Return a block's date as epoch seconds, or None.
+
+    Dates in the "Tue, 17 Dec 2024 10:00:42 +0000" form the scrapers write
+    are decoded directly; anything else goes through common.parse_date.
+    """
+    try:
+        parts = date_str.split()
+        if len(parts) == 6:
+            parts = parts[1:]
+        day, month, year, clock, zone = parts
+        hours, minutes, seconds = clock.split(':')
+        if len(zone) != 5 or zone[0] not in '+-':
+            raise ValueError(zone)
+        offset = int(zone[1:3]) * 3600 + int(zone[3:]) * 60
+        days = _date(int(year), _MONTHS[month], int(day)).toordinal() - _EPOCH_ORDINAL
+        return (days * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+                - (offset if zone[0] == '+' else -offset))
+    except (KeyError, ValueError):
+        return common.published_timestamp(date_str)
+
+def parse_fields(block):
+    """Return a block's "Key: value" lines as a dict. Only the text before a line's first colon is a key."""
+    fields = {}
+    for line in block.split('\n'):
+        key, separator, value = line.partition(':')
+        if separator:
+            fields[key.strip()] = value.strip()
+    return fields
+
+def _typed_fields(fields, image_sizes=True):
+    """
+    Return (date, published_at, word_count, image_count, image_sizes) from parse_fields() output.
+
+    With image_sizes=False the sizes are left empty, which saves parsing
+    them when only the filters are applied.
+    """
+    date = fields.get('Date') or None
+    published_at = timestamp(date) if date else None
+    match = LEADING_NUMBER_PATTERN.match(fields.get('Word Count', ''))
+    word_count = int(match.group()) if match else None
+    images = fields.get('Images', '')
+    match = LEADING_NUMBER_PATTERN.match(images)
+    image_count = int(match.group()) if match else None
+    if image_sizes:
+        image_sizes = tuple([(int(width), int(height)) for width, height in SIZE_PATTERN.findall(images)])
+    return date, published_at, word_count, image_count, image_sizes or ()
+
+def _rules():
+    # Read at call time, so changes to the settings in common apply
+    return (common.START_DATE.timestamp(), common.END_DATE.timestamp(),
+            common.MAX_WORD_COUNT, common.MAX_IMAGE_COUNT)
+
+class ArticleRecord:
+    """One article with typed fields. image_sizes is a tuple of (width, height) pairs."""
+
+    __slots__ = ('category', 'title', 'url', 'date', 'published_at', 'word_count', 'image_count', 'image_sizes')
+
+    def __init__(self, category=None, title=None, url=None, date=None, published_at=None,
+                 word_count=None, image_count=None, image_sizes=()):
+        self.category = category
+        self.title = title
+        self.url = url
+        self.date = date
+        self.published_at = published_at
+        self.word_count = word_count
+        self.image_count = image_count
+        self.image_sizes = image_sizes
+
+    @classmethod
+    def from_fields(cls, fields, image_sizes=True):
+        """Build a record from parse_fields() output. Fields missing from it are None."""
+        return cls(fields.get('Category'), fields.get('Title'), fields.get('URL'),
+                   *_typed_fields(fields, image_sizes))
+
+    @classmethod
+    def from_block(cls, block, image_sizes=True):
+        """Parse an output file block. Fields missing from it are None; see _typed_fields for image_sizes."""
+        return cls.from_fields(parse_fields(block), image_sizes)
+
+    def is_complete(self):
+        """Whether the block had the word count, image count and date the filters need."""
+        return self.word_count is not None and self.image_count is not None and self.date is not None
+
+    def keep(self):
+        """Whether the article passes the outlier (is_valid_article) and date-window rules."""
+        start, end, _, _ = _rules()
+        return (self.is_complete() and common.is_valid_article(self.word_count, self.image_count)
+                and self.published_at is not None and start <= self.published_at <= end)
+
+    def __repr__(self):
+        return f"ArticleRecord({self.url!r}, {self.word_count} words, {self.image_count} images)"
+
+class RecordBatch:
+    """
+    Many articles as columns.
+
+    Counts are int32 (MISSING when absent), publication times float64 epoch
+    seconds (NaN when absent) and image sizes one (width, height) int32 row
+    per image, with image_offsets[i]:image_offsets[i + 1] selecting article
+    i's rows. Strings stay in plain lists.
+    """
+
+    def __init__(self, categories=(), titles=(), urls=(), dates=(), word_counts=(), image_counts=(),
+                 published_at=(), image_dims=(), image_offsets=(0,)):
+        self.categories = list(categories)
+        self.titles = list(titles)
+        self.urls = list(urls)
+        self.dates = list(dates)
+        if np is not None:
+            self.word_counts = np.array(word_counts, dtype=np.int32)
+            self.image_counts = np.array(image_counts, dtype=np.int32)
+            self.published_at = np.array(published_at, dtype=np.float64)
+            self.image_dims = np.array(image_dims, dtype=np.int32).reshape(-1, 2)
+            self.image_offsets = np.array(image_offsets, dtype=np.int64)
+        else:
+            self.word_counts = array('i', word_counts)
+            self.image_counts = array('i', image_counts)
+            self.published_at = array('d', published_at)
+            self.image_dims = array('i', image_dims)
+            self.image_offsets = array('q', image_offsets)
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """Parse output file blocks straight into columns, without an object per article."""
+        categories, titles, urls, dates, word_counts, image_counts, published_at, dims = [], [], [], [], [], [], [], []
+        offsets = [0]
+        for block in blocks:
+            fields = parse_fields(block)
+            categories.append(fields.get('Category'))
+            titles.append(fields.get('Title'))
+            urls.append(fields.get('URL'))
+            date, seconds, word_count, image_count, sizes = _typed_fields(fields)
+            dates.append(date)
+            published_at.append(_NAN if seconds is None else seconds)
+            word_counts.append(MISSING if word_count is None else word_count)
+            image_counts.append(MISSING if image_count is None else image_count)
+            for width, height in sizes:
+                dims.append(width)
+                dims.append(height)
+            offsets.append(offsets[-1] + len(sizes))
+        return cls(categories, titles, urls, dates, word_counts, image_counts, published_at, dims, offsets)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __getitem__(self, i):
+        start, end = int(self.image_offsets[i]), int(self.image_offsets[i + 1])
+        if np is not None:
+            sizes = tuple(map(tuple, self.image_dims[start:end].tolist()))
+        else:
+            flat = self.image_dims[start * 2:end * 2]
+            sizes = tuple(zip(flat[::2], flat[1::2]))
+        word_count, image_count = int(self.word_counts[i]), int(self.image_counts[i])
+        published_at = float(self.published_at[i])
+        return ArticleRecord(self.categories[i], self.titles[i], self.urls[i], self.dates[i],
+                             None if published_at != published_at else published_at,
+                             None if word_count == MISSING else word_count,
+                             None if image_count == MISSING else image_count, sizes)
+
+    def complete_mask(self):
+        """Which articles have a word count, image count and date."""
+        dated = [date is not None for date in self.dates]
+        if np is not None:
+            return (self.word_counts != MISSING) & (self.image_counts != MISSING) & np.array(dated, dtype=bool)
+        return [w != MISSING and i != MISSING and d
+                for w, i, d in zip(self.word_counts, self.image_counts, dated)]
+
+    def keep_mask(self):
+        """Return which articles pass the outlier and date-window rules (ArticleRecord.keep for every row)."""
+        start, end, max_words, max_images = _rules()
+        complete = self.complete_mask()
+        if np is not None:
+            # NaN publication times compare False, so undated articles fail
+            return (complete & (self.word_counts <= max_words) & (self.image_counts <= max_images)
+                    & (self.published_at >= start) & (self.published_at <= end))
+        return [c and w <= max_words and i <= max_images and start <= p <= end
+                for c, w, i, p in zip(complete, self.word_counts, self.image_counts, self.published_at)]
@@ -0,0 +1,60 @@
+import time
+
+# How long a rejection is remembered, in seconds. None means permanently.
+REASON_TTLS = {
+    'unknown_category': None,
+    'out_of_date_range': None,
+    'outlier': None,
+    'duplicate': None,
+    'incomplete': 7 * 24 * 3600,
+    'too_large': 7 * 24 * 3600,
+    'parse_error': 24 * 3600,
+    'fetch_error': 3600,
+    'crashed': 24 * 3600,
+}
+DEFAULT_TTL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rejections (
+    url TEXT PRIMARY KEY,
+    reason TEXT NOT NULL,
+    rejected_at INTEGER NOT NULL,
+    expires_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_rejections_expires_at ON rejections (expires_at);
+"""
+
+class ArticleRejected(Exception):
+    """Raised by the article scrapers when an article is skipped."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+def is_rejected(conn, url, now=None):
+    """Check whether a URL has an unexpired rejection."""
+    now = int(now if now is not None else time.time())
+    row = conn.execute(
+        "SELECT 1 FROM rejections WHERE url = ? AND (expires_at IS NULL OR expires_at > ?)",
+        (url, now)).fetchone()
+    return row is not None
+
+def record_rejections(conn, rejections, now=None):
+    """Store a batch of (url, reason) pairs in a single transaction."""
+    now = int(now if now is not None else time.time())
+    rows = []
+    for url, reason in rejections:
+        ttl = REASON_TTLS.get(reason, DEFAULT_TTL)
+        rows.append((url, reason, now, None if ttl is None else now + ttl))
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO rejections VALUES (?, ?, ?, ?)", rows)
+
+def purge_expired(conn, now=None):
+    """Delete expired rejections. Returns the number removed."""
+    now = int(now if now is not None else time.time())
+    with conn:
+        return conn.execute("DELETE FROM rejections WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                            (now,)).rowcount
@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # Fall back to gzip when zstd isn't installed
+    zstandard = None
+
+ARCHIVE_DIR = "./.response_archive"
+ZSTD_LEVEL = 9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT NOT NULL,
+    source TEXT,
+    item TEXT,
+    fetched_at INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_url_fetched_at ON responses (url, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_responses_source ON responses (source);
+"""
+
+def _compress(body):
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), '.zst'
+    return gzip.compress(body, compresslevel=6), '.gz'
+
+def _decompress(data, extension):
+    if extension == '.zst':
+        if zstandard is None:
+            raise RuntimeError("This archive entry is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+class ResponseArchive:
+    """
+    Content-addressed store of fetched pages, indexed by URL and fetch time.
+
+    Bodies are compressed (zstd if available, else gzip) and stored once per
+    distinct content under objects/<digest[:2]>/<digest>, so refetching an
+    unchanged page costs only an index row. Safe to use from several threads.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _object_path(self, digest, extension):
+        return os.path.join(self.directory, 'objects', digest[:2], digest + extension)
+
+    def _find_object(self, digest):
+        for extension in ('.zst', '.gz'):
+            path = self._object_path(digest, extension)
+            if os.path.exists(path):
+                return path, extension
+        return None, None
+
+    def put(self, url, body, source=None, item=None, fetched_at=None):
+        """Archive one response body. item is the work item as JSON text, for replay. Returns the digest."""
+        digest = hashlib.sha256(body).hexdigest()
+        if self._find_object(digest)[0] is None:
+            data, extension = _compress(body)
+            path = self._object_path(digest, extension)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write under a unique name first, so concurrent puts of the same body can't clash
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO responses (url, source, item, fetched_at, digest, size) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, source, item, int(fetched_at or time.time()), digest, len(body)))
+        return digest
+
+    def get(self, digest):
+        """Return the body stored under a digest."""
+        path, extension = self._find_object(digest)
+        if path is None:
+            raise KeyError(digest)
+        with open(path, 'rb') as f:
+            return _decompress(f.read(), extension)
+
+    def latest(self, source=None, as_of=None):
+        """
+        Return (url, item, fetched_at, digest) for the newest response of each URL.
+
+        Only responses fetched at or before as_of (epoch seconds) count when it
+        is given, so extraction can be replayed as of an earlier run.
+        """
+        query = ("SELECT url, item, MAX(fetched_at), digest FROM responses "
+                 "WHERE (? IS NULL OR source = ?) AND (? IS NULL OR fetched_at <= ?) "
+                 "GROUP BY url ORDER BY MIN(rowid)")
+        with self._lock:
+            return self._conn.execute(query, (source, source, as_of, as_of)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,201 @@
+import json
+import logging
+
+import http_cache
+import logs
+import metrics
+from fetcher import HostLimiter
+from journal import JOURNAL_FILE, Journal, resume_streams
+from pipeline import MAX_IN_FLIGHT, PARSE_WORKERS, run_pipeline
+from response_archive import ARCHIVE_DIR, ResponseArchive
+
+# Fetch threads shared by every source in a run
+FETCH_WORKERS = 16
+
+logger = logging.getLogger(__name__)
+
+def interleave(streams):
+    """Yield from several iterables in turn until all are exhausted."""
+    iterators = [iter(stream) for stream in streams]
+    while iterators:
+        remaining = []
+        for iterator in iterators:
+            try:
+                yield next(iterator)
+            except StopIteration:
+                continue
+            remaining.append(iterator)
+        iterators = remaining
+
+def _tag(index, source, stream):
+    for item in stream:
+        yield index, source.parse, item
+
+def parse_task(task, payload):
+    """Parse stage: run a (source index, parse, item, ...) task's parse function on its item."""
+    parse, item = task[1], task[2]
+    return parse(item, payload)
+
+def run_sources(sources, fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS, max_in_flight=MAX_IN_FLIGHT,
+                archive=None, journal=None):
+    """
+    Scrape several sources concurrently through one shared pipeline.
+
+    Every source's categories are interleaved round-robin during discovery, so
+    no single outlet can monopolize the fetch workers, and each host is
+    throttled by the sources' rate limits. Total run time approaches that of
+    the slowest source rather than the sum of all of them.
+
+    When archive (a ResponseArchive) is given, every downloaded page is
+    stored in it so the run can be re-extracted later with replay.py.
+
+    When journal (a Journal) is given, every work item is journaled. Items
+    it resumed from an interrupted run are run and written out first.
+    """
+    http_cache.evict()
+    limiter = make_limiter(sources)
+
+    for source in sources:
+        source.start()
+
+    if journal is not None and journal.resumed:
+        run_streams(sources, resume_streams(sources, journal), limiter,
+                    fetch_workers, parse_workers, max_in_flight, archive, journal)
+        for source in sources:
+            source.flush()
+
+    streams = [(index, stream if journal is None else journal.record_discovery(source, stream))
+               for index, source in enumerate(sources)
+               for stream in source.discover()]
+    run_streams(sources, streams, limiter, fetch_workers, parse_workers, max_in_flight, archive, journal)
+
+    for source in sources:
+        source.finish()
+    log_summary()
+
+def make_limiter(sources):
+    """Return a HostLimiter honouring every source's rate limits."""
+    limits = {}
+    for source in sources:
+        limits.update(source.rate_limits)
+    return HostLimiter(limits=limits)
+
+def run_streams(sources, streams, limiter, fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS,
+                max_in_flight=MAX_IN_FLIGHT, archive=None, journal=None):
+    """
+    Run (source index, stream of work items) pairs through one pipeline.
+
+    The sources must already be started; their write() receives the results.
+    With a journal, the start of each fetch and each result are journaled.
+    """
+    def fetch(task):
+        index, _, item = task
+        source = sources[index]
+        if journal is not None:
+            journal.started(source.name, source.url_of(item))
+        payload = source.fetch(item)
+        if archive is not None:
+            archive.put(source.url_of(item), payload, source.name, json.dumps(item))
+        return payload
+
+    def write(task, result):
+        index, _, item = task
+        source = sources[index]
+        source.write(item, result)
+        if journal is not None:
+            journal.completed(source.name, source.url_of(item))
+
+    return run_pipeline(
+        interleave(_tag(index, sources[index], stream) for index, stream in streams),
+        fetch=fetch,
+        parse=parse_task,
+        write=write,
+        url_of=lambda task: sources[task[0]].url_of(task[2]),
+        fetch_workers=fetch_workers,
+        parse_workers=parse_workers,
+        max_in_flight=max_in_flight,
+        limiter=limiter,
+        source_of=lambda task: sources[task[0]].name,
+        category_of=lambda task: sources[task[0]].category_of(task[2]),
+    )
+
+def log_summary():
+    """Log the time spent in each stage and the article outcomes of the run."""
+    snapshot = metrics.snapshot()
+    for histogram in snapshot['histograms']:
+        if histogram['name'] == 'stage_seconds' and histogram['count']:
+            labels = histogram['labels']
+            logger.info(f"{labels.get('source')} {labels.get('stage')}: {histogram['count']} items, "
+                        f"{histogram['sum']:.2f}s total, {histogram['sum'] * 1000 / histogram['count']:.1f}ms each",
+                        extra={'summary': 'stage', **labels, 'count': histogram['count'], 'seconds': histogram['sum']})
+    for counter in snapshot['counters']:
+        if counter['name'] in ('articles_saved_total', 'articles_rejected_total'):
+            logger.info(f"{counter['name']} {counter['labels']}: {counter['value']}",
+                        extra={'summary': counter['name'], **counter['labels'], 'count': counter['value']})
+
+def available_sources():
+    """Return the registered sources by name."""
+    from cnn_scraper import CnnSource
+    from fox_scraper import FoxSource
+    return {'cnn': CnnSource, 'fox': FoxSource}
+
+def add_source_args(parser):
+    """Add the source selection, worker and logging options shared by the command-line entry points."""
+    parser.add_argument('sources', nargs='*',
+                        help=f"Sources to run: {', '.join(sorted(available_sources()))} (default: all)")
+    parser.add_argument('--fetch-workers', type=int, default=FETCH_WORKERS, help='Total fetch threads')
+    parser.add_argument('--parse-workers', type=int, default=PARSE_WORKERS, help='Parse processes (0 for none)')
+    parser.add_argument('--crawl-depth', type=int, default=0,
+                        help='Follow subsection and pagination links this many levels below each section page')
+    parser.add_argument('--probe-images', action='store_true',
+                        help='Look up the sizes of images without width/height with small range requests')
+    parser.add_argument('--log-json', action='store_true', help='Write logs as one JSON object per line')
+
+def sources_from_args(parser, args):
+    """Set up logging and return the sources named by add_source_args() options, configured from them."""
+    registry = available_sources()
+    unknown = sorted(set(args.sources) - set(registry))
+    if unknown:
+        parser.error(f"unknown sources: {', '.join(unknown)}")
+
+    logs.setup_logging('json' if args.log_json else None)
+    sources = [registry[name]() for name in args.sources or sorted(registry)]
+    for source in sources:
+        source.probe_images = args.probe_images
+        source.crawl_depth = args.crawl_depth
+    return sources
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Scrape several news sources concurrently.')
+    add_source_args(parser)
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help='Where to archive downloaded pages for replay.py')
+    parser.add_argument('--no-archive', action='store_true', help="Don't archive downloaded pages")
+    parser.add_argument('--journal-file', default=JOURNAL_FILE, help='Where to journal work items for --resume')
+    parser.add_argument('--resume', action='store_true',
+                        help='First rerun the articles an interrupted run discovered but never stored')
+    parser.add_argument('--metrics-file', help='Write Prometheus-format metrics to this file when done')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on this port during the run')
+
+    args = parser.parse_args()
+    sources = sources_from_args(parser, args)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    archive = None if args.no_archive else ResponseArchive(args.archive_dir)
+    journal = Journal(args.journal_file, resume=args.resume)
+    try:
+        run_sources(sources,
+                    fetch_workers=args.fetch_workers, parse_workers=args.parse_workers, archive=archive,
+                    journal=journal)
+        journal.close(finished=True)
+    finally:
+        journal.close()
+        if archive is not None:
+            archive.close()
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import logging
+
+import article_store
+import dedup
+import image_probe
+import rejection_cache
+from rejection_cache import ArticleRejected
+
+# Results written to the article store per transaction
+STORE_BATCH_SIZE = 50
+
+logger = logging.getLogger(__name__)
+
+class Source:
+    """
+    Interface a news outlet implements to run under the scheduler.
+
+    Work items are whatever the source needs to fetch and parse one article
+    (a URL for CNN, a (category, entry) pair for Fox). The scheduler calls
+    start(), then runs every discovery stream through one shared pipeline,
+    calls write() for each result and finally finish().
+
+    start() opens self.store (an article store connection) and self.writer
+    (a storage.ArticleWriter on the output file); write() and flush() then
+    save results through format(), record() and fingerprint().
+    """
+
+    # Name used for the source in the article store
+    name = None
+
+    # Article store the source checks for known URLs and saves results to
+    store_path = article_store.DB_PATH
+
+    # Per-host (concurrency, delay) overrides for the fetch stage
+    rate_limits = {}
+
+    # Look up the sizes of images without width/height attributes before
+    # writing (see image_probe.py)
+    probe_images = False
+
+    # Levels of subsection and pagination links discovery follows from each
+    # section page (see frontier.py); sources without section pages ignore it
+    crawl_depth = 0
+
+    def __init__(self):
+        self.store = None
+        self.writer = None
+        self.saved = []
+        self.rejections = []
+        self.fingerprints = []
+        self.unprobed = []
+        self.saved_count = 0
+
+    def start(self):
+        """Prepare the source before discovery, e.g. clean output and open the store."""
+
+    def feeds(self):
+        """Return (key, discover) pairs, one per feed or section page polled.
+
+        key names the feed (e.g. its URL) and discover() returns an iterable
+        of its new work items. The daemon polls each feed on its own schedule.
+        """
+        raise NotImplementedError
+
+    def discover(self):
+        """Return a list of iterables of work items, one per category or section.
+
+        The iterables are consumed lazily on the pipeline's discovery thread
+        and interleaved round-robin with those of other sources.
+        """
+        return [discover() for _, discover in self.feeds()]
+
+    def url_of(self, item):
+        """Return the URL a work item fetches."""
+        return item
+
+    def category_of(self, item):
+        """Return the category of a work item, used to label metrics."""
+        return None
+
+    def fetch(self, item):
+        """Download a work item. Raises ArticleRejected to skip it."""
+        raise NotImplementedError
+
+    # parse(item, payload) run in the parse processes. It must be picklable,
+    # so sources assign staticmethod(<module-level function>) here.
+    parse = None
+
+    def write(self, item, result):
+        """
+        Store a parsed result, or record the ArticleRejected it raised.
+
+        Near-duplicates are rejected, and with probe_images, results with
+        unsized images wait for flush() to probe them as a batch. Results
+        reach the article store STORE_BATCH_SIZE at a time.
+        """
+        if self.probe_images and not isinstance(result, ArticleRejected) and self.image_urls(item, result):
+            self.unprobed.append((item, result))
+        else:
+            self._save(item, result)
+        if len(self.saved) + len(self.rejections) + len(self.unprobed) >= STORE_BATCH_SIZE:
+            self.flush()
+
+    def _save(self, item, result):
+        url = self.url_of(item)
+        if not isinstance(result, ArticleRejected):
+            result = dedup.check_article(self.store, url, self.fingerprint(item, result), self.fingerprints) or result
+        if isinstance(result, ArticleRejected):
+            self.rejections.append((url, result.reason))
+            return
+        self.writer.append(self.format(item, result))
+        self.saved.append(self.record(item, result))
+        self.saved_count += 1
+        logger.info(f"Added {self.name} article: {url}", extra={'url': url})
+
+    def format(self, item, result):
+        """Return the output file block for a parsed result."""
+        raise NotImplementedError
+
+    def record(self, item, result):
+        """Return the article store record (a dict in the .txt layout) for a parsed result."""
+        raise NotImplementedError
+
+    def fingerprint(self, item, result):
+        """Return the simhash of a parsed article's body, or None, for near-duplicate checks."""
+        return None
+
+    def image_urls(self, item, result):
+        """Return the URLs of a parsed article's images whose size isn't in the markup."""
+        return []
+
+    def with_image_sizes(self, item, result, sizes):
+        """Return the result with probed {url: (width, height)} sizes filled in, or an ArticleRejected."""
+        return result
+
+    def in_scope(self, item):
+        """Re-apply discovery's filters to an archived work item when replaying."""
+        return True
+
+    def mark_queued(self, item):
+        """Remember a work item queued outside discovery (e.g. resumed), so discovery skips it."""
+
+    def restore_item(self, value):
+        """Rebuild a work item from the JSON form it was archived in."""
+        return value
+
+    def flush(self):
+        """Write out buffered results, e.g. between daemon polls."""
+        for item, result in image_probe.resolve(self.store, self, self.unprobed):
+            self._save(item, result)
+        self.unprobed.clear()
+        # Write the output file before the store so a crash can't leave
+        # stored URLs that are missing from the file
+        self.writer.flush()
+        dedup.add_fingerprints(self.store, self.fingerprints)
+        article_store.add_articles(self.store, self.name, self.saved)
+        rejection_cache.record_rejections(self.store, self.rejections)
+        self.saved.clear()
+        self.rejections.clear()
+        self.fingerprints.clear()
+
+    def finish(self):
+        """Flush buffered results and report once all work items are written."""
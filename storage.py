@@ -0,0 +1,261 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Buffered article blocks are written out once this many are pending
+WRITE_BATCH_SIZE = 20
+
+# Bytes copied at a time when rewriting part of a file unchanged
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# The "Total Articles:" header line, holding the number of article blocks
+HEADER_PREFIX = "Total Articles: "
+
+def manifest_path(filename):
+    return filename + '.manifest.json'
+
+def _scan(filename):
+    """Count articles by reading the whole file. Only used to rebuild a manifest."""
+    total = 0
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith("Category:"):
+                total += 1
+    return total
+
+def read_manifest(filename):
+    """
+    Return the manifest for an output file.
+
+    The manifest records the article count and the file size it describes. If
+    it is missing or the file was changed behind its back, it is rebuilt with
+    a single scan of the file. An append that was interrupted partway is
+    rolled back first (see ArticleWriter.flush).
+    """
+    if not os.path.exists(filename):
+        return {'total_articles': 0, 'size': 0}
+
+    try:
+        with open(manifest_path(filename), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if 'append' in manifest:
+            manifest = _finish_append(filename, manifest)
+        if manifest.get('size') == os.path.getsize(filename):
+            return manifest
+    except (FileNotFoundError, ValueError):
+        pass
+
+    # Anything else the manifest recorded about the old contents (such as how
+    # far they were cleaned) no longer applies
+    manifest = {'total_articles': _scan(filename), 'size': os.path.getsize(filename)}
+    write_manifest(filename, manifest)
+    return manifest
+
+def _finish_append(filename, manifest):
+    """Settle an append a crashed writer left in the manifest: keep it if it completed, else cut it off."""
+    append = manifest.pop('append')
+    size = os.path.getsize(filename)
+    if size == append['to']:
+        manifest['total_articles'] += append['articles']
+        manifest['size'] = size
+    elif append['from'] <= size < append['to']:
+        with open(filename, 'r+b') as f:
+            f.truncate(append['from'])
+            os.fsync(f.fileno())
+        manifest['size'] = append['from']
+    write_manifest(filename, manifest)
+    return manifest
+
+def write_manifest(filename, manifest):
+    """Atomically and durably replace the manifest for an output file."""
+    path = manifest_path(filename)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def committed_size(filename):
+    """
+    Return how many bytes of an output file readers can trust.
+
+    That is the whole file, except for an append a writer has yet to finish
+    (or never finished), which may still be a partial block.
+    """
+    try:
+        with open(manifest_path(filename), 'r', encoding='utf-8') as f:
+            append = json.load(f).get('append')
+        if append:
+            return append['from']
+    except (FileNotFoundError, ValueError):
+        pass
+    return os.path.getsize(filename)
+
+def total_articles(filename):
+    """Return the article count for an output file without reading it."""
+    return read_manifest(filename)['total_articles']
+
+def format_header(count):
+    """Return the header for an output file holding count articles, with its trailing blank line."""
+    return f"{HEADER_PREFIX}{count}\n\n"
+
+def update_header(filename, count):
+    """
+    Set the count in an output file's header.
+
+    A count with as many digits as the old one is overwritten in place;
+    otherwise (once per power of ten) the file is rewritten atomically
+    behind the new header, so callers must re-read its size afterwards.
+    Returns False, leaving the file alone, if it has no header.
+    """
+    line = f"{HEADER_PREFIX}{count}\n".encode('utf-8')
+    try:
+        with open(filename, 'r+b') as f:
+            old_line = f.readline()
+            if not old_line.startswith(HEADER_PREFIX.encode('utf-8')) or not old_line.endswith(b'\n'):
+                return False
+            if old_line == line:
+                return True
+            if len(old_line) == len(line):
+                f.seek(0)
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                return True
+            with atomic_rewrite(filename, 'wb') as dst:
+                dst.write(line)
+                while chunk := f.read(COPY_CHUNK_SIZE):
+                    dst.write(chunk)
+    except FileNotFoundError:
+        return False
+    return True
+
+def _file_mode(filename):
+    try:
+        return os.stat(filename).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+@contextmanager
+def atomic_rewrite(filename, mode='w'):
+    """
+    Yield a file to write the full new contents of filename to ('wb' for bytes).
+
+    The data goes to a temporary file in the same directory, which replaces
+    the original only if the block finishes without raising, so readers never
+    see a half-written file.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filename), suffix='.tmp')
+    try:
+        # mkstemp creates the file owner-only; keep the permissions of the
+        # file being replaced, or the usual ones for a new file
+        os.chmod(tmp_path, _file_mode(filename))
+        encoding = None if 'b' in mode else 'utf-8'
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _missing_separator(filename):
+    """Return the newlines needed so the next block starts after a blank line."""
+    if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+        return ''
+    with open(filename, 'rb') as f:
+        f.seek(-min(2, os.path.getsize(filename)), os.SEEK_END)
+        tail = f.read()
+    if tail.endswith(b'\n\n'):
+        return ''
+    return '\n' if tail.endswith(b'\n') else '\n\n'
+
+def iter_blocks(f, end=None):
+    """
+    Yield (offset, block) for each blank-line separated block in a binary file.
+
+    Reads line by line from the file's current position up to end (or the
+    end of the file), so memory use is bounded by the largest block rather
+    than the file. offset is the byte position the block starts at and block
+    is its decoded text without the trailing newline.
+    """
+    offset = f.tell()
+    start = None
+    lines = []
+    for line in f:
+        if end is not None and offset >= end:
+            break
+        if line.strip():
+            if start is None:
+                start = offset
+            lines.append(line)
+        elif lines:
+            yield start, b''.join(lines).decode('utf-8').rstrip('\n')
+            start = None
+            lines = []
+        offset += len(line)
+    if lines:
+        yield start, b''.join(lines).decode('utf-8').rstrip('\n')
+
+class ArticleWriter:
+    """
+    Append article blocks to an output file in batches.
+
+    Each flush appends the pending blocks with a single write and bumps the
+    count in the manifest and the file's header, so adding N articles costs
+    O(N) no matter how large the file already is.
+    """
+
+    def __init__(self, filename, batch_size=WRITE_BATCH_SIZE):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.pending = []
+
+    def append(self, block):
+        """Queue one article block (its lines, without the trailing blank line)."""
+        self.pending.append(block)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Append the pending blocks.
+
+        The manifest records the append before it starts, so if the process
+        dies partway, readers stop short of the partial block and the next
+        read_manifest() cuts it off.
+        """
+        if not self.pending:
+            return
+        manifest = read_manifest(self.filename)
+        data = (_missing_separator(self.filename) + ''.join(block + '\n\n' for block in self.pending)).encode('utf-8')
+        size = manifest['size']
+        write_manifest(self.filename, {**manifest, 'append': {'from': size, 'to': size + len(data),
+                                                               'articles': len(self.pending)}})
+        with open(self.filename, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        manifest['total_articles'] += len(self.pending)
+        # A header that gains a digit moves the rest of the file (and, if we
+        # crash before the manifest is written, read_manifest() rescans it)
+        update_header(self.filename, manifest['total_articles'])
+        manifest['size'] = os.path.getsize(self.filename)
+        write_manifest(self.filename, manifest)
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
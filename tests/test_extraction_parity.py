@@ -0,0 +1,91 @@
+"""
+Word and image counts from the partial-parse extraction match the original
+whole-page Beautiful Soup extraction, with both parser backends.
+"""
+import os
+from datetime import datetime
+
+import pytest
+from bs4 import BeautifulSoup
+
+import html_parser
+from cnn_scraper import extract_cnn_article
+from fox_scraper import parse_article_details
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+def baseline_cnn(markup):
+    """The original scrape_cnn_article extraction, without the fetch and filters."""
+    soup = BeautifulSoup(markup, 'html.parser')
+    title = soup.find('h1').text.strip()
+    date_str = soup.find('meta', property='article:published_time').get('content')
+    date = datetime.fromisoformat(date_str.replace('Z', '+00:00')).strftime('%a, %d %b %Y %H:%M:%S %z')
+
+    paragraphs = soup.find_all(['p', 'div'], class_=lambda x: x and 'paragraph' in x.lower())
+    total_words = sum(len(p.text.split()) for p in paragraphs if p.text)
+
+    images = []
+    for img in soup.find_all('img', class_=lambda x: x and ('image' in x.lower() or 'photo' in x.lower())):
+        if not img.find_parent(class_=lambda x: x and ('related' in x.lower() or 'playlist' in x.lower())) \
+           and not img.find_parent(class_="byline__images") \
+           and not img.find_parent(class_="series-banner__logo-heading") \
+           and not img.find_parent(class_="container_list-headlines-with-images__cards-wrapper") \
+           and not img.find_parent(class_="container__item-media  container_list-headlines-with-images__item-media"):
+            width = img.get('width', '')
+            height = img.get('height', '')
+            if width and height:
+                images.append(f"{width}x{height}")
+    return title, date, f"{total_words} words", f"{len(images)} (Sizes: {', '.join(images)})"
+
+def baseline_fox(markup):
+    """The original get_article_details extraction, without the fetch."""
+    soup = BeautifulSoup(markup, 'html.parser')
+    word_count = 0
+    article_content = soup.find('div', {'class': 'article-body'})
+    if not article_content or not article_content.find_all('p', recursive=False):
+        article_content = soup.find('div', {'class': 'paywall'})
+    if article_content:
+        for paragraph in article_content.find_all('p', recursive=False):
+            word_count += len(paragraph.get_text().split())
+
+    image_count = 0
+    image_sizes = []
+    if article_content:
+        for img in article_content.find_all('img'):
+            width = img.get('width')
+            height = img.get('height')
+            if width and height:
+                try:
+                    if int(width) == 896 and int(height) == 500:
+                        continue
+                except ValueError:
+                    pass
+            image_count += 1
+            image_sizes.append(f"{width}x{height}" if width and height else "Unknown Size")
+    return word_count, image_count, image_sizes
+
+@pytest.fixture(params=['html.parser', 'lxml'])
+def parser(request, monkeypatch):
+    if request.param == 'lxml':
+        pytest.importorskip('lxml')
+    monkeypatch.setattr(html_parser, 'PARSER', request.param)
+    return request.param
+
+def test_cnn_counts_match_baseline(parser):
+    markup = _fixture('cnn_article.html')
+    result = extract_cnn_article('https://www.cnn.com/2025/01/08/politics/senate-vote/index.html', markup)
+    assert (result['Title'], result['Date'], result['Word Count'], result['Images']) == baseline_cnn(markup)
+    # The double-spaced container__item-media selector never matched, so the
+    # image under it counts; the ones in excluded containers don't
+    assert result['Images'] == "3 (Sizes: 1600x900, 1200x675, 640x360)"
+    assert result['Unsized Images'] == ['https://www.cnn.com/unsized.jpg']
+
+@pytest.mark.parametrize('name', ['fox_article.html', 'fox_paywall.html'])
+def test_fox_counts_match_baseline(parser, name):
+    markup = _fixture(name)
+    word_count, image_count, image_sizes, _, _ = parse_article_details(markup, 'https://www.foxnews.com/a')
+    assert (word_count, image_count, image_sizes) == baseline_fox(markup)
@@ -0,0 +1,87 @@
+"""fetch_all and HostLimiter against a local stub server with latency."""
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from fetcher import HostLimiter, fetch_all
+
+LATENCY = 0.1
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        host = self.headers['Host']
+        with server.lock:
+            server.active[host] += 1
+            server.peak[host] = max(server.peak[host], server.active[host])
+            server.starts[host].append(time.monotonic())
+        time.sleep(server.latency)
+        with server.lock:
+            server.active[host] -= 1
+        body = self.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+@pytest.fixture
+def stub():
+    server = _Server(('127.0.0.1', 0), _Handler)
+    server.latency = LATENCY
+    server.lock = threading.Lock()
+    server.active = defaultdict(int)
+    server.peak = defaultdict(int)
+    server.starts = defaultdict(list)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _get(url):
+    return requests.get(url, timeout=10).text
+
+def _urls(server, count, host='127.0.0.1'):
+    return [f"http://{host}:{server.server_port}/{i}" for i in range(count)]
+
+def test_results_come_back_in_input_order(stub):
+    urls = _urls(stub, 12)
+    results = list(fetch_all(urls, _get, max_workers=8, per_host=8, delay=0))
+    assert [url for url, _ in results] == urls
+    assert [body for _, body in results] == [f"/{i}" for i in range(12)]
+
+def test_concurrency_is_capped_per_host(stub):
+    # 127.0.0.1 and localhost are separate hosts to the limiter
+    urls = _urls(stub, 8) + _urls(stub, 8, host='localhost')
+    list(fetch_all(urls, _get, max_workers=8, per_host=2, delay=0))
+    assert set(stub.peak.values()) == {2}
+
+def test_request_starts_are_spaced_per_host(stub):
+    limiter = HostLimiter(per_host=4, delay=0.05)
+    urls = _urls(stub, 4)
+    threads = [threading.Thread(target=limiter.run, args=(url, _get, url)) for url in urls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    starts = sorted(stub.starts[f"127.0.0.1:{stub.server_port}"])
+    assert all(b - a >= 0.04 for a, b in zip(starts, starts[1:]))
+
+def test_concurrent_fetch_is_faster_than_sequential(stub):
+    urls = _urls(stub, 16)
+    started = time.perf_counter()
+    list(fetch_all(urls, _get, max_workers=8, per_host=8, delay=0))
+    elapsed = time.perf_counter() - started
+    # One at a time this takes 16 * LATENCY; with 8 workers, about 2 * LATENCY
+    assert elapsed < len(urls) * LATENCY / 4
@@ -0,0 +1,65 @@
+"""The cleaner's per-block and batch checks agree, with and without NumPy."""
+import pytest
+
+import cleaner
+import records
+from records import ArticleRecord, RecordBatch
+
+def _block(title='Ordinary article', date='Wed, 08 Jan 2025 20:23:05 -0500', words='1200 words',
+           images='2 (Sizes: 1200x675, 1600x900)', url='https://www.example.com/a'):
+    lines = ["Category: politics", f"Title: {title}", f"URL: {url}"]
+    if date is not None:
+        lines.append(f"Date: {date}")
+    if words is not None:
+        lines.append(f"Word Count: {words}")
+    if images is not None:
+        lines.append(f"Images: {images}")
+    return '\n'.join(lines)
+
+BLOCKS = [
+    _block(),
+    _block(words='3000 words', images='10 (Sizes: 1x1)'),
+    _block(words='3001 words'),
+    _block(images='11 (Sizes: 1x1)'),
+    _block(date='Tue, 17 Dec 2020 10:00:42 +0000'),
+    _block(date='2025-01-05T10:00:00Z'),
+    _block(date='2025-01-05T10:00:00'),
+    _block(date='not a date'),
+    _block(date=None),
+    _block(words=None),
+    _block(images=None),
+    _block(images='3 (Sizes: Unknown Size, 1200x675, Unknown Size)'),
+    # Field names inside other fields' values must not be read as those fields
+    _block(title='Images: 50 photos of the storm'),
+    _block(title='Word Count: 9000 and rising', words='300 words'),
+    _block(title='Date: Tue, 17 Dec 2020 10:00:42 +0000 was a long day'),
+    _block(title='Gallery', words='300 words', images='12 (Sizes: 1x1)', url='https://www.example.com/Images: 1'),
+]
+
+@pytest.fixture(params=['array', 'numpy'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        monkeypatch.setattr(records, 'np', pytest.importorskip('numpy'))
+    else:
+        monkeypatch.setattr(records, 'np', None)
+    return request.param
+
+def test_record_and_batch_parse_blocks_alike(backend):
+    batch = RecordBatch.from_blocks(BLOCKS)
+    for i, block in enumerate(BLOCKS):
+        single, batched = ArticleRecord.from_block(block), batch[i]
+        for field in ArticleRecord.__slots__:
+            assert getattr(single, field) == getattr(batched, field), (block, field)
+
+def test_batch_and_per_block_checks_agree(backend):
+    expected = [cleaner.check_block(block) for block in BLOCKS]
+    assert [bool(keep) for keep in RecordBatch.from_blocks(BLOCKS).keep_mask()] == [keep for keep, _ in expected]
+    assert [(bool(keep), url) for keep, url in cleaner.check_blocks(BLOCKS)] == expected
+
+def test_fields_come_from_their_own_lines():
+    assert cleaner.check_block(BLOCKS[12]) == (True, None)
+    assert cleaner.check_block(BLOCKS[13]) == (True, None)
+    assert cleaner.check_block(BLOCKS[14]) == (True, None)
+    assert cleaner.check_block(BLOCKS[15]) == (False, 'https://www.example.com/Images: 1')
+    record = ArticleRecord.from_block(BLOCKS[12])
+    assert (record.title, record.word_count, record.image_count) == ('Images: 50 photos of the storm', 1200, 2)
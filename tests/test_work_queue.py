@@ -0,0 +1,53 @@
+"""SqliteWorkQueue and run_worker with workers that run different sources."""
+import json
+
+from rejection_cache import ArticleRejected
+from sources import Source
+from work_queue import SqliteWorkQueue, run_worker
+
+class _StubSource(Source):
+    """Source whose fetches reject every article without any network I/O."""
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        self.fetched = []
+
+    def fetch(self, url):
+        self.fetched.append(url)
+        raise ArticleRejected('stub')
+
+def _enqueue(queue, name, count):
+    return queue.enqueue([(f"http://{name}.test/{i}", name, json.dumps(f"http://{name}.test/{i}"))
+                          for i in range(count)])
+
+def test_claim_only_returns_the_named_sources(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / 'store.db'))
+    _enqueue(queue, 'a', 3)
+    _enqueue(queue, 'b', 3)
+    try:
+        jobs = queue.claim('worker-a', ['a'], limit=10)
+        assert sorted(source for _, source, _ in jobs) == ['a'] * 3
+        assert queue.claim('worker-a', ['a'], limit=10) == []
+        assert queue.counts() == {'leased': 3, 'pending': 3}
+    finally:
+        queue.close()
+
+def test_worker_leaves_other_sources_jobs_pending(tmp_path):
+    path = str(tmp_path / 'store.db')
+    queue = SqliteWorkQueue(path)
+    _enqueue(queue, 'a', 5)
+    _enqueue(queue, 'b', 4)
+    a, b = _StubSource('a'), _StubSource('b')
+    try:
+        processed = run_worker(queue, [a], 'worker-a', path, batch_size=3, parse_workers=0, exit_when_empty=True)
+        assert processed == 5
+        assert len(a.fetched) == 5
+        assert queue.counts() == {'done': 5, 'pending': 4}
+
+        processed = run_worker(queue, [b], 'worker-b', path, batch_size=3, parse_workers=0, exit_when_empty=True)
+        assert processed == 4
+        assert sorted(b.fetched) == [f"http://b.test/{i}" for i in range(4)]
+        assert queue.counts() == {'done': 9}
+    finally:
+        queue.close()
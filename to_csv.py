@@ -1,125 +1,212 @@
 import csv
+import itertools
+import json
 import re
 import os
-from datetime import datetime
+
+from records import ArticleRecord, parse_fields
+from storage import committed_size, iter_blocks
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = None
+
+# Columns written for every article, whatever fields its block contains
+FIELDNAMES = ['Category', 'Title', 'URL', 'Date', 'Word Count', 'Images', 'Image Sizes']
+
+SIZES_PATTERN = re.compile(r'Sizes:\s+([^)]+)')
+
+# Rows buffered per Parquet row group
+PARQUET_BATCH_SIZE = 10000
+
+def parse_block(block):
+    """
+    Parse one article block into a dictionary.
+
+    Args:
+        block (str): The lines of one article, starting with "Category:"
+
+    Returns:
+        dict: The fields found in the block
+    """
+    fields = parse_fields(block)
+    record = ArticleRecord.from_fields(fields)
+    values = {'Category': record.category, 'Title': record.title, 'URL': record.url, 'Date': record.date,
+              'Word Count': record.word_count, 'Images': record.image_count}
+    article = {field: value for field, value in values.items() if field in fields}
+    if 'Images' in fields:
+        # Kept as written, since Fox records unknown sizes as "Unknown Size"
+        sizes_match = SIZES_PATTERN.search(fields['Images'])
+        article['Image Sizes'] = sizes_match.group(1).strip() if sizes_match else None
+    return article
+
+def iter_articles(file_path):
+    """
+    Yield the articles in a text file one at a time.
+
+    The file is read block by block, so memory use stays constant no matter
+    how large it is. Blocks that don't start with "Category:" (such as the
+    "Total Articles:" header) are skipped, and so is an append a scraper is
+    still in the middle of.
+
+    Args:
+        file_path (str): Path to the text file
+
+    Yields:
+        dict: The parsed data of each article
+    """
+    end = committed_size(file_path)
+    with open(file_path, 'rb') as file:
+        for _, block in iter_blocks(file, end):
+            if block.strip().startswith("Category:"):
+                yield parse_block(block)
 
 def parse_text_file(file_path):
     """
     Parse a text file containing article data and extract the structured information.
-    
+
     Args:
         file_path (str): Path to the text file
-        
+
     Returns:
         list: List of dictionaries containing the parsed data
     """
-    articles = []
-    current_article = {}
-    
-    # Read the entire file content
-    with open(file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    # Split the content by double newlines to separate articles
-    article_blocks = re.split(r'\n\n+', content)
-    
-    for block in article_blocks:
-        if not block.strip():
+    return list(iter_articles(file_path))
+
+def merge_articles(file_paths, unique=False):
+    """
+    Yield the articles of several text files in order.
+
+    With unique, an article whose URL was already seen is skipped; only the
+    URLs are kept in memory for that.
+    """
+    articles = itertools.chain.from_iterable(iter_articles(path) for path in file_paths)
+    if not unique:
+        yield from articles
+        return
+
+    seen = set()
+    for article in articles:
+        url = article.get('URL')
+        if url in seen:
             continue
-            
-        # If the block starts with "Category:", it's a new article
-        if block.strip().startswith("Category:"):
-            if current_article:
-                articles.append(current_article)
-            current_article = {}
-            
-            # Process the current block
-            lines = block.strip().split('\n')
-            for line in lines:
-                if line.startswith("Category:"):
-                    current_article['Category'] = line.replace("Category:", "").strip()
-                elif line.startswith("Title:"):
-                    current_article['Title'] = line.replace("Title:", "").strip()
-                elif line.startswith("URL:"):
-                    current_article['URL'] = line.replace("URL:", "").strip()
-                elif line.startswith("Date:"):
-                    date_str = line.replace("Date:", "").strip()
-                    current_article['Date'] = date_str
-                elif line.startswith("Word Count:"):
-                    word_count_match = re.search(r'(\d+)', line)
-                    if word_count_match:
-                        current_article['Word Count'] = int(word_count_match.group(1))
-                    else:
-                        current_article['Word Count'] = None
-                elif line.startswith("Images:"):
-                    images_match = re.search(r'(\d+)', line)
-                    if images_match:
-                        current_article['Images'] = int(images_match.group(1))
-                    else:
-                        current_article['Images'] = None
-                    
-                    # Extract image sizes if available
-                    sizes_match = re.search(r'Sizes:\s+([^)]+)', line)
-                    if sizes_match:
-                        current_article['Image Sizes'] = sizes_match.group(1).strip()
-                    else:
-                        current_article['Image Sizes'] = None
-    
-    # Add the last article if it exists
-    if current_article:
-        articles.append(current_article)
-        
-    return articles
+        seen.add(url)
+        yield article
+
+def write_csv(articles, output_file):
+    """Write articles to a CSV file as they arrive. Returns the number written."""
+    count = 0
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for article in articles:
+            writer.writerow(article)
+            count += 1
+    return count
+
+def write_jsonl(articles, output_file):
+    """Write articles to a JSON Lines file, one object per line. Returns the number written."""
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as jsonfile:
+        for article in articles:
+            row = {field: article.get(field) for field in FIELDNAMES}
+            jsonfile.write(json.dumps(row, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+def _parquet_schema():
+    return pa.schema([
+        ('Category', pa.string()),
+        ('Title', pa.string()),
+        ('URL', pa.string()),
+        ('Date', pa.string()),
+        ('Word Count', pa.int64()),
+        ('Images', pa.int64()),
+        ('Image Sizes', pa.string()),
+    ])
+
+def write_parquet(articles, output_file, batch_size=PARQUET_BATCH_SIZE):
+    """
+    Write articles to a zstd-compressed Parquet file. Returns the number written.
+
+    Rows are buffered batch_size at a time and written as one row group each,
+    so memory use is bounded by the batch rather than the input.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+
+    schema = _parquet_schema()
+    articles = iter(articles)
+    count = 0
+    with pq.ParquetWriter(output_file, schema, compression='zstd') as writer:
+        for batch in iter(lambda: list(itertools.islice(articles, batch_size)), []):
+            columns = {field: [article.get(field) for article in batch] for field in FIELDNAMES}
+            writer.write_table(pa.table(columns, schema=schema))
+            count += len(batch)
+    return count
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+}
 
 def save_to_csv(articles, output_file):
     """
     Save the parsed article data to a CSV file.
-    
+
     Args:
-        articles (list): List of dictionaries containing the article data
+        articles (iterable): Dictionaries containing the article data
         output_file (str): Path to the output CSV file
     """
-    if not articles:
+    count = write_csv(articles, output_file)
+    if not count:
         print("No articles found to save.")
         return
-        
-    # Determine the fieldnames from the first article
-    fieldnames = list(articles[0].keys())
-    
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(articles)
-    
-    print(f"Successfully saved {len(articles)} articles to {output_file}")
+
+    print(f"Successfully saved {count} articles to {output_file}")
 
 def main():
     """
     Main function to run the script.
     """
     import argparse
-    
-    parser = argparse.ArgumentParser(description='Convert text file with article data to CSV.')
-    parser.add_argument('input_file', help='Path to the input text file')
-    parser.add_argument('--output', '-o', default=None, help='Path to the output CSV file')
-    
+
+    parser = argparse.ArgumentParser(description='Convert text files with article data to CSV, JSON Lines or Parquet.')
+    parser.add_argument('input_files', nargs='+', help='Paths to the input text files, merged in order')
+    parser.add_argument('--output', '-o', default=None, help='Path to the output file')
+    parser.add_argument('--format', '-f', choices=sorted(WRITERS), default=None,
+                        help='Output format (default: from the output extension, else csv)')
+    parser.add_argument('--unique', action='store_true', help='Skip articles whose URL was already written')
+
     args = parser.parse_args()
-    
-    if not os.path.exists(args.input_file):
-        print(f"Error: Input file '{args.input_file}' does not exist.")
+
+    missing = [path for path in args.input_files if not os.path.exists(path)]
+    if missing:
+        print(f"Error: Input file '{missing[0]}' does not exist.")
+        return
+
+    output_format = args.format
+    if output_format is None and args.output:
+        extension = os.path.splitext(args.output)[1].lstrip('.').lower()
+        output_format = extension if extension in WRITERS else None
+    output_format = output_format or 'csv'
+    if output_format == 'parquet' and pa is None:
+        print("Error: Parquet output requires pyarrow (pip install pyarrow).")
         return
-    
-    # If output file is not specified, use the input filename with .csv extension
-    output_file = args.output if args.output else os.path.splitext(args.input_file)[0] + '.csv'
-    
-    # Parse the text file
-    articles = parse_text_file(args.input_file)
-    
-    if articles:
-        # Save to CSV
-        save_to_csv(articles, output_file)
+
+    # If output file is not specified, use the first input filename with the format's extension
+    output_file = args.output if args.output else os.path.splitext(args.input_files[0])[0] + '.' + output_format
+
+    articles = merge_articles(args.input_files, unique=args.unique)
+    count = WRITERS[output_format](articles, output_file)
+
+    if count:
+        print(f"Successfully saved {count} articles to {output_file}")
     else:
-        print("No articles found in the input file.")
+        print("No articles found in the input files.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,360 @@
+"""
+Share scraping between several worker processes or machines through a work queue.
+
+    python work_queue.py enqueue cnn fox      # discover new articles and queue them
+    python work_queue.py work --worker-id a   # claim, fetch, parse and store until stopped
+    python work_queue.py status
+    python work_queue.py export               # rewrite the .txt files from the store
+
+Workers claim URLs under expiring leases, renew them while they work and
+acknowledge them once the results are in the article store. A worker that
+crashes simply lets its leases run out and another one picks the URLs up.
+Results go straight to the shared article store rather than a per-worker
+.txt file; export rebuilds the output files from it.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import article_store
+import dedup
+import image_probe
+import rejection_cache
+from pipeline import MAX_IN_FLIGHT, PARSE_WORKERS, run_pipeline
+from rejection_cache import ArticleRejected
+from scheduler import (FETCH_WORKERS, add_source_args, interleave, log_summary, make_limiter, parse_task,
+                       sources_from_args)
+
+# Seconds a claimed URL stays reserved for its worker without a heartbeat
+LEASE_SECONDS = 300
+# URLs claimed, processed and acknowledged together
+CLAIM_BATCH_SIZE = 50
+# Claims a URL gets before it's given up on, in case it crashes workers
+MAX_ATTEMPTS = 3
+# Seconds an idle worker waits before checking the queue again
+IDLE_WAIT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_queue (
+    url TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    item TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_work_queue_state ON work_queue (state, lease_expires);
+"""
+
+logger = logging.getLogger(__name__)
+
+class WorkQueue:
+    """
+    Interface of a queue backend shared by the workers.
+
+    Jobs are (url, source, item) with item the work item as JSON text. A job
+    is pending, leased to one worker until its lease expires, done or failed.
+    Implement this over a shared database to run workers on several hosts.
+    """
+
+    def enqueue(self, jobs):
+        """Queue (url, source, item) jobs, ignoring URLs already queued. Returns the number added."""
+        raise NotImplementedError
+
+    def claim(self, worker, sources, limit=CLAIM_BATCH_SIZE, lease=LEASE_SECONDS):
+        """
+        Lease up to limit pending or expired jobs of the named sources to worker.
+
+        Returns them as (url, source, item). Jobs of other sources are left
+        for the workers that run them.
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, worker, urls, lease=LEASE_SECONDS):
+        """Extend the worker's leases on urls. Returns the number it still holds."""
+        raise NotImplementedError
+
+    def ack(self, worker, urls):
+        """Mark the worker's leased urls done. Returns the number acknowledged."""
+        raise NotImplementedError
+
+    def release(self, worker, urls):
+        """Hand the worker's leased urls back to the queue unprocessed."""
+        raise NotImplementedError
+
+    def counts(self):
+        """Return the number of jobs in each state."""
+        raise NotImplementedError
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    Work queue kept in the article store's database, for workers on one host.
+
+    Because the queue sits next to the articles and rejections, a claim
+    marks jobs done instead of leasing them when a crashed worker had
+    already stored their results, so recovering never refetches them.
+    """
+
+    def __init__(self, path=article_store.DB_PATH):
+        self._lock = threading.Lock()
+        # Autocommit mode, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(article_store.SCHEMA + rejection_cache.SCHEMA + SCHEMA)
+
+    def _transaction(self, statements):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, jobs):
+        now = int(time.time())
+        rows = [(url, source, item, now) for url, source, item in jobs]
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO work_queue (url, source, item, enqueued_at) "
+                             "VALUES (?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+        return self._transaction(insert)
+
+    def claim(self, worker, sources, limit=CLAIM_BATCH_SIZE, lease=LEASE_SECONDS):
+        now = time.time()
+        sources = list(sources)
+        placeholders = ', '.join('?' * len(sources))
+        available = (f"source IN ({placeholders}) "
+                     f"AND (state = 'pending' OR (state = 'leased' AND lease_expires <= ?))")
+
+        def claim_jobs(conn):
+            # Finish jobs whose results a crashed worker stored before acknowledging them
+            conn.execute(
+                f"UPDATE work_queue SET state = 'done', worker = NULL, lease_expires = NULL "
+                f"WHERE {available} AND (url IN (SELECT url FROM articles) OR url IN "
+                f"(SELECT url FROM rejections WHERE expires_at IS NULL OR expires_at > ?))",
+                (*sources, now, int(now)))
+            conn.execute(
+                f"UPDATE work_queue SET state = 'failed', worker = NULL, lease_expires = NULL "
+                f"WHERE source IN ({placeholders}) AND state = 'leased' AND lease_expires <= ? AND attempts >= ?",
+                (*sources, now, MAX_ATTEMPTS))
+            jobs = conn.execute(
+                f"SELECT url, source, item FROM work_queue WHERE {available} "
+                f"ORDER BY enqueued_at, rowid LIMIT ?", (*sources, now, limit)).fetchall()
+            conn.executemany(
+                "UPDATE work_queue SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE url = ?", [(worker, now + lease, url) for url, _, _ in jobs])
+            return jobs
+        return self._transaction(claim_jobs)
+
+    def _update_held(self, worker, urls, assignments, params=()):
+        def update(conn):
+            before = conn.total_changes
+            conn.executemany(f"UPDATE work_queue SET {assignments} WHERE url = ? AND worker = ? AND state = 'leased'",
+                             [(*params, url, worker) for url in urls])
+            return conn.total_changes - before
+        return self._transaction(update)
+
+    def heartbeat(self, worker, urls, lease=LEASE_SECONDS):
+        return self._update_held(worker, urls, "lease_expires = ?", (time.time() + lease,))
+
+    def ack(self, worker, urls):
+        return self._update_held(worker, urls, "state = 'done', lease_expires = NULL")
+
+    def release(self, worker, urls):
+        return self._update_held(worker, urls, "state = 'pending', worker = NULL, lease_expires = NULL, "
+                                               "attempts = attempts - 1")
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM work_queue GROUP BY state"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def enqueue_sources(sources, queue):
+    """Run the sources' discovery and queue every new work item. Returns the number queued."""
+    added = 0
+    batch = []
+    for index, item in interleave([(index, item) for item in stream]
+                                  for index, source in enumerate(sources) for stream in source.discover()):
+        source = sources[index]
+        batch.append((source.url_of(item), source.name, json.dumps(item)))
+        if len(batch) >= CLAIM_BATCH_SIZE:
+            added += queue.enqueue(batch)
+            batch = []
+    if batch:
+        added += queue.enqueue(batch)
+    logger.info(f"Queued {added} new articles")
+    return added
+
+class _Heartbeat:
+    """Keep renewing a worker's leases from a background thread."""
+
+    def __init__(self, queue, worker, lease):
+        self.queue = queue
+        self.worker = worker
+        self.lease = lease
+        self.urls = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.lease / 3):
+            urls = list(self.urls)
+            if urls and self.queue.heartbeat(self.worker, urls, self.lease) < len(urls):
+                logger.warning("Lost the lease on some claimed articles", extra={'worker': self.worker})
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+def run_worker(queue, sources, worker=None, store_path=article_store.DB_PATH, batch_size=CLAIM_BATCH_SIZE,
+               lease=LEASE_SECONDS, fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS,
+               max_in_flight=MAX_IN_FLIGHT, exit_when_empty=False, stop=None):
+    """
+    Claim batches of the sources' jobs and process them until stop is set (or the queue is empty).
+
+    Each batch is fetched and parsed through the pipeline, its articles and
+    rejections are committed to the article store and only then are the
+    jobs acknowledged, so a crash at any point loses nothing. Returns the
+    number of jobs processed.
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    stop = stop or threading.Event()
+    by_name = {source.name: index for index, source in enumerate(sources)}
+    limiter = make_limiter(sources)
+    store = article_store.open_store(store_path)
+    rejection_cache.ensure_schema(store)
+    heartbeat = _Heartbeat(queue, worker, lease)
+    processed = 0
+
+    try:
+        while not stop.is_set():
+            jobs = queue.claim(worker, by_name, batch_size, lease)
+            if not jobs:
+                if exit_when_empty:
+                    break
+                stop.wait(IDLE_WAIT)
+                continue
+
+            heartbeat.urls = [url for url, _, _ in jobs]
+            tasks = []
+            for url, name, item in jobs:
+                index = by_name[name]
+                tasks.append((index, sources[index].parse, sources[index].restore_item(json.loads(item))))
+            parsed = []
+            rejections = []
+
+            def write(task, result):
+                index, _, item = task
+                if isinstance(result, ArticleRejected):
+                    rejections.append((sources[index].url_of(item), result.reason))
+                else:
+                    parsed.append((sources[index], item, result))
+
+            run_pipeline(
+                tasks,
+                fetch=lambda task: sources[task[0]].fetch(task[2]),
+                parse=parse_task,
+                write=write,
+                url_of=lambda task: sources[task[0]].url_of(task[2]),
+                fetch_workers=fetch_workers,
+                parse_workers=parse_workers,
+                max_in_flight=max_in_flight,
+                limiter=limiter,
+                source_of=lambda task: sources[task[0]].name,
+                category_of=lambda task: sources[task[0]].category_of(task[2]),
+            )
+
+            # Fill in missing image sizes, probing each source's batch at once
+            resolved = []
+            for source in sources:
+                batch = [(item, result) for owner, item, result in parsed if owner is source]
+                if source.probe_images and batch:
+                    batch = image_probe.resolve(store, source, batch)
+                resolved.extend((source, item, result) for item, result in batch)
+
+            saved = {}
+            fingerprints = []
+            for source, item, result in resolved:
+                url = source.url_of(item)
+                if not isinstance(result, ArticleRejected):
+                    result = dedup.check_article(store, url, source.fingerprint(item, result), fingerprints) or result
+                if isinstance(result, ArticleRejected):
+                    rejections.append((url, result.reason))
+                else:
+                    saved.setdefault(source.name, []).append(source.record(item, result))
+
+            # Store first: if the ack is lost, the next claim sees the stored results
+            dedup.add_fingerprints(store, fingerprints)
+            for name, records in saved.items():
+                article_store.add_articles(store, name, records)
+            rejection_cache.record_rejections(store, rejections)
+            queue.ack(worker, heartbeat.urls)
+            heartbeat.urls = []
+            processed += len(jobs)
+            logger.info(f"Processed {len(jobs)} articles, {processed} so far", extra={'worker': worker})
+    finally:
+        heartbeat.stop()
+        if heartbeat.urls:
+            # Interrupted mid-batch: let other workers have the unfinished jobs now
+            queue.release(worker, heartbeat.urls)
+        store.close()
+    return processed
+
+def main():
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(description='Scrape through a shared work queue.')
+    parser.add_argument('command', choices=['enqueue', 'work', 'status', 'export'])
+    add_source_args(parser)
+    parser.add_argument('--db', default=article_store.DB_PATH, help='Article store holding the queue')
+    parser.add_argument('--worker-id', help='Name of this worker (default: host name and pid)')
+    parser.add_argument('--batch-size', type=int, default=CLAIM_BATCH_SIZE, help='Articles claimed at a time')
+    parser.add_argument('--lease', type=int, default=LEASE_SECONDS, help='Lease length in seconds')
+    parser.add_argument('--exit-when-empty', action='store_true', help='Stop once the queue is drained')
+
+    args = parser.parse_args()
+    sources = sources_from_args(parser, args)
+    for source in sources:
+        source.store_path = args.db
+    queue = SqliteWorkQueue(args.db)
+    try:
+        if args.command == 'enqueue':
+            enqueue_sources(sources, queue)
+        elif args.command == 'work':
+            # Finish the current batch before exiting
+            stop = threading.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stop.set())
+            run_worker(queue, sources, args.worker_id, args.db, args.batch_size, args.lease,
+                       args.fetch_workers, args.parse_workers, exit_when_empty=args.exit_when_empty, stop=stop)
+            log_summary()
+        elif args.command == 'status':
+            for state, count in sorted(queue.counts().items()):
+                print(f"{state}: {count}")
+        else:
+            store = article_store.open_store(args.db)
+            for source in sources:
+                article_store.export_txt(store, source.name, source.filename)
+                logger.info(f"Exported {article_store.count_articles(store, source.name)} articles "
+                            f"to {source.filename}")
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()